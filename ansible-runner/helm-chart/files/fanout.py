@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Fan-out helpers for the ansible-runner Indexed Job
+
+Every shard of the fan-out Job runs its playbook(s) with a `fanout_result_dir`
+extra-var. A playbook that has data for RHDP writes a JSON or YAML file into
+that directory, shaped like userinfo data:
+
+    demo_url: https://demo.apps.cluster.example.com
+    users:
+      user1: {password: generated-password, showroom_url: https://...}
+
+    fanout.py publish --index 3 --results /tmp/ansible/results
+    fanout.py aggregate --timeout 3600
+
+`publish` stores one shard's results in a ConfigMap labelled with the Job's
+name and uid. `aggregate` waits for the Job to finish and deep-merges the results of
+every shard, in index order, into one ConfigMap with the
+demo.redhat.com/userinfo label: shared keys become data and `users` becomes
+`users_json`, which the ocp4_workload_field_content role reads back into
+agnosticd_user_info. Shards published without a uid, when the pod had no
+batch.kubernetes.io/controller-uid label, are matched by the Job's name and
+count when they were last written after the Job was created.
+
+Namespace, Job and ConfigMap names default to the NAMESPACE, FANOUT_JOB,
+FANOUT_JOB_UID and FANOUT_USERINFO environment variables set by the chart.
+"""
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+import time
+
+FANOUT_JOB_LABEL = 'demo.redhat.com/fanout-job'
+FANOUT_UID_LABEL = 'demo.redhat.com/fanout-job-uid'
+FANOUT_INDEX_LABEL = 'demo.redhat.com/fanout-index'
+USERINFO_LABEL = 'demo.redhat.com/userinfo'
+RESULT_KEY = 'result.json'
+
+
+def merge(target, source):
+    """Recursively merge source into target in place; later values win"""
+    for key, value in source.items():
+        current = target.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            merge(current, value)
+        else:
+            target[key] = value
+    return target
+
+
+def load_results(directory):
+    """Merge every .json/.yaml/.yml file in directory, in name order"""
+    merged = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        extension = os.path.splitext(path)[1]
+        if extension not in ('.json', '.yaml', '.yml'):
+            continue
+        with open(path) as f:
+            if extension == '.json':
+                data = json.load(f)
+            else:
+                import yaml
+                data = yaml.safe_load(f)
+        if data is None:
+            continue
+        if not isinstance(data, dict):
+            raise SystemExit(f'{path}: results must be a mapping, got {type(data).__name__}')
+        merge(merged, data)
+    return merged
+
+
+def userinfo_data(results):
+    """ConfigMap data for merged results: shared keys as strings plus users_json"""
+    data = {}
+    for key, value in results.items():
+        if key != 'users':
+            data[key] = value if isinstance(value, str) else json.dumps(value)
+    if results.get('users'):
+        data['users_json'] = json.dumps({'users': results['users']}, sort_keys=True)
+    return data
+
+
+def core_api():
+    try:
+        from kubernetes import client, config
+    except ImportError:
+        raise SystemExit('Failed: the kubernetes Python client is not installed in this image')
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        config.load_kube_config()
+    return client
+
+
+def apply_configmap(api, namespace, name, labels, data):
+    """Create the ConfigMap or replace the one left by a previous run"""
+    from kubernetes.client.rest import ApiException
+    body = {
+        'apiVersion': 'v1',
+        'kind': 'ConfigMap',
+        'metadata': {'name': name, 'namespace': namespace, 'labels': labels},
+        'data': data,
+    }
+    try:
+        api.create_namespaced_config_map(namespace, body)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+        api.replace_namespaced_config_map(name, namespace, body)
+
+
+def wait_for_job(batch, namespace, name, timeout):
+    """Follow the Job with a watch until it completes or fails; returns it, or None on timeout"""
+    from kubernetes import watch
+    from kubernetes.client.rest import ApiException
+
+    def finished(job):
+        conditions = (job.get('status') or {}).get('conditions') or []
+        return any(c['type'] in ('Complete', 'Failed') and c['status'] == 'True' for c in conditions)
+
+    deadline = time.monotonic() + timeout
+    field_selector = f'metadata.name={name}'
+    while True:
+        jobs = batch.list_namespaced_job(namespace, field_selector=field_selector, _preload_content=False)
+        jobs = json.loads(jobs.data)
+        for job in jobs['items']:
+            if finished(job):
+                return job
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        stream = watch.Watch()
+        try:
+            for event in stream.stream(batch.list_namespaced_job, namespace, field_selector=field_selector,
+                                       resource_version=jobs['metadata']['resourceVersion'],
+                                       timeout_seconds=max(1, int(min(remaining, 300)))):
+                job = event['raw_object']
+                if event['type'] != 'ERROR' and finished(job):
+                    return job
+        except ApiException as e:
+            # 410 Gone: relist and watch again
+            if e.status != 410:
+                raise
+        finally:
+            stream.stop()
+
+
+def cmd_publish(args):
+    client = core_api()
+    results = load_results(args.results) if os.path.isdir(args.results) else {}
+    labels = {
+        FANOUT_JOB_LABEL: args.job,
+        FANOUT_INDEX_LABEL: str(args.index),
+    }
+    if args.job_uid:
+        labels[FANOUT_UID_LABEL] = args.job_uid
+    # Always published, even when empty, so aggregate can tell a silent shard from a missing one
+    apply_configmap(client.CoreV1Api(), args.namespace, f'{args.job}-shard-{args.index}', labels,
+                    {RESULT_KEY: json.dumps(results, sort_keys=True)})
+    print(f"=== Published shard {args.index}: {len(results.get('users') or {})} users,"
+          f" {len([k for k in results if k != 'users'])} shared keys ===")
+    return 0
+
+
+def cmd_aggregate(args):
+    client = core_api()
+    start = time.monotonic()
+    job = wait_for_job(client.BatchV1Api(), args.namespace, args.job, args.timeout)
+    if job is None:
+        print(f'Timed out after {args.timeout}s waiting for Job {args.job}', file=sys.stderr)
+        return 1
+    waited = time.monotonic() - start
+    completions = job['spec'].get('completions') or 1
+    uid = job['metadata']['uid']
+    created = datetime.datetime.fromisoformat(job['metadata']['creationTimestamp'].replace('Z', '+00:00'))
+
+    core = client.CoreV1Api()
+    shards = core.list_namespaced_config_map(args.namespace, label_selector=f'{FANOUT_JOB_LABEL}={args.job}').items
+    by_index = {}
+    for cm in sorted(shards, key=lambda cm: FANOUT_UID_LABEL in cm.metadata.labels):
+        # A shard of this run carries its uid; one without it is only from this
+        # run when the API server last wrote it after the Job was created
+        if FANOUT_UID_LABEL in cm.metadata.labels:
+            if cm.metadata.labels[FANOUT_UID_LABEL] != uid:
+                continue
+        elif max([f.time for f in cm.metadata.managed_fields or [] if f.time]
+                 or [cm.metadata.creation_timestamp]) < created:
+            continue
+        by_index[int(cm.metadata.labels[FANOUT_INDEX_LABEL])] = cm
+    merged = {}
+    for index in sorted(by_index):
+        merge(merged, json.loads((by_index[index].data or {}).get(RESULT_KEY) or '{}'))
+    missing = [index for index in range(completions) if index not in by_index]
+
+    apply_configmap(core, args.namespace, args.configmap, {USERINFO_LABEL: ''}, userinfo_data(merged))
+    failed = any(c['type'] == 'Failed' and c['status'] == 'True' for c in job['status'].get('conditions') or [])
+    print(json.dumps({
+        'job': args.job,
+        'configmap': args.configmap,
+        'shards': completions,
+        'published': len(by_index),
+        'missing': missing,
+        'users': len(merged.get('users') or {}),
+        'job_failed': failed,
+        'waited_s': round(waited, 1),
+    }, indent=2))
+    return 1 if failed or missing else 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Fan-out helpers for the ansible-runner Indexed Job')
+    parser.add_argument('--namespace', default=os.environ.get('NAMESPACE'),
+                        help='Namespace of the Job (default: $NAMESPACE)')
+    parser.add_argument('--job', default=os.environ.get('FANOUT_JOB'),
+                        help='Name of the fan-out Job (default: $FANOUT_JOB)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish = commands.add_parser('publish', help="Store one shard's results in a ConfigMap")
+    publish.add_argument('--index', type=int, default=int(os.environ.get('JOB_COMPLETION_INDEX', 0)),
+                         help='Shard index (default: $JOB_COMPLETION_INDEX)')
+    publish.add_argument('--results', default='/tmp/ansible/results',
+                         help='Directory the playbooks wrote their result files to')
+    publish.add_argument('--job-uid', default=os.environ.get('FANOUT_JOB_UID', ''),
+                         help='uid of the fan-out Job (default: $FANOUT_JOB_UID)')
+    publish.set_defaults(func=cmd_publish)
+
+    aggregate = commands.add_parser('aggregate', help='Wait for the Job and merge all shards into the userinfo ConfigMap')
+    aggregate.add_argument('--configmap', default=os.environ.get('FANOUT_USERINFO'),
+                           help='Name of the userinfo ConfigMap to write (default: $FANOUT_USERINFO)')
+    aggregate.add_argument('--timeout', type=int, default=3600,
+                           help='Seconds to wait for the Job to finish (default: 3600)')
+    aggregate.set_defaults(func=cmd_aggregate)
+
+    args = parser.parse_args(argv)
+    for name in ('namespace', 'job') + (('configmap',) if args.command == 'aggregate' else ()):
+        if not getattr(args, name):
+            parser.error(f'--{name} is required')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
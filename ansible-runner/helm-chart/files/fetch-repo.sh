@@ -0,0 +1,143 @@
+# Fetch the playbook repository and install its requirements for the ansible-runner Job
+#
+# Sourced by the Job; defines three functions:
+#
+#   remote_revision               commit GIT_REPO_BRANCH points to, without fetching,
+#                                 in _remote_revision (empty when the remote is unreachable)
+#   fetch_repo DEST               clone GIT_REPO_URL at GIT_REPO_BRANCH into DEST
+#   install_repo_requirements     install requirements.yml and requirements.txt
+#                                 of the current directory (after setup-env.sh)
+#
+# Environment:
+#   GIT_REPO_URL, GIT_REPO_BRANCH  Repository and branch to fetch
+#   GIT_USERNAME, GIT_PASSWORD     Optional HTTPS credentials
+#   GIT_DEPTH                      Clone depth; 0 or empty fetches the full history
+#   GIT_SPARSE_PATH                Only check out this directory of the repository
+#   GIT_MIRROR                     "true" keeps a bare mirror under $CACHE_DIR/git that
+#                                  later Jobs update incrementally instead of cloning
+#   CACHE_DIR                      Persistent cache root; also makes repository
+#                                  requirements install only when their file hash changes
+#
+# Results are passed in variables rather than printed, so a failing git or
+# install command still stops the Job under set -e.
+
+_fetch_with_credentials() {
+  # Remote URL with the HTTPS credentials, if any, in _fetch_remote
+  if [ -n "${GIT_USERNAME}" ]; then
+    _fetch_remote="https://${GIT_USERNAME}:${GIT_PASSWORD}@$(echo ${GIT_REPO_URL} | sed 's|https://||')"
+  else
+    _fetch_remote="${GIT_REPO_URL}"
+  fi
+}
+
+_fetch_mirror() {
+  # Create or update the bare mirror of GIT_REPO_URL in _fetch_mirror_dir
+  _fetch_mirror_dir="${CACHE_DIR}/git/$(echo -n "${GIT_REPO_URL}" | sha256sum | cut -c1-16).git"
+  mkdir -p "${CACHE_DIR}/git"
+  (
+    # One Job updates a mirror at a time
+    exec 9>"$_fetch_mirror_dir.lock"
+    command -v flock > /dev/null && flock 9
+    if [ ! -d "$_fetch_mirror_dir" ]; then
+      echo "=== Repository mirror miss: $_fetch_mirror_dir ==="
+      git init --quiet --bare "$_fetch_mirror_dir"
+      # Lets the local clone ask for a blob-less, sparse checkout
+      git -C "$_fetch_mirror_dir" config uploadpack.allowFilter true
+    else
+      echo "=== Repository mirror hit: $_fetch_mirror_dir (fetching changes only) ==="
+    fi
+    git -C "$_fetch_mirror_dir" fetch --quiet --prune $_fetch_depth "$_fetch_remote" \
+      "+refs/heads/${GIT_REPO_BRANCH}:refs/heads/${GIT_REPO_BRANCH}"
+  )
+}
+
+remote_revision() {
+  _fetch_with_credentials
+  _remote_revision=$(git ls-remote "$_fetch_remote" "refs/heads/${GIT_REPO_BRANCH}" 2> /dev/null | cut -f1) \
+    || _remote_revision=""
+}
+
+fetch_repo() {
+  local dest="$1" origin sparse=""
+  local start=$(date +%s)
+  _fetch_with_credentials
+  _fetch_depth=""
+  if [ "${GIT_DEPTH:-0}" -gt 0 ]; then
+    _fetch_depth="--depth ${GIT_DEPTH}"
+  fi
+
+  if [ "${GIT_MIRROR}" = "true" ] && [ -n "${CACHE_DIR}" ]; then
+    _fetch_mirror
+    # file:// so --depth and --filter apply to the local clone too
+    origin="file://$_fetch_mirror_dir"
+  else
+    origin="$_fetch_remote"
+  fi
+
+  if [ -n "${GIT_SPARSE_PATH}" ]; then
+    # Skip blobs outside the sparse path; they are never checked out
+    sparse="--filter=blob:none --sparse"
+  fi
+  git clone --quiet --branch "${GIT_REPO_BRANCH}" $_fetch_depth $sparse "$origin" "$dest"
+  if [ -n "${GIT_SPARSE_PATH}" ]; then
+    git -C "$dest" sparse-checkout set "${GIT_SPARSE_PATH}"
+  fi
+  # Never keep credentials or the mirror path in the checkout
+  git -C "$dest" remote set-url origin "${GIT_REPO_URL}"
+  echo "=== Fetched $(git -C "$dest" rev-parse --short HEAD) in $(( $(date +%s) - start ))s" \
+    "(depth ${GIT_DEPTH:-0}${GIT_SPARSE_PATH:+, sparse ${GIT_SPARSE_PATH}}${_fetch_mirror_dir:+, mirror}) ==="
+}
+
+_requirements_cached() {
+  # Run "$3 DIR" unless DIR, keyed by the hash of requirements file $1, is complete.
+  # $2 names the kind of requirements; the directory is returned in _requirements_dir.
+  local key=$( { cat "$1"; echo "$2"; python3 -VV; } | sha256sum | cut -c1-16)
+  _requirements_dir="${CACHE_DIR}/repo-requirements/$2-$key"
+  mkdir -p "${CACHE_DIR}/repo-requirements"
+  (
+    exec 9>"$_requirements_dir.lock"
+    command -v flock > /dev/null && flock 9
+    if [ -f "$_requirements_dir/.complete" ]; then
+      echo "=== $1 unchanged, reusing $_requirements_dir ==="
+    else
+      echo "=== Installing $1 into $_requirements_dir ==="
+      rm -rf "$_requirements_dir"
+      mkdir -p "$_requirements_dir"
+      "$3" "$_requirements_dir"
+      touch "$_requirements_dir/.complete"
+    fi
+  )
+}
+
+_install_galaxy_requirements() {
+  # ansible-galaxy installs into the first roles and collections path
+  ANSIBLE_ROLES_PATH="$1/roles" ANSIBLE_COLLECTIONS_PATH="$1/collections" \
+    ansible-galaxy install -r requirements.yml
+}
+
+_install_python_requirements() {
+  pip install --quiet --target "$1/site-packages" -r requirements.txt
+}
+
+install_repo_requirements() {
+  if [ -f requirements.yml ]; then
+    if [ -z "${CACHE_DIR}" ]; then
+      echo "=== Installing requirements.yml ==="
+      ansible-galaxy install -r requirements.yml
+    else
+      _requirements_cached requirements.yml galaxy _install_galaxy_requirements
+      export ANSIBLE_ROLES_PATH="$_requirements_dir/roles:${ANSIBLE_ROLES_PATH:-~/.ansible/roles:/usr/share/ansible/roles:/etc/ansible/roles}"
+      export ANSIBLE_COLLECTIONS_PATH="$_requirements_dir/collections${ANSIBLE_COLLECTIONS_PATH:+:$ANSIBLE_COLLECTIONS_PATH}"
+    fi
+  fi
+
+  if [ -f requirements.txt ]; then
+    if [ -z "${CACHE_DIR}" ]; then
+      echo "=== Installing requirements.txt ==="
+      pip install --quiet -r requirements.txt
+    else
+      _requirements_cached requirements.txt python _install_python_requirements
+      export PYTHONPATH="$_requirements_dir/site-packages${PYTHONPATH:+:$PYTHONPATH}"
+    fi
+  fi
+}
@@ -0,0 +1 @@
+../../../roles/ocp4_workload_field_content/callback_plugins/field_content_timeline.py
\ No newline at end of file
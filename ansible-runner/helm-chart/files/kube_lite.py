@@ -0,0 +1 @@
+../../../lib/kube_lite.py
\ No newline at end of file
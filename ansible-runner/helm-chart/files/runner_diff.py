@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: runner_diff
+type: aggregate
+short_description: Record the tasks of a check-mode run that would change the cluster
+description:
+  - Used by the ansible-runner Job's diff stage, which runs the playbook with C(--check) so every
+    manifest is rendered and compared with the live objects without changing them.
+  - A task that reports C(changed), that was skipped because its module cannot run in check mode,
+    or that failed is a difference. The diff stage sets C(any_errors_fatal), so a failure, such as
+    a wait for an object another task would have created, ends the run.
+  - C(command), C(shell) and the other modules that only run commands are skipped in check mode.
+    What they would do is unknown, so they are differences too, and a playbook that runs commands
+    without C(creates) or C(removes) always runs for real.
+  - Tasks that set C(check_mode) to false run for real in the check-mode run. They are expected
+    to only prepare files in the runner pod, such as a chart cache; their changes are not
+    differences.
+  - I(results) is rewritten with each difference, so the diff stage can stop the run at the first
+    one. When the playbook ends, it records that it completed, with the differences found. A
+    missing I(results) file, or one without C(complete), means the run was cut short.
+requirements:
+  - enable in configuration, for example with C(ANSIBLE_CALLBACKS_ENABLED=runner_diff)
+options:
+  results:
+    description: JSON file the differences are written to.
+    type: path
+    default: /tmp/ansible/diff.json
+    env:
+      - name: RUNNER_DIFF_RESULTS
+    ini:
+      - section: callback_runner_diff
+        key: results
+'''
+
+import json
+import os
+
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.callback import CallbackBase
+
+
+# Modules check mode skips unless creates or removes tell it the command has already run
+COMMAND_MODULES = frozenset(('command', 'shell', 'raw', 'script', 'expect'))
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'runner_diff'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self.differences = []
+
+    def v2_runner_on_ok(self, result):
+        if result._result.get('changed') and result._task.check_mode is not False:
+            self.difference(result, 'would change')
+
+    def v2_runner_on_skipped(self, result):
+        # Conditional skips are not differences; modules without check mode support are unknown
+        message = to_text(result._result.get('msg') or '')
+        if 'check mode' in message:
+            if result._task.action.split('.')[-1] in COMMAND_MODULES:
+                self.difference(result, 'would run a command')
+            else:
+                self.difference(result, 'cannot run in check mode')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        if not ignore_errors:
+            self.difference(result, 'failed: %s' % to_text(result._result.get('msg') or '')[:200])
+
+    def v2_runner_on_unreachable(self, result):
+        self.difference(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):
+        self.write(complete=True)
+
+    def difference(self, result, reason):
+        self.differences.append({'task': result._task.get_name(), 'host': result._host.get_name(),
+                                 'action': result._task.action, 'reason': reason})
+        # Keep what was found so far in case the run is cut short
+        self.write(complete=False)
+
+    def write(self, complete):
+        path = self.get_option('results')
+        try:
+            # Replace the file in one step; the diff stage reads it while the playbook runs
+            with open(path + '.tmp', 'w') as f:
+                json.dump({'complete': complete, 'differences': self.differences}, f, indent=2)
+            os.replace(path + '.tmp', path)
+        except (IOError, OSError) as e:
+            self._display.warning('runner_diff: could not write to %s: %s' % (path, e))
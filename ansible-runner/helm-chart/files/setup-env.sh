@@ -0,0 +1,180 @@
+# Prepare Python packages, Ansible collections and Helm for the ansible-runner Job
+#
+# Sourced by the Job with the directory holding requirements.txt and
+# collections.txt as its argument:
+#
+#   source /config/setup-env.sh /config
+#
+# Environment:
+#   HELM_VERSION        Helm release to install, for example v3.14.0; empty skips Helm
+#   CACHE_DIR           Persistent cache root; empty installs into the image on every run
+#   CACHE_MAX_AGE_DAYS  Remove cached environments unused for this many days; empty keeps them
+#   DISCOVERY_CACHE_TTL Reuse cached API discovery for this many seconds; empty or 0 disables it
+#
+# With CACHE_DIR set, everything is installed into $CACHE_DIR/env-<key>, where
+# <key> hashes the requirements, the collections, the Helm version and the
+# Python interpreter. A run whose key already has a complete environment skips
+# installation and only puts it on PATH and ANSIBLE_COLLECTIONS_PATH. The cache
+# can live on a PersistentVolumeClaim or be baked into the image with
+# ansible-runner/Containerfile.
+#
+# With DISCOVERY_CACHE_TTL set as well, the API discovery documents that
+# kubernetes.core keeps in the temporary directory (k8srcp-*.json) are copied
+# to $CACHE_DIR/discovery when the Job exits and restored by later Jobs until
+# they were requested DISCOVERY_CACHE_TTL seconds ago, so their first k8s
+# tasks do not request them again. The ocp4_workload_field_content role's
+# modules keep their discovery cache in the same directory.
+
+_setup_config="${1:-/config}"
+
+# One normalized line per requirement, so whitespace and blank lines do not change the key
+_setup_lines() {
+  sed -e 's/[[:space:]]*$//' -e 's/^[[:space:]]*//' "$1" | grep -v '^$' || true
+}
+
+_setup_key() {
+  {
+    echo "requirements:"; _setup_lines "$_setup_config/requirements.txt"
+    echo "collections:"; _setup_lines "$_setup_config/collections.txt"
+    echo "helm: ${HELM_VERSION}"
+    echo "python: $(python3 -c 'import platform, sys; print(sys.version, platform.machine())')"
+  } | sha256sum | cut -c1-16
+}
+
+# Restore the discovery cache files of kubernetes.core (k8srcp-*.json) from
+# $CACHE_DIR/discovery into the temporary directory, or save them back. Files
+# record when their documents were requested under the same key the
+# ocp4_workload_field_content role's modules use; kubernetes.core drops it
+# when it rediscovers, so a saved file without it was requested in this Job.
+_setup_discovery() {
+  python3 - "$1" "${CACHE_DIR}/discovery" "${TMPDIR:-/tmp}" "${DISCOVERY_CACHE_TTL}" <<'DISCOVERY_EOF'
+import glob, json, os, sys, time
+
+action, cache_dir, tmp, ttl = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+key, now = 'field_content_discovered_at', time.time()
+
+
+def documents(cache):
+    # /version, /apis and each group version read; the apis List pseudo-group is never requested
+    count = bool(cache.get('version')) + bool(cache.get('resources'))
+    for prefix, groups in (cache.get('resources') or {}).items():
+        for name, versions in groups.items():
+            count += sum(1 for group in versions.values() if (prefix, name) != ('apis', '')
+                         and isinstance(group, dict) and group.get('resources'))
+    return count
+
+
+source, target = (cache_dir, tmp) if action == 'restore' else (tmp, cache_dir)
+restored = []
+for path in glob.glob(os.path.join(source, 'k8srcp-*.json')):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        continue
+    if action == 'restore':
+        if now - float(cache.get(key) or 0) > ttl:
+            os.remove(path)
+            continue
+        restored.append((documents(cache), int(now - cache[key])))
+    else:
+        cache.setdefault(key, now)
+    partial = os.path.join(target, '.%s.%d' % (os.path.basename(path), os.getpid()))
+    with open(partial, 'w') as f:
+        json.dump(cache, f)
+    os.replace(partial, os.path.join(target, os.path.basename(path)))
+
+if action == 'restore':
+    if restored:
+        print('=== Discovery cache hit: %s (saves up to %d discovery requests, fetched %ds ago) ==='
+              % (cache_dir, sum(n for n, _ in restored), max(age for _, age in restored)))
+    else:
+        print('=== Discovery cache miss: %s ===' % cache_dir)
+DISCOVERY_EOF
+}
+
+_setup_helm() {
+  # $1: directory that receives the helm binary
+  echo "=== Installing Helm ${HELM_VERSION} ==="
+  curl -fsSL "https://get.helm.sh/helm-${HELM_VERSION}-linux-amd64.tar.gz" | tar xz -C /tmp
+  mv /tmp/linux-amd64/helm "$1/"
+}
+
+if [ -z "${CACHE_DIR}" ]; then
+  # Install Ansible and required packages
+  echo "=== Installing Python packages ==="
+  pip install --quiet --upgrade pip
+  pip install --quiet -r "$_setup_config/requirements.txt"
+
+  # Install required Ansible collections
+  echo "=== Installing Ansible collections ==="
+  while read collection; do
+    [ -z "$collection" ] || ansible-galaxy collection install "$collection" --force
+  done < "$_setup_config/collections.txt"
+
+  if [ -n "${HELM_VERSION}" ]; then
+    _setup_helm /opt/app-root/bin
+    helm version --short
+  fi
+else
+  _setup_start=$(date +%s)
+  _setup_env="${CACHE_DIR}/env-$(_setup_key)"
+  mkdir -p "${CACHE_DIR}"
+
+  if [ ! -f "$_setup_env/.complete" ]; then
+    # Serialize Jobs that miss on the same key; the winner builds, the others reuse its result
+    exec 9>"$_setup_env.lock"
+    command -v flock > /dev/null && flock 9
+  fi
+
+  if [ -f "$_setup_env/.complete" ]; then
+    _setup_saved=$(( $(cat "$_setup_env/.complete") - ($(date +%s) - _setup_start) ))
+    touch "$_setup_env/.complete"
+    echo "=== Setup cache hit: $_setup_env (skipped installation, saved ~${_setup_saved}s) ==="
+  else
+    echo "=== Setup cache miss: $_setup_env ==="
+    rm -rf "$_setup_env"
+    mkdir -p "$_setup_env/bin" "$_setup_env/collections"
+    python3 -m venv "$_setup_env/venv"
+
+    echo "=== Installing Python packages ==="
+    export PIP_CACHE_DIR="${CACHE_DIR}/pip"
+    "$_setup_env/venv/bin/pip" install --quiet --upgrade pip
+    "$_setup_env/venv/bin/pip" install --quiet -r "$_setup_config/requirements.txt"
+
+    echo "=== Installing Ansible collections ==="
+    while read collection; do
+      [ -z "$collection" ] || "$_setup_env/venv/bin/ansible-galaxy" collection install "$collection" \
+        -p "$_setup_env/collections"
+    done < "$_setup_config/collections.txt"
+
+    if [ -n "${HELM_VERSION}" ]; then
+      _setup_helm "$_setup_env/bin"
+    fi
+
+    # Written last: only a complete environment is ever reused
+    echo $(( $(date +%s) - _setup_start )) > "$_setup_env/.complete"
+    echo "=== Setup cache stored: $_setup_env (installation took $(cat "$_setup_env/.complete")s) ==="
+  fi
+  exec 9>&-
+  rm -f "$_setup_env.lock"
+
+  if [ -n "${CACHE_MAX_AGE_DAYS}" ]; then
+    # Drop environments no Job has used for a while
+    find "${CACHE_DIR}" -mindepth 2 -maxdepth 2 -name .complete -mtime +"${CACHE_MAX_AGE_DAYS}" \
+      -printf '%h\n' 2>/dev/null | xargs -r rm -rf
+  fi
+
+  export PATH="$_setup_env/venv/bin:$_setup_env/bin:$PATH"
+  # User collections stay first so playbook repository requirements never land in the cache
+  export ANSIBLE_COLLECTIONS_PATH="$HOME/.ansible/collections:$_setup_env/collections:/usr/share/ansible/collections"
+  [ -z "${HELM_VERSION}" ] || helm version --short
+
+  if [ "${DISCOVERY_CACHE_TTL:-0}" -gt 0 ]; then
+    mkdir -p "${CACHE_DIR}/discovery"
+    _setup_discovery restore || true
+    trap '_setup_discovery save || true' EXIT
+    export FIELD_CONTENT_DISCOVERY_CACHE_DIR="${CACHE_DIR}/discovery"
+    export FIELD_CONTENT_DISCOVERY_CACHE_TTL="${DISCOVERY_CACHE_TTL}"
+  fi
+fi
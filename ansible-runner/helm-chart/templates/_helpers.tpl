@@ -47,4 +47,43 @@ Selector labels
 {{- define "ansible-runner.selectorLabels" -}}
 app.kubernetes.io/name: {{ include "ansible-runner.name" . }}
 app.kubernetes.io/instance: {{ .Release.Name }}
+{{- end }}
+
+{{/*
+Name of the PersistentVolumeClaim holding the setup cache
+*/}}
+{{- define "ansible-runner.cacheClaimName" -}}
+{{- .Values.cache.persistentVolumeClaim.existingClaim | default (printf "%s-cache" (include "ansible-runner.fullname" .)) }}
+{{- end }}
+
+{{/*
+Name of the ConfigMap the fan-out aggregation writes
+*/}}
+{{- define "ansible-runner.fanOutUserinfo" -}}
+{{- .Values.fanOut.aggregate.configMapName | default (printf "%s-userinfo" (include "ansible-runner.fullname" .)) }}
+{{- end }}
+
+{{/*
+Name of the ConfigMap the provisioning timeline is stored in
+*/}}
+{{- define "ansible-runner.timelineConfigMap" -}}
+{{- .Values.timeline.configMapName | default (printf "%s-timeline" (include "ansible-runner.fullname" .)) }}
+{{- end }}
+
+{{/*
+Name of the ConfigMap the fingerprint of the last successful run is stored in
+*/}}
+{{- define "ansible-runner.fingerprintConfigMap" -}}
+{{- .Values.incremental.configMapName | default (printf "%s-fingerprint" (include "ansible-runner.fullname" .)) }}
+{{- end }}
+
+{{/*
+Labels added to every timeline metric, as key=value pairs
+*/}}
+{{- define "ansible-runner.timelineLabels" -}}
+{{- $labels := list (printf "namespace=%s" .Values.namespace.name) (printf "release=%s" .Release.Name) }}
+{{- range $key, $value := .Values.timeline.labels }}
+{{- $labels = append $labels (printf "%s=%s" $key $value) }}
+{{- end }}
+{{- join "," $labels }}
 {{- end }}
\ No newline at end of file
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Registers the local cluster once per ArgoCD application controller shard
+
+    cluster_shards.py --namespace openshift-gitops --shards 3
+
+ArgoCD shards by destination cluster: every Application of the local cluster
+lands on the shard of in-cluster. To spread them, the cluster is registered
+again under in-cluster-1, in-cluster-2, ..., each pinned to its shard with a
+server URL of its own that reaches the same API server, and the field content
+role assigns every Application one of these destinations.
+
+The aliases authenticate as the application controller's service account: the
+program waits for the account, creates a long-lived token Secret for it, waits
+for the token, then creates or updates one cluster Secret per shard. in-cluster
+itself is pinned to shard 0.
+
+Only the Python standard library is used. The API server is the in-cluster
+one unless --api (or KUBE_API) points to another, plain HTTP server.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+from kube_lite import ApiError, Kube
+
+IN_CLUSTER = 'https://kubernetes.default.svc'
+# Other names of the API server; ArgoCD tells clusters apart by server URL
+ALIASES = [
+    'https://kubernetes.default.svc:443',
+    'https://kubernetes.default.svc.cluster.local',
+    'https://kubernetes.default.svc.cluster.local:443',
+    'https://kubernetes.default',
+    'https://kubernetes.default:443',
+    'https://kubernetes.default.svc.',
+    'https://kubernetes.default.svc.:443',
+    'https://kubernetes.default.svc.cluster.local.',
+    'https://kubernetes.default.svc.cluster.local.:443',
+]
+SHARD_LABEL = 'demo.redhat.com/controller-shard'
+
+
+def wait_for(kube, path, name, ready, deadline):
+    """The object name in path once ready(object) is true; lists, then watches it"""
+    query = {'fieldSelector': f'metadata.name={name}'}
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f'{path}/{name}')
+        try:
+            listed = kube.list(path, query)
+            for obj in listed['items']:
+                if ready(obj):
+                    return obj
+            for event_type, obj in kube.watch(path, query, listed['metadata']['resourceVersion'], min(remaining, 60)):
+                if event_type == 'ERROR':
+                    # Usually 410 Gone: list and watch again
+                    break
+                if event_type in ('ADDED', 'MODIFIED') and ready(obj):
+                    return obj
+        except ApiError as e:
+            if e.status != 410:
+                raise
+        except (OSError, ValueError) as e:
+            # A dropped watch; list again after a pause
+            print(f'{path}/{name}: {e}, listing again', file=sys.stderr)
+            time.sleep(2)
+
+
+def apply(kube, path, obj):
+    """Create obj in path, or merge it into the existing object"""
+    try:
+        kube.request('POST', path, obj)
+        return 'created'
+    except ApiError as e:
+        if e.status != 409:
+            raise
+    kube.request('PATCH', f"{path}/{obj['metadata']['name']}", obj, 'application/merge-patch+json')
+    return 'updated'
+
+
+def cluster_secret(shard, server, config):
+    name = 'in-cluster' if shard == 0 else f'in-cluster-{shard}'
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Secret',
+        'metadata': {'name': f'cluster-{name}',
+                     'labels': {'argocd.argoproj.io/secret-type': 'cluster', SHARD_LABEL: str(shard)}},
+        'type': 'Opaque',
+        'stringData': {'name': name, 'server': server, 'shard': str(shard), 'config': json.dumps(config)},
+    }
+
+
+def register(kube, namespace, service_account, shards, timeout):
+    start = time.monotonic()
+    deadline = start + timeout
+    secrets = f'/api/v1/namespaces/{namespace}/secrets'
+
+    wait_for(kube, f'/api/v1/namespaces/{namespace}/serviceaccounts', service_account, lambda obj: True, deadline)
+    token_name = f'{service_account}-shard-token'
+    apply(kube, secrets, {
+        'apiVersion': 'v1',
+        'kind': 'Secret',
+        'metadata': {'name': token_name, 'annotations': {'kubernetes.io/service-account.name': service_account}},
+        'type': 'kubernetes.io/service-account-token',
+    })
+    token = wait_for(kube, secrets, token_name, lambda obj: (obj.get('data') or {}).get('token'), deadline)['data']
+
+    report = {}
+    for shard in range(shards):
+        if shard == 0:
+            secret = cluster_secret(0, IN_CLUSTER, {'tlsClientConfig': {'insecure': False}})
+        else:
+            secret = cluster_secret(shard, ALIASES[shard - 1], {
+                'bearerToken': base64.b64decode(token['token']).decode(),
+                'tlsClientConfig': {'insecure': False, 'caData': token['ca.crt'],
+                                    'serverName': 'kubernetes.default.svc'},
+            })
+        action = apply(kube, secrets, secret)
+        report[secret['stringData']['name']] = {'server': secret['stringData']['server'], 'shard': shard,
+                                                'action': action}
+        print(f"{secret['stringData']['name']}: {action} on shard {shard}")
+    print(json.dumps({'duration_s': round(time.monotonic() - start, 1), 'clusters': report}, indent=2))
+    return 0
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Register the local cluster once per controller shard')
+    parser.add_argument('--api', default=os.environ.get('KUBE_API'),
+                        help='API server URL (default: $KUBE_API, or the in-cluster API)')
+    parser.add_argument('--namespace', required=True, help='Namespace of the ArgoCD instance')
+    parser.add_argument('--service-account', required=True, help="Application controller's service account")
+    parser.add_argument('--shards', type=int, required=True, help='Application controller shards')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('CLUSTER_SHARDS_TIMEOUT', 600)),
+                        help='Seconds to wait for the service account and its token (default: 600)')
+    args = parser.parse_args(argv)
+    if not 1 <= args.shards <= len(ALIASES) + 1:
+        parser.error(f'--shards must be between 1 and {len(ALIASES) + 1}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        return register(Kube(args.api), args.namespace, args.service_account, args.shards, args.timeout)
+    except (ApiError, TimeoutError) as e:
+        print(f'Failed: {e}', file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
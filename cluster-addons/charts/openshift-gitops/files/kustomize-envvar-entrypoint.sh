@@ -0,0 +1,28 @@
+# Entrypoint of the kustomize-envvar sidecar of the ArgoCD repo server
+#
+# Uses the image's kustomize. When the image has none and KUSTOMIZE_SHA256 is
+# set, downloads kustomize KUSTOMIZE_VERSION and only installs it when its
+# archive matches that checksum. Then starts the ArgoCD config management
+# plugin server, which runs kustomize_envvar.py for every Application using
+# the plugin.
+
+set -e
+
+if ! command -v kustomize > /dev/null; then
+  if [ -z "${KUSTOMIZE_SHA256}" ]; then
+    echo "kustomize is not on PATH: use an image with kustomize, or set argocd.kustomizeEnvvar.kustomizeSha256" >&2
+    exit 1
+  fi
+  arch=$(uname -m | sed -e 's/x86_64/amd64/' -e 's/aarch64/arm64/')
+  echo "=== Installing kustomize ${KUSTOMIZE_VERSION} ==="
+  mkdir -p /tmp/bin
+  curl -fsSL -o /tmp/kustomize.tar.gz \
+    "https://github.com/kubernetes-sigs/kustomize/releases/download/kustomize%2F${KUSTOMIZE_VERSION}/kustomize_${KUSTOMIZE_VERSION}_linux_${arch}.tar.gz"
+  echo "${KUSTOMIZE_SHA256}  /tmp/kustomize.tar.gz" | sha256sum -c -
+  tar xzf /tmp/kustomize.tar.gz -C /tmp/bin
+  rm -f /tmp/kustomize.tar.gz
+  export PATH="/tmp/bin:$PATH"
+fi
+kustomize version
+
+exec /var/run/argocd/argocd-cmp-server
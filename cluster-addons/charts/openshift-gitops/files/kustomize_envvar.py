@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+kustomize-envvar config management plugin for the ArgoCD repo server
+
+Runs kustomize build in the Application's source path. In its output, every
+${NAME} whose NAME is set in the Application's plugin env is replaced by the
+value; for field content that is CLUSTER_DOMAIN and API_URL. ArgoCD passes
+the plugin env as ARGOCD_ENV_<NAME>. Any other ${...} is left as it is.
+
+ArgoCD runs the plugin on every refresh of every Application. The output is
+cached by commit SHA (ARGOCD_APP_REVISION), repository, source path, plugin
+env and kustomize options. A refresh that changed none of them streams the
+cached manifests without running kustomize. On a miss, kustomize's output is
+substituted line by line while it is written to stdout and to the cache, so
+a large build is never held in memory. Only complete builds are stored, and
+a revision that is not a commit SHA is never cached.
+
+The commit SHA only pins what is in the repository. A build whose
+kustomizations (the source path's and the local ones it includes) pull
+resources, components or bases from elsewhere is never cached, unless every
+such URL pins a commit SHA with ?ref= or ?version=. A build with helmCharts
+is never cached either.
+
+Environment:
+  KUSTOMIZE_ENVVAR_CACHE_DIR      Cache directory; empty disables the cache
+  KUSTOMIZE_ENVVAR_CACHE_MAX_AGE  Seconds an unused entry is kept (default: 86400)
+  KUSTOMIZE_BIN                   kustomize binary (default: kustomize)
+  KUSTOMIZE_BUILD_OPTIONS         Extra arguments of kustomize build
+"""
+
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ENV_PREFIX = 'ARGOCD_ENV_'
+COMMIT_SHA = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+TMP_PREFIX = '.tmp-'
+KUSTOMIZATIONS = ('kustomization.yaml', 'kustomization.yml', 'Kustomization')
+# Kustomization fields whose entries kustomize may fetch from another repository
+REMOTE_FIELDS = ('resources', 'components', 'bases')
+PINNED_REF = re.compile(r'[?&](ref|version)=[0-9a-f]{40}([0-9a-f]{24})?(&|$)')
+
+
+def plugin_env(environ):
+    """The Application's plugin env, without the ARGOCD_ENV_ prefix"""
+    return {name[len(ENV_PREFIX):]: value for name, value in environ.items() if name.startswith(ENV_PREFIX)}
+
+
+def cache_key(environ, variables, command):
+    """Key of the rendered output, or None when the revision is not a commit SHA"""
+    revision = environ.get('ARGOCD_APP_REVISION', '')
+    if not COMMIT_SHA.match(revision):
+        return None
+    return hashlib.sha256(json.dumps({
+        'revision': revision,
+        'repository': environ.get('ARGOCD_APP_SOURCE_REPO_URL', ''),
+        'path': environ.get('ARGOCD_APP_SOURCE_PATH', ''),
+        'env': variables,
+        'command': command,
+    }, sort_keys=True).encode()).hexdigest()
+
+
+def kustomization_entries(text):
+    """Entries of the REMOTE_FIELDS lists and whether helmCharts is set, read without a YAML parser"""
+    entries, helm_charts, field = [], False, None
+    for line in text.splitlines():
+        stripped = line.split(' #')[0].rstrip()
+        if not stripped.strip() or stripped.lstrip().startswith('#'):
+            continue
+        if not line[0].isspace() and not stripped.startswith('-'):
+            name, _, rest = stripped.partition(':')
+            field = name.strip() if name.strip() in REMOTE_FIELDS else None
+            helm_charts = helm_charts or name.strip() == 'helmCharts'
+            if field and rest.strip().startswith('['):
+                entries.extend(item.strip().strip('\'"') for item in rest.strip().strip('[]').split(','))
+                field = None
+        elif field and stripped.lstrip().startswith('- '):
+            entries.append(stripped.lstrip()[2:].strip().strip('\'"'))
+    return [entry for entry in entries if entry], helm_charts
+
+
+def pinned_sources(directory, seen=None):
+    """Whether the build of directory only uses local files and remote sources pinned by commit SHA"""
+    seen = set() if seen is None else seen
+    directory = os.path.realpath(directory)
+    if directory in seen:
+        return True
+    seen.add(directory)
+    for name in KUSTOMIZATIONS:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            break
+    else:
+        return True
+    with open(path, encoding='utf-8', errors='replace') as f:
+        entries, helm_charts = kustomization_entries(f.read())
+    if helm_charts:
+        return False
+    for entry in entries:
+        local = os.path.join(directory, entry)
+        if os.path.isdir(local):
+            if not pinned_sources(local, seen):
+                return False
+        elif not os.path.exists(local) and not PINNED_REF.search(entry):
+            return False
+    return True
+
+
+def substituter(variables):
+    """Function replacing ${NAME} for every NAME in variables in one line of bytes"""
+    if not variables:
+        return lambda line: line
+    values = {name.encode(): value.encode() for name, value in variables.items()}
+    pattern = re.compile(rb'\$\{(' + b'|'.join(re.escape(name) for name in values) + rb')\}')
+    return lambda line: pattern.sub(lambda match: values[match.group(1)], line) if b'${' in line else line
+
+
+def prune(cache_dir, max_age, now):
+    """Remove entries and abandoned partial builds unused for max_age seconds"""
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            if now - os.stat(path).st_mtime > max_age:
+                os.unlink(path)
+        except OSError:
+            pass
+
+
+def build(command, substitute, outputs):
+    """Run kustomize, writing its substituted output to every file in outputs"""
+    process = subprocess.Popen(command, stdout=subprocess.PIPE)
+    for line in process.stdout:
+        line = substitute(line)
+        for output in outputs:
+            output.write(line)
+    process.stdout.close()
+    return process.wait()
+
+
+def generate(environ, stdout, stderr):
+    variables = plugin_env(environ)
+    command = [environ.get('KUSTOMIZE_BIN') or 'kustomize', 'build', '.'] + \
+        shlex.split(environ.get('KUSTOMIZE_BUILD_OPTIONS', ''))
+    cache_dir = environ.get('KUSTOMIZE_ENVVAR_CACHE_DIR')
+    key = cache_key(environ, variables, command) if cache_dir else None
+    if key is not None and not pinned_sources('.'):
+        stderr.write('kustomize-envvar: not caching, the build uses remote sources not pinned by commit SHA\n')
+        key = None
+    source = '%s@%s' % (environ.get('ARGOCD_APP_SOURCE_PATH') or '.', environ.get('ARGOCD_APP_REVISION', '')[:8])
+
+    if key is None:
+        return build(command, substituter(variables), [stdout])
+
+    path = os.path.join(cache_dir, key)
+    try:
+        with open(path, 'rb') as cached:
+            shutil.copyfileobj(cached, stdout, 1 << 20)
+        os.utime(path)
+        stderr.write('kustomize-envvar: cache hit for %s\n' % source)
+        return 0
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(cache_dir, exist_ok=True)
+    prune(cache_dir, int(environ.get('KUSTOMIZE_ENVVAR_CACHE_MAX_AGE') or 86400), time.time())
+    start = time.monotonic()
+    with tempfile.NamedTemporaryFile(dir=cache_dir, prefix=TMP_PREFIX, delete=False) as partial:
+        try:
+            returncode = build(command, substituter(variables), [stdout, partial])
+        except BaseException:
+            os.unlink(partial.name)
+            raise
+    if returncode:
+        os.unlink(partial.name)
+    else:
+        # Concurrent misses of one key each rename a complete build into place
+        os.replace(partial.name, path)
+        stderr.write('kustomize-envvar: cache miss for %s, built in %.1fs\n' % (source, time.monotonic() - start))
+    return returncode
+
+
+def main():
+    stdout = sys.stdout.buffer
+    returncode = generate(os.environ, stdout, sys.stderr)
+    stdout.flush()
+    return returncode
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+{{/*
+Repo server section of the ArgoCD instance: argocd.repo plus the sidecar and
+volumes of the kustomize-envvar plugin when it is enabled
+*/}}
+{{- define "openshift-gitops.repo" -}}
+{{- $repo := deepCopy (.Values.argocd.repo | default dict) }}
+{{- if .Values.argocd.kustomizeEnvvar.enabled }}
+{{- $plugin := include "openshift-gitops.kustomizeEnvvar" . | fromYaml }}
+{{- $_ := set $repo "sidecarContainers" (append ($repo.sidecarContainers | default list) $plugin.container) }}
+{{- $volumes := $repo.volumes | default list }}
+{{- range $plugin.volumes }}
+{{- $volumes = append $volumes . }}
+{{- end }}
+{{- $_ := set $repo "volumes" $volumes }}
+{{- end }}
+{{- toYaml $repo }}
+{{- end }}
+
+{{/*
+Sidecar container of the kustomize-envvar config management plugin and the
+volumes it needs besides the repo server's var-files and plugins
+*/}}
+{{- define "openshift-gitops.kustomizeEnvvar" -}}
+{{- $plugin := .Values.argocd.kustomizeEnvvar -}}
+{{- if not $plugin.image }}
+{{- fail "argocd.kustomizeEnvvar.image must be set to an image with python3, bash and kustomize" }}
+{{- end -}}
+container:
+  name: kustomize-envvar
+  image: {{ $plugin.image }}
+  command: [/bin/bash, /opt/kustomize-envvar/entrypoint.sh]
+  env:
+  - name: KUSTOMIZE_VERSION
+    value: {{ $plugin.kustomizeVersion | quote }}
+  - name: KUSTOMIZE_SHA256
+    value: {{ $plugin.kustomizeSha256 | default "" | quote }}
+  - name: KUSTOMIZE_ENVVAR_CACHE_DIR
+    value: {{ ternary "/var/cache/kustomize-envvar" "" $plugin.cache.enabled | quote }}
+  - name: KUSTOMIZE_ENVVAR_CACHE_MAX_AGE
+    value: {{ $plugin.cache.maxAge | quote }}
+  securityContext:
+    runAsNonRoot: true
+  {{- with $plugin.resources }}
+  resources:
+    {{- toYaml . | nindent 4 }}
+  {{- end }}
+  volumeMounts:
+  - name: var-files
+    mountPath: /var/run/argocd
+  - name: plugins
+    mountPath: /home/argocd/cmp-server/plugins
+  - name: kustomize-envvar-plugin
+    mountPath: /home/argocd/cmp-server/config/plugin.yaml
+    subPath: plugin.yaml
+  - name: kustomize-envvar-plugin
+    mountPath: /opt/kustomize-envvar
+  - name: kustomize-envvar-tmp
+    mountPath: /tmp
+  - name: kustomize-envvar-cache
+    mountPath: /var/cache/kustomize-envvar
+volumes:
+- name: kustomize-envvar-plugin
+  configMap:
+    name: kustomize-envvar-plugin
+- name: kustomize-envvar-tmp
+  emptyDir: {}
+- name: kustomize-envvar-cache
+  {{- if $plugin.cache.sizeLimit }}
+  emptyDir:
+    sizeLimit: {{ $plugin.cache.sizeLimit }}
+  {{- else }}
+  emptyDir: {}
+  {{- end }}
+{{- end }}
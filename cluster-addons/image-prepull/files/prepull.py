@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Image pre-pull controller for the image-prepull addon
+
+    prepull.py pull --images /config/images.txt --when-done sleep   # warm this node
+    prepull.py launch --images /config/images.txt                   # warm every node, then exit
+
+`pull` warms the node it runs on. The image list is normalized and deduplicated
+(by repository and digest for pinned references), images the container runtime
+already has are skipped, and the rest are pulled with at most --concurrency
+pulls at a time through the runtime CLI (crictl, reached with
+`chroot /host crictl` in the chart's privileged pod). Every image's state and
+pull time is written to the node's key of the status ConfigMap while it runs.
+An image whose digest turns up while pulling another reference is not pulled
+again. `pull` exits 1 when an image could not be pulled.
+
+`launch` starts one `pull` Job per selected node, watches the Jobs until every
+node is warm or failed and prints a per-node summary, so nothing keeps running
+once the images are on the nodes.
+
+Only the Python standard library is used: the controller runs on every node and
+should not install anything first. The API server is the in-cluster one unless
+--api (or KUBE_API) points to another, plain HTTP server.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import hashlib
+import json
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from kube_lite import ApiError, Kube
+
+NODE_LABEL = 'image-prepull/node'
+COMPONENT_LABEL = 'app.kubernetes.io/component'
+NODE_COMPONENT = 'prepull-node'
+
+
+def utcnow():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def normalize(reference):
+    """Fully qualified form of an image reference, as the runtime reports it"""
+    name, _, digest = reference.strip().partition('@')
+    first, _, rest = name.partition('/')
+    if not rest or ('.' not in first and ':' not in first and first != 'localhost'):
+        name = 'docker.io/' + (name if rest else 'library/' + name)
+    if not digest and ':' not in name.rsplit('/', 1)[-1]:
+        name += ':latest'
+    return name + ('@' + digest if digest else '')
+
+
+def repository(reference):
+    name = reference.partition('@')[0]
+    last = name.rsplit('/', 1)[-1]
+    return name[:len(name) - len(last)] + last.partition(':')[0]
+
+
+def identity(reference):
+    """Dedup key: repository@digest for pinned references, the reference otherwise"""
+    name, _, digest = reference.partition('@')
+    return repository(name) + '@' + digest if digest else name
+
+
+def read_images(path):
+    """Normalized, deduplicated image list; blank lines and # comments are ignored"""
+    images, seen = [], set()
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            reference = normalize(line)
+            if identity(reference) not in seen:
+                seen.add(identity(reference))
+                images.append(reference)
+    return images
+
+
+class Runtime:
+    """Container runtime CLI with crictl's interface"""
+
+    def __init__(self, command, timeout):
+        self.command = shlex.split(command)
+        self.timeout = timeout
+
+    def _run(self, *args):
+        result = subprocess.run(self.command + list(args), capture_output=True, text=True, timeout=self.timeout)
+        if result.returncode:
+            raise RuntimeError((result.stderr or result.stdout).strip() or f'exit status {result.returncode}')
+        return result.stdout
+
+    def present(self):
+        """Every reference (tags and repository@digest) of the images on the node"""
+        references = set()
+        for image in json.loads(self._run('images', '-o', 'json')).get('images') or []:
+            references.update(image.get('repoTags') or [])
+            references.update(image.get('repoDigests') or [])
+        return references
+
+    def pull(self, reference):
+        """Pull the image; returns its references and image id"""
+        self._run('pull', reference)
+        status = json.loads(self._run('inspecti', '-o', 'json', reference)).get('status') or {}
+        return set(status.get('repoTags') or []) | set(status.get('repoDigests') or []), status.get('id')
+
+
+class Status:
+    """The node's progress, merged into its key of the status ConfigMap"""
+
+    def __init__(self, kube, namespace, configmap, node, images, interval=2.0):
+        self.kube, self.namespace, self.configmap, self.node = kube, namespace, configmap, node
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.published = 0.0
+        self.start = time.monotonic()
+        self.state = {
+            'node': node,
+            'phase': 'Pulling',
+            'started': utcnow(),
+            'images': {image: {'state': 'pending'} for image in images},
+        }
+
+    def update(self, image, **fields):
+        with self.lock:
+            self.state['images'][image] = fields
+        self.publish()
+
+    def summary(self):
+        counts = dict.fromkeys(('pending', 'pulling', 'present', 'pulled', 'failed'), 0)
+        for image in self.state['images'].values():
+            counts[image['state']] = counts.get(image['state'], 0) + 1
+        return dict(counts, total=len(self.state['images']))
+
+    def finish(self):
+        with self.lock:
+            self.state['phase'] = 'Failed' if self.summary().get('failed') else 'Complete'
+            self.state['duration_s'] = round(time.monotonic() - self.start, 1)
+        self.publish(force=True)
+
+    def publish(self, force=False):
+        """Write the node's status, at most once per interval unless forced"""
+        with self.lock:
+            if not force and time.monotonic() - self.published < self.interval:
+                return
+            self.published = time.monotonic()
+            self.state.update(self.summary(), updated=utcnow())
+            document = json.dumps(self.state, sort_keys=True)
+        if not self.configmap:
+            return
+        path = f'/api/v1/namespaces/{self.namespace}/configmaps/{self.configmap}'
+        patch = {'data': {self.node: document}}
+        try:
+            # A merge patch only touches this node's key, so nodes never conflict
+            self.kube.request('PATCH', path, body=patch, content_type='application/merge-patch+json')
+        except ApiError as e:
+            if e.status != 404:
+                print(f'Could not publish status: {e}', file=sys.stderr)
+                return
+            body = {'apiVersion': 'v1', 'kind': 'ConfigMap',
+                    'metadata': {'name': self.configmap, 'namespace': self.namespace}, 'data': patch['data']}
+            try:
+                self.kube.request('POST', f'/api/v1/namespaces/{self.namespace}/configmaps', body=body)
+            except ApiError as e:
+                if e.status != 409:
+                    raise
+                self.kube.request('PATCH', path, body=patch, content_type='application/merge-patch+json')
+
+
+def warm(runtime, images, status, concurrency, retries):
+    """Pull every image the node does not have yet, concurrency at a time"""
+    present = runtime.present()
+    lock = threading.Lock()
+    pulled_ids = {}
+
+    def pull(image):
+        with lock:
+            if image in present:
+                status.update(image, state='present')
+                return
+        status.update(image, state='pulling', since=utcnow())
+        start = time.monotonic()
+        for attempt in range(retries + 1):
+            try:
+                references, image_id = runtime.pull(image)
+                break
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                error = str(e)
+                if attempt < retries:
+                    time.sleep(min(2 ** attempt, 30))
+        else:
+            status.update(image, state='failed', seconds=round(time.monotonic() - start, 1), error=error[-300:])
+            print(f'Failed to pull {image}: {error}', file=sys.stderr)
+            return
+        seconds = round(time.monotonic() - start, 1)
+        with lock:
+            present.update(references)
+            same_as = pulled_ids.setdefault(image_id, image) if image_id else image
+        fields = {'state': 'pulled', 'seconds': seconds, 'id': image_id}
+        if same_as != image:
+            fields['same_as'] = same_as
+        status.update(image, **fields)
+        print(f'Pulled {image} in {seconds}s')
+
+    def pull_repository(references):
+        for image in references:
+            pull(image)
+
+    # References to one repository are pulled one after another, pinned ones
+    # last: a tag pulled first often brings their digest, and they share layers
+    repositories = {}
+    for image in sorted(images, key=lambda image: '@' in image):
+        repositories.setdefault(repository(image), []).append(image)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for future in [pool.submit(pull_repository, references) for references in repositories.values()]:
+            future.result()
+    status.finish()
+    return status.state
+
+
+def cmd_pull(args):
+    images = read_images(args.images)
+    kube = Kube(args.api) if args.status_configmap else None
+    status = Status(kube, args.namespace, args.status_configmap, args.node, images)
+    status.publish(force=True)
+    print(f'=== Warming {args.node}: {len(images)} images, {args.concurrency} pulls at a time ===')
+    state = warm(Runtime(args.runtime, args.pull_timeout), images, status, args.concurrency, args.retries)
+    print(json.dumps({key: value for key, value in state.items() if key != 'images'}, sort_keys=True))
+    if state['phase'] != 'Complete':
+        return 1
+    if args.when_done == 'sleep':
+        # Keeps a DaemonSet pod Ready without restarting the pulls
+        signal.pause()
+    return 0
+
+
+def node_job(template, node, namespace, ttl, backoff_limit):
+    name = 'image-prepull-' + hashlib.sha256(node.encode()).hexdigest()[:10]
+    spec = json.loads(json.dumps(template))
+    spec['nodeName'] = node
+    spec['restartPolicy'] = 'Never'
+    spec.pop('nodeSelector', None)
+    labels = {COMPONENT_LABEL: NODE_COMPONENT, NODE_LABEL: name}
+    return {
+        'apiVersion': 'batch/v1',
+        'kind': 'Job',
+        'metadata': {'name': name, 'namespace': namespace, 'labels': labels,
+                     'annotations': {NODE_LABEL: node}},
+        'spec': {
+            'backoffLimit': backoff_limit,
+            'ttlSecondsAfterFinished': ttl,
+            'template': {'metadata': {'labels': labels}, 'spec': spec},
+        },
+    }
+
+
+def job_finished(job):
+    for condition in (job.get('status') or {}).get('conditions') or []:
+        if condition['type'] in ('Complete', 'Failed') and condition['status'] == 'True':
+            return condition['type']
+    return None
+
+
+def cmd_launch(args):
+    kube = Kube(args.api)
+    start = time.monotonic()
+    jobs_path = f'/apis/batch/v1/namespaces/{args.namespace}/jobs'
+    nodes = sorted(node['metadata']['name'] for node in
+                   kube.list('/api/v1/nodes', {'labelSelector': args.node_selector})['items'])
+    if not nodes:
+        print(f'No nodes match {args.node_selector!r}', file=sys.stderr)
+        return 1
+    with open(args.pod_template) as f:
+        template = json.load(f)
+
+    # Jobs from a previous launch would otherwise block the new ones by name
+    for job in kube.list(jobs_path, {'labelSelector': f'{COMPONENT_LABEL}={NODE_COMPONENT}'})['items']:
+        kube.request('DELETE', f"{jobs_path}/{job['metadata']['name']}",
+                     body={'propagationPolicy': 'Background'})
+
+    # Fresh status: every selected node pending, nodes that left the selection removed
+    configmap = f'/api/v1/namespaces/{args.namespace}/configmaps/{args.status_configmap}'
+    try:
+        current = kube.request('GET', configmap).get('data') or {}
+    except ApiError as e:
+        if e.status != 404:
+            raise
+        kube.request('POST', f'/api/v1/namespaces/{args.namespace}/configmaps', body={
+            'apiVersion': 'v1', 'kind': 'ConfigMap',
+            'metadata': {'name': args.status_configmap, 'namespace': args.namespace}})
+        current = {}
+    data = {node: None for node in current if node not in nodes}
+    data.update({node: json.dumps({'node': node, 'phase': 'Pending'}) for node in nodes})
+    kube.request('PATCH', configmap, body={'data': data}, content_type='application/merge-patch+json')
+
+    names = {}
+    for node in nodes:
+        job = node_job(template, node, args.namespace, args.ttl, args.retries)
+        for attempt in range(30):
+            try:
+                kube.request('POST', jobs_path, body=job)
+                break
+            except ApiError as e:
+                # The deleted Job of the previous launch may still be going away
+                if e.status != 409 or attempt == 29:
+                    raise
+                time.sleep(1)
+        names[job['metadata']['name']] = node
+    print(f'=== Started {len(names)} pre-pull Jobs: {", ".join(nodes)} ===')
+
+    finished = {}
+    selector = {'labelSelector': f'{COMPONENT_LABEL}={NODE_COMPONENT}'}
+    while len(finished) < len(names):
+        remaining = args.timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        listed = kube.list(jobs_path, selector)
+        for job in listed['items']:
+            if job['metadata']['name'] in names and job_finished(job):
+                finished[job['metadata']['name']] = job_finished(job)
+        if len(finished) == len(names):
+            break
+        try:
+            for kind, job in kube.watch(jobs_path, selector, listed['metadata']['resourceVersion'], min(remaining, 300)):
+                name = job['metadata']['name']
+                if kind != 'ERROR' and name in names and job_finished(job):
+                    finished[name] = job_finished(job)
+                    print(f'{names[name]}: {finished[name]} after {time.monotonic() - start:.0f}s')
+                    if len(finished) == len(names):
+                        break
+        except ApiError as e:
+            # 410 Gone: relist and watch again
+            if e.status != 410:
+                raise
+
+    data = kube.request('GET', configmap).get('data') or {}
+    report = {'nodes': {}, 'duration_s': round(time.monotonic() - start, 1)}
+    for name, node in sorted(names.items(), key=lambda item: item[1]):
+        state = json.loads(data.get(node) or '{}')
+        report['nodes'][node] = {key: state.get(key) for key in
+                                 ('phase', 'total', 'present', 'pulled', 'failed', 'duration_s')}
+        report['nodes'][node]['job'] = finished.get(name, 'Timeout')
+    print(json.dumps(report, indent=2))
+    return 0 if all(result == 'Complete' for result in finished.values()) and len(finished) == len(names) else 1
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Pre-pull container images on cluster nodes')
+    parser.add_argument('--api', default=os.environ.get('KUBE_API'),
+                        help='API server URL (default: $KUBE_API, or the in-cluster API)')
+    parser.add_argument('--namespace', default=os.environ.get('NAMESPACE'),
+                        help='Namespace of the status ConfigMap and Jobs (default: $NAMESPACE)')
+    parser.add_argument('--status-configmap', default=os.environ.get('PREPULL_STATUS_CONFIGMAP', ''),
+                        help='ConfigMap receiving per-node status (default: $PREPULL_STATUS_CONFIGMAP)')
+    parser.add_argument('--images', default='/config/images.txt',
+                        help='File with one image reference per line')
+    parser.add_argument('--retries', type=int, default=int(os.environ.get('PREPULL_RETRIES', 2)),
+                        help='Retries of a failed pull, and of a failed node Job for launch')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    pull = commands.add_parser('pull', help='Warm the node this runs on')
+    pull.add_argument('--node', default=os.environ.get('NODE_NAME'),
+                      help='Name of this node (default: $NODE_NAME)')
+    pull.add_argument('--concurrency', type=int, default=int(os.environ.get('PREPULL_CONCURRENCY', 3)),
+                      help='Pulls running at the same time (default: $PREPULL_CONCURRENCY or 3)')
+    pull.add_argument('--pull-timeout', type=int, default=int(os.environ.get('PREPULL_PULL_TIMEOUT', 1800)),
+                      help='Seconds one pull may take (default: $PREPULL_PULL_TIMEOUT or 1800)')
+    pull.add_argument('--runtime', default=os.environ.get('PREPULL_RUNTIME', 'crictl'),
+                      help='Runtime CLI command (default: $PREPULL_RUNTIME or crictl)')
+    pull.add_argument('--when-done', choices=('exit', 'sleep'), default='exit',
+                      help='Exit once the node is warm, or sleep (for a DaemonSet)')
+    pull.set_defaults(func=cmd_pull)
+
+    launch = commands.add_parser('launch', help='Run one pull Job per node and wait for them')
+    launch.add_argument('--node-selector', default=os.environ.get('PREPULL_NODE_SELECTOR', ''),
+                        help='Label selector of the nodes to warm (default: $PREPULL_NODE_SELECTOR)')
+    launch.add_argument('--pod-template', default='/config/pod-template.json',
+                        help='Pod spec of the per-node Jobs')
+    launch.add_argument('--timeout', type=int, default=int(os.environ.get('PREPULL_TIMEOUT', 3600)),
+                        help='Seconds to wait for every node (default: $PREPULL_TIMEOUT or 3600)')
+    launch.add_argument('--ttl', type=int, default=600,
+                        help='ttlSecondsAfterFinished of the per-node Jobs (default: 600)')
+    launch.set_defaults(func=cmd_launch)
+
+    args = parser.parse_args(argv)
+    required = ['node'] if args.command == 'pull' else ['namespace', 'status_configmap']
+    if args.status_configmap:
+        required.append('namespace')
+    for name in required:
+        if not getattr(args, name):
+            parser.error(f"--{name.replace('_', '-')} is required")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+{{/*
+Pod spec of the prepull controller; "whenDone" is "sleep" for the DaemonSet
+and "exit" for the per-node Jobs of the launcher
+*/}}
+{{- define "image-prepull.controllerPodSpec" -}}
+{{- $values := .root.Values -}}
+serviceAccountName: image-prepull
+tolerations:
+- operator: Exists
+nodeSelector:
+  {{- toYaml $values.nodeSelector | nindent 2 }}
+containers:
+- name: prepull
+  image: {{ $values.controller.image }}
+  command: ["python3", "/config/prepull.py", "pull", "--when-done", {{ .whenDone | quote }}]
+  env:
+  - name: NODE_NAME
+    valueFrom:
+      fieldRef:
+        fieldPath: spec.nodeName
+  - name: NAMESPACE
+    value: {{ $values.namespace | quote }}
+  - name: PREPULL_STATUS_CONFIGMAP
+    value: {{ $values.controller.statusConfigMap | quote }}
+  - name: PREPULL_CONCURRENCY
+    value: {{ $values.controller.concurrency | quote }}
+  - name: PREPULL_RETRIES
+    value: {{ $values.controller.retries | quote }}
+  - name: PREPULL_PULL_TIMEOUT
+    value: {{ $values.controller.pullTimeout | quote }}
+  - name: PREPULL_RUNTIME
+    value: {{ $values.controller.runtimeCommand | quote }}
+  securityContext:
+    privileged: true
+    runAsUser: 0
+  resources:
+    {{- toYaml $values.controller.resources | nindent 4 }}
+  volumeMounts:
+  - name: config
+    mountPath: /config
+    readOnly: true
+  - name: host
+    mountPath: /host
+volumes:
+- name: config
+  configMap:
+    name: image-prepull-config
+- name: host
+  hostPath:
+    path: /
+    type: Directory
+{{- end }}
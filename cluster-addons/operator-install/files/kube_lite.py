@@ -0,0 +1,80 @@
+"""
+Just enough of a Kubernetes client for the charts' standard-library scripts
+
+    from kube_lite import ApiError, Kube
+
+    kube = Kube(args.api)
+    listed = kube.list('/api/v1/namespaces/demo/configmaps', {'labelSelector': 'app=demo'})
+    for event_type, obj in kube.watch(path, query, listed['metadata']['resourceVersion'], 300):
+        ...
+
+The charts carry a copy of this file in their files/ directory, kept in step
+by lib/copies.py, and ship it in the same ConfigMap as the scripts that import
+it, so it is found next to them.
+
+Only the Python standard library is used. The API server is the in-cluster
+one, with the service account's token and CA, unless a server URL is given:
+a plain HTTP server, such as the stand-in of tests/benchmarks/fake_api.py.
+"""
+
+import json
+import os
+import ssl
+import urllib.error
+import urllib.parse
+import urllib.request
+
+SERVICE_ACCOUNT = '/var/run/secrets/kubernetes.io/serviceaccount'
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+
+
+class Kube:
+
+    def __init__(self, server=None):
+        self.context = None
+        if server:
+            self.server = server.rstrip('/')
+        else:
+            host = os.environ['KUBERNETES_SERVICE_HOST']
+            port = os.environ.get('KUBERNETES_SERVICE_PORT', '443')
+            self.server = f'https://{host}:{port}'
+            self.context = ssl.create_default_context(cafile=os.path.join(SERVICE_ACCOUNT, 'ca.crt'))
+
+    def _open(self, method, path, query=None, body=None, content_type='application/json', timeout=30):
+        url = self.server + path + ('?' + urllib.parse.urlencode(query) if query else '')
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(url, data=data, method=method)
+        request.add_header('Accept', 'application/json')
+        if data is not None:
+            request.add_header('Content-Type', content_type)
+        if self.context:
+            # Bound tokens are rotated; read the current one every time
+            with open(os.path.join(SERVICE_ACCOUNT, 'token')) as f:
+                request.add_header('Authorization', 'Bearer ' + f.read().strip())
+        try:
+            return urllib.request.urlopen(request, context=self.context, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            raise ApiError(e.code, e.read().decode(errors='replace')[:200]) from None
+
+    def request(self, method, path, body=None, content_type='application/json', query=None):
+        with self._open(method, path, query, body, content_type) as response:
+            return json.load(response)
+
+    def list(self, path, query=None):
+        return self.request('GET', path, query=query)
+
+    def watch(self, path, query, resource_version, timeout, bookmarks=False):
+        """Yield (type, object) events until the server ends the watch"""
+        query = dict(query or {}, watch='1', resourceVersion=resource_version, timeoutSeconds=str(max(1, int(timeout))))
+        if bookmarks:
+            query['allowWatchBookmarks'] = 'true'
+        with self._open('GET', path, query, timeout=timeout + 30) as response:
+            for line in response:
+                if line.strip():
+                    event = json.loads(line)
+                    yield event['type'], event['object']
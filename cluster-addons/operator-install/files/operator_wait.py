@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Readiness barrier of the operator-install addon
+
+    operator_wait.py --operator openshift-operators/web-terminal --operator openshift-cnv/kubevirt-hyperconverged
+
+Waits until every listed Subscription's InstallPlan is Complete and its CSV
+has Succeeded, or its InstallPlan waits for manual approval
+(installPlanApproval: Manual), which nothing in the sync will give. The
+Subscriptions, InstallPlans and ClusterServiceVersions of
+every namespace are followed with one watch each, all at the same time, so
+the wait ends as soon as the slowest operator is ready. The wait fails when
+an InstallPlan fails or the timeout passes.
+
+Either way it prints a per-operator report. The report shows when the
+Subscription was resolved to a CSV, when the InstallPlan completed, and when
+the CSV succeeded, in seconds from the start of the wait. An operator that is
+not ready shows where it is stuck: no Subscription, a resolution failure, an
+InstallPlan waiting for manual approval, or the CSV's phase and reason.
+
+Only the Python standard library is used. The API server is the in-cluster
+one unless --api (or KUBE_API) points to another, plain HTTP server.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from kube_lite import ApiError, Kube
+
+OLM = '/apis/operators.coreos.com/v1alpha1'
+KINDS = ('subscriptions', 'installplans', 'clusterserviceversions')
+
+# States the wait ends in; an operator waiting for approval does not fail it
+SETTLED = ('Succeeded', 'RequiresApproval')
+
+
+class Operator:
+    """Progress of one Subscription, in seconds since the wait started"""
+
+    def __init__(self, namespace, name):
+        self.namespace = namespace
+        self.name = name
+        self.csv = None
+        self.installplan = None
+        self.resolved_s = None
+        self.installplan_s = None
+        self.succeeded_s = None
+        self.state = 'Pending'
+        self.message = 'Subscription not found'
+
+    @property
+    def key(self):
+        return f'{self.namespace}/{self.name}'
+
+    @property
+    def ready(self):
+        return self.state == 'Succeeded'
+
+    @property
+    def settled(self):
+        return self.state in SETTLED
+
+    def report(self):
+        return {'csv': self.csv, 'installplan': self.installplan,
+                'resolved_s': self.resolved_s, 'installplan_s': self.installplan_s,
+                'succeeded_s': self.succeeded_s, 'state': self.state, 'message': self.message}
+
+
+class Barrier:
+    """Latest OLM objects of the watched namespaces, and every operator's progress"""
+
+    def __init__(self, operators, clock=time.monotonic):
+        self.operators = operators
+        self.clock = clock
+        self.start = clock()
+        self.objects = {kind: {} for kind in KINDS}
+        self.cond = threading.Condition()
+        self.errors = []
+
+    def replace(self, kind, namespace, items):
+        """A fresh list of kind in namespace"""
+        with self.cond:
+            current = self.objects[kind]
+            for key in [key for key in current if key[0] == namespace]:
+                del current[key]
+            for obj in items:
+                current[(namespace, obj['metadata']['name'])] = obj
+            self._evaluate()
+
+    def event(self, kind, event_type, obj):
+        with self.cond:
+            key = (obj['metadata'].get('namespace'), obj['metadata']['name'])
+            if event_type == 'DELETED':
+                self.objects[kind].pop(key, None)
+            else:
+                self.objects[kind][key] = obj
+            self._evaluate()
+
+    def fail(self, message):
+        with self.cond:
+            self.errors.append(message)
+            self.cond.notify_all()
+
+    @property
+    def done(self):
+        return all(operator.settled or operator.state == 'Failed' for operator in self.operators)
+
+    def _evaluate(self):
+        now = round(self.clock() - self.start, 1)
+        for operator in self.operators:
+            if operator.ready or operator.state == 'Failed':
+                continue
+            subscription = self.objects['subscriptions'].get((operator.namespace, operator.name))
+            if subscription is None:
+                operator.state, operator.message = 'Pending', 'Subscription not found'
+                continue
+            status = subscription.get('status') or {}
+            operator.csv = status.get('installedCSV') or status.get('currentCSV')
+            operator.installplan = (status.get('installPlanRef') or {}).get('name')
+            if not operator.csv:
+                failed = [condition.get('message') or condition['type'] for condition in status.get('conditions') or []
+                          if condition.get('type') == 'ResolutionFailed' and condition.get('status') == 'True']
+                operator.state = 'Resolving'
+                operator.message = failed[0] if failed else 'Waiting for a CSV'
+                continue
+            if operator.resolved_s is None:
+                operator.resolved_s = now
+
+            installplan = self.objects['installplans'].get((operator.namespace, operator.installplan)) or {}
+            phase = (installplan.get('status') or {}).get('phase')
+            if phase == 'Complete' and operator.installplan_s is None:
+                operator.installplan_s = now
+            elif phase == 'Failed':
+                operator.state = 'Failed'
+                operator.message = 'InstallPlan %s failed' % operator.installplan
+                continue
+
+            csv = self.objects['clusterserviceversions'].get((operator.namespace, operator.csv)) or {}
+            csv_status = csv.get('status') or {}
+            if csv_status.get('phase') == 'Succeeded':
+                operator.state, operator.message = 'Succeeded', ''
+                operator.succeeded_s = now
+                # An InstallPlan already gone from the cache completed before its CSV succeeded
+                if operator.installplan_s is None:
+                    operator.installplan_s = now
+            elif phase == 'RequiresApproval':
+                operator.state = 'RequiresApproval'
+                operator.message = 'InstallPlan %s requires approval' % operator.installplan
+            else:
+                operator.state = 'Installing'
+                operator.message = 'CSV %s' % ' '.join(
+                    filter(None, [csv_status.get('phase') or 'not created', csv_status.get('reason')]))
+        self.cond.notify_all()
+
+
+def follow(kube, barrier, namespace, kind, deadline):
+    """List, then watch kind in namespace until the barrier is done or the deadline passes"""
+    path = f'{OLM}/namespaces/{namespace}/{kind}'
+    while not barrier.done:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            listed = kube.list(path)
+            barrier.replace(kind, namespace, listed['items'])
+            resource_version = listed['metadata']['resourceVersion']
+            for event_type, obj in kube.watch(path, None, resource_version, min(remaining, 300), bookmarks=True):
+                if event_type == 'ERROR':
+                    # Usually 410 Gone: relist and watch again
+                    break
+                if event_type == 'BOOKMARK':
+                    continue
+                barrier.event(kind, event_type, obj)
+                if barrier.done:
+                    return
+        except ApiError as e:
+            if e.status != 410:
+                barrier.fail(f'{kind} in {namespace}: {e}')
+                return
+        except (OSError, ValueError) as e:
+            # A dropped watch; list again after a pause
+            print(f'{kind} in {namespace}: {e}, listing again', file=sys.stderr)
+            time.sleep(2)
+
+
+def print_table(operators):
+    print(f"{'OPERATOR':<40} {'NAMESPACE':<30} {'RESOLVED':>9} {'INSTALLED':>10} {'SUCCEEDED':>10}  STATE")
+    for operator in operators:
+        times = [f'{seconds:.0f}s' if seconds is not None else '-' for seconds in
+                 (operator.resolved_s, operator.installplan_s, operator.succeeded_s)]
+        state = operator.state + (f' ({operator.message})' if operator.message else '')
+        print(f'{operator.name:<40} {operator.namespace:<30} {times[0]:>9} {times[1]:>10} {times[2]:>10}  {state}')
+
+
+def wait(kube, operators, timeout):
+    barrier = Barrier(operators)
+    deadline = time.monotonic() + timeout
+    for namespace in sorted(set(operator.namespace for operator in operators)):
+        for kind in KINDS:
+            threading.Thread(target=follow, args=(kube, barrier, namespace, kind, deadline), daemon=True).start()
+
+    reported = {}
+    with barrier.cond:
+        while not barrier.done and not barrier.errors and time.monotonic() < deadline:
+            barrier.cond.wait(min(5.0, max(0.0, deadline - time.monotonic())))
+            for operator in operators:
+                if reported.get(operator.key) != operator.state:
+                    reported[operator.key] = operator.state
+                    print(f'{operator.key}: {operator.state} after '
+                          f'{time.monotonic() - barrier.start:.0f}s {operator.message}'.rstrip())
+        for operator in operators:
+            if not operator.settled and operator.state != 'Failed' and time.monotonic() >= deadline:
+                operator.message = f'timed out after {timeout}s: {operator.message}'
+        duration = round(time.monotonic() - barrier.start, 1)
+        errors = list(barrier.errors)
+
+    print_table(operators)
+    report = {'duration_s': duration, 'operators': {operator.key: operator.report() for operator in operators}}
+    if errors:
+        report['errors'] = errors
+    print(json.dumps(report, indent=2))
+    return 0 if all(operator.settled for operator in operators) else 1
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Wait until every operator is installed')
+    parser.add_argument('--api', default=os.environ.get('KUBE_API'),
+                        help='API server URL (default: $KUBE_API, or the in-cluster API)')
+    parser.add_argument('--operator', metavar='NAMESPACE/NAME', action='append', required=True,
+                        help='Subscription to wait for; repeat for every operator')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('OPERATOR_WAIT_TIMEOUT', 1200)),
+                        help='Seconds to wait for all operators (default: $OPERATOR_WAIT_TIMEOUT or 1200)')
+    args = parser.parse_args(argv)
+    for operator in args.operator:
+        if operator.count('/') != 1 or not all(operator.split('/')):
+            parser.error(f'--operator {operator!r} is not NAMESPACE/NAME')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    operators = [Operator(*operator.split('/')) for operator in args.operator]
+    return wait(Kube(args.api), operators, args.timeout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+{{/*
+Operators to install: .Values.operators, or .Values.operator alone when the
+list is empty. List entries take namespace, source, sourceNamespace and
+installPlanApproval from .Values.operator and createNamespace from the top
+level unless they set their own.
+*/}}
+{{- define "operator-install.operators" -}}
+{{- $defaults := .Values.operator -}}
+operators:
+{{- range (.Values.operators | default (list .Values.operator)) }}
+- name: {{ required "every operator needs a name" .name | quote }}
+  namespace: {{ .namespace | default $defaults.namespace | quote }}
+  {{- with .channel }}
+  channel: {{ . | quote }}
+  {{- end }}
+  source: {{ .source | default $defaults.source | quote }}
+  sourceNamespace: {{ .sourceNamespace | default $defaults.sourceNamespace | quote }}
+  installPlanApproval: {{ .installPlanApproval | default $defaults.installPlanApproval | quote }}
+  {{- with .startingCSV }}
+  startingCSV: {{ . | quote }}
+  {{- end }}
+  createNamespace: {{ ternary .createNamespace $.Values.createNamespace (hasKey . "createNamespace") }}
+  {{- if hasKey . "operatorGroup" }}
+  operatorGroup:
+    {{- toYaml (.operatorGroup | default dict) | nindent 4 }}
+  {{- end }}
+{{- end }}
+{{- end }}
+
+{{/*
+Name of the readiness barrier Job and its RBAC
+*/}}
+{{- define "operator-install.waitName" -}}
+{{- printf "%s-wait" .Release.Name | trunc 63 | trimSuffix "-" }}
+{{- end }}
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Gateway route patcher of the rhoai addon
+
+    gateway_route.py --timeout 900
+
+Exposes the Gateway's LoadBalancer Service with an OpenShift Route, which
+works around the lack of a real LoadBalancer in CRC and similar clusters:
+
+1. Finds the first Gateway (by namespace and name) whose name matches
+   --gateway, and the Service labelled with its name in its namespace.
+2. Creates the Route gateway-lb-<gateway> in that namespace, or patches it
+   when it already exists, for the https listener's hostname.
+3. Sets the Route's hostname in the Service's LoadBalancer status.
+
+Gateways and Services are each listed once and then followed with a watch
+into one cache, so the Route is made as soon as both exist, however long the
+operator takes to create them. The patcher fails when the timeout passes
+first, reporting which of them is missing.
+
+Based on https://github.com/jctanner/odh-security-2.0/blob/main/test.configs/make_route.sh
+
+Only the Python standard library is used. The API server is the in-cluster
+one unless --api (or KUBE_API) points to another, plain HTTP server.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from kube_lite import ApiError, Kube
+
+GATEWAY_LABEL = 'gateway.networking.k8s.io/gateway-name'
+GATEWAYS = '/apis/gateway.networking.k8s.io/v1/gateways'
+SERVICES = '/api/v1/services'
+ROUTES = '/apis/route.openshift.io/v1/namespaces/{namespace}/routes'
+
+
+class Cache:
+    """Latest Gateways and gateway Services, shared by the watches and the patcher"""
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.objects = {'gateways': {}, 'services': {}}
+        self.cond = threading.Condition()
+        self.errors = []
+        self.listed = set()
+        self.stopped = False
+
+    def replace(self, kind, items):
+        with self.cond:
+            self.objects[kind] = {(obj['metadata'].get('namespace'), obj['metadata']['name']): obj for obj in items}
+            self.listed.add(kind)
+            self.cond.notify_all()
+
+    def event(self, kind, event_type, obj):
+        with self.cond:
+            key = (obj['metadata'].get('namespace'), obj['metadata']['name'])
+            if event_type == 'DELETED':
+                self.objects[kind].pop(key, None)
+            else:
+                self.objects[kind][key] = obj
+            self.cond.notify_all()
+
+    def fail(self, message):
+        with self.cond:
+            self.errors.append(message)
+            self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+
+    def gateway(self):
+        """The first matching Gateway, the way kubectl get --all-namespaces orders them"""
+        for key in sorted(self.objects['gateways']):
+            if self.pattern.search(key[1]):
+                return self.objects['gateways'][key]
+        return None
+
+    def service(self, gateway):
+        """The first Service of gateway, by name"""
+        namespace, name = gateway['metadata']['namespace'], gateway['metadata']['name']
+        for key in sorted(self.objects['services']):
+            service = self.objects['services'][key]
+            if key[0] == namespace and (service['metadata'].get('labels') or {}).get(GATEWAY_LABEL) == name:
+                return service
+        return None
+
+
+def follow(kube, cache, kind, path, query, deadline):
+    """List, then watch path into cache until the cache is stopped or the deadline passes"""
+    while not cache.stopped:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        try:
+            listed = kube.list(path, query)
+            cache.replace(kind, listed['items'])
+            resource_version = listed['metadata']['resourceVersion']
+            for event_type, obj in kube.watch(path, query, resource_version, min(remaining, 300), bookmarks=True):
+                if event_type == 'ERROR':
+                    # Usually 410 Gone: relist and watch again
+                    break
+                if event_type == 'BOOKMARK':
+                    continue
+                cache.event(kind, event_type, obj)
+                if cache.stopped:
+                    return
+        except ApiError as e:
+            if e.status != 410:
+                cache.fail(f'{kind}: {e}')
+                return
+        except (OSError, ValueError) as e:
+            # A dropped watch; list again after a pause
+            print(f'{kind}: {e}, listing again', file=sys.stderr)
+            time.sleep(2)
+
+
+def route_for(gateway, service):
+    """The Route exposing service, for the https listener's hostname of gateway"""
+    namespace, name = gateway['metadata']['namespace'], gateway['metadata']['name']
+    hostnames = [listener.get('hostname') for listener in (gateway.get('spec') or {}).get('listeners') or []
+                 if listener.get('name') == 'https']
+    host = hostnames[0] if hostnames and hostnames[0] else f'{name}.{namespace}.apps-crc.testing'
+    return {
+        'apiVersion': 'route.openshift.io/v1',
+        'kind': 'Route',
+        'metadata': {
+            'name': f'gateway-lb-{name}',
+            'namespace': namespace,
+            'labels': {'gateway-lb-route': 'true', GATEWAY_LABEL: name},
+            'ownerReferences': [{'apiVersion': 'v1', 'kind': 'Service', 'name': service['metadata']['name'],
+                                 'uid': service['metadata']['uid'], 'controller': False,
+                                 'blockOwnerDeletion': False}],
+        },
+        'spec': {
+            'host': host,
+            'to': {'kind': 'Service', 'name': service['metadata']['name'], 'weight': 100},
+            'port': {'targetPort': 443},
+            'tls': {'termination': 'passthrough', 'insecureEdgeTerminationPolicy': 'Redirect'},
+        },
+    }
+
+
+def apply_route(kube, route):
+    """Create route, or patch it when it exists; returns 'created' or 'updated'"""
+    path = ROUTES.format(namespace=route['metadata']['namespace'])
+    try:
+        kube.request('POST', path, route)
+        return 'created'
+    except ApiError as e:
+        if e.status != 409:
+            raise
+    kube.request('PATCH', f"{path}/{route['metadata']['name']}", route, 'application/merge-patch+json')
+    return 'updated'
+
+
+def patch(kube, gateway_pattern, timeout):
+    cache = Cache(gateway_pattern)
+    start = time.monotonic()
+    deadline = start + timeout
+    for kind, path, query in (('gateways', GATEWAYS, None), ('services', SERVICES, {'labelSelector': GATEWAY_LABEL})):
+        threading.Thread(target=follow, args=(kube, cache, kind, path, query, deadline), daemon=True).start()
+
+    report = {'gateway': None, 'service': None, 'route': None}
+    gateway = service = reported = None
+    with cache.cond:
+        while not cache.errors:
+            gateway = cache.gateway()
+            service = cache.service(gateway) if gateway else None
+            if service:
+                break
+            waiting = 'a Gateway matching %r' % gateway_pattern.pattern if gateway is None else \
+                'the Service of Gateway %s/%s' % (gateway['metadata']['namespace'], gateway['metadata']['name'])
+            if waiting != reported and len(cache.listed) == len(cache.objects):
+                reported = waiting
+                print(f'Waiting for {waiting} after {time.monotonic() - start:.0f}s')
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                report['message'] = f'timed out after {timeout}s waiting for {waiting}'
+                break
+            cache.cond.wait(min(5.0, remaining))
+        errors = list(cache.errors)
+    cache.stop()
+
+    if errors:
+        report['errors'] = errors
+    elif service:
+        namespace = gateway['metadata']['namespace']
+        report['gateway'] = f"{namespace}/{gateway['metadata']['name']}"
+        report['service'] = f"{namespace}/{service['metadata']['name']}"
+        report['found_s'] = round(time.monotonic() - start, 1)
+        route = route_for(gateway, service)
+        try:
+            action = apply_route(kube, route)
+            report['route'] = f"{namespace}/{route['metadata']['name']}"
+            report['host'] = route['spec']['host']
+            print(f"Route {report['route']} {action} for https://{report['host']}")
+        except ApiError as e:
+            report['errors'] = [f"route {route['metadata']['name']}: {e}"]
+        if report['route']:
+            try:
+                kube.request('PATCH', f"/api/v1/namespaces/{namespace}/services/{service['metadata']['name']}/status",
+                             {'status': {'loadBalancer': {'ingress': [{'hostname': report['host']}]}}},
+                             'application/merge-patch+json')
+            except ApiError as e:
+                print(f'Unable to patch the status of Service {report["service"]}: {e}', file=sys.stderr)
+    report['duration_s'] = round(time.monotonic() - start, 1)
+    print(json.dumps(report, indent=2))
+    return 0 if report['route'] else 1
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Expose the Gateway with an OpenShift Route')
+    parser.add_argument('--api', default=os.environ.get('KUBE_API'),
+                        help='API server URL (default: $KUBE_API, or the in-cluster API)')
+    parser.add_argument('--gateway', default=os.environ.get('GATEWAY_ROUTE_GATEWAY', 'gateway'),
+                        help='Regular expression the Gateway name matches (default: $GATEWAY_ROUTE_GATEWAY or gateway)')
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('GATEWAY_ROUTE_TIMEOUT', 900)),
+                        help='Seconds to wait for the Gateway and its Service (default: $GATEWAY_ROUTE_TIMEOUT or 900)')
+    args = parser.parse_args(argv)
+    try:
+        args.gateway = re.compile(args.gateway)
+    except re.error as e:
+        parser.error(f'--gateway {args.gateway!r}: {e}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    return patch(Kube(args.api), args.gateway, args.timeout)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
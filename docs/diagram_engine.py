@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Declarative diagram engine for Field Content docs
+
+A diagram is a YAML or JSON spec with a figure size and a list of elements:
+
+    size: [14, 8]
+    elements:
+      - {type: container, x: 0.3, y: 4, width: 3.5, height: 2.5,
+         title: DEVELOPER, color: github_light, title_color: github}
+      - {type: box, x: 0.5, y: 2.5, width: 3.1, height: 1, color: github,
+         label: "Git Repository", fontsize: 9}
+      - {type: arrow, start: [2.05, 4], end: [2.05, 3.5], color: github}
+      - {type: text, x: 7, y: 7.5, text: "Title", fontsize: 18, fontweight: bold}
+
+Element types: box, container, panel, grid, legend, arrow, text.
+Color values are looked up in the theme (the `colors` table of
+create_diagram.py) and used literally when they are not theme keys.
+
+All boxes of a figure are drawn as a single PatchCollection and all arrows as
+one LineCollection plus one PolyCollection, instead of one artist per call, so
+large topology diagrams stay cheap to build and render.
+
+matplotlib (and PyYAML) are imported only when a spec is loaded or rendered,
+and a non-interactive backend is always selected first, so importing this
+module costs nothing and rendering never needs a display.
+"""
+
+import json
+import math
+import os
+
+# Defaults matching the original draw_box / draw_container / draw_arrow helpers
+BORDER = 'border'
+BOX_ROUNDING = 0.1
+CONTAINER_ROUNDING = 0.15
+TITLE_HEIGHT = 0.4
+ARROW_COLOR = '#666666'
+ARROW_WIDTH = 2
+# '-|>' head at mutation_scale=15: 0.4 and 0.2 of the scale, in points
+ARROW_HEAD_LENGTH = 6
+ARROW_HEAD_HALF_WIDTH = 3
+# FancyArrowPatch shrinks both ends by 2 points by default
+ARROW_SHRINK = 2
+# Non-interactive backend per output format
+BACKENDS = {'png': 'agg', 'svg': 'svg'}
+
+
+def load_spec(path):
+    """Load a diagram spec from a .yaml/.yml or .json file"""
+    with open(path) as f:
+        if os.path.splitext(path)[1] == '.json':
+            return json.load(f)
+        import yaml
+        return yaml.safe_load(f)
+
+
+def pyplot(fmt='png'):
+    """Import pyplot with the headless backend for fmt forced"""
+    import matplotlib
+    matplotlib.use(BACKENDS.get(fmt, 'agg'), force=True)
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class _Batch:
+    """Artists of one figure, collected per kind and added to the axes at once"""
+
+    def __init__(self, theme):
+        self.theme = theme
+        self.patches = []
+        self.arrows = []
+        self.texts = []
+
+    def color(self, value):
+        if value is None:
+            return None
+        return self.theme.get(value, value)
+
+    def patch(self, x, y, width, height, facecolor, edgecolor, linewidth, rounding):
+        from matplotlib.patches import FancyBboxPatch
+        self.patches.append(FancyBboxPatch(
+            (x, y), width, height,
+            boxstyle=f"round,pad=0.02,rounding_size={rounding}",
+            facecolor=self.color(facecolor), edgecolor=self.color(edgecolor), linewidth=linewidth))
+
+    def text(self, x, y, text, **kwargs):
+        kwargs.setdefault('ha', 'center')
+        kwargs.setdefault('va', 'center')
+        for key in ('color', 'backgroundcolor'):
+            if key in kwargs:
+                kwargs[key] = self.color(kwargs[key])
+        if 'bbox' in kwargs:
+            bbox = dict(kwargs['bbox'])
+            for key in ('facecolor', 'edgecolor'):
+                if key in bbox:
+                    bbox[key] = self.color(bbox[key])
+            kwargs['bbox'] = bbox
+        self.texts.append((x, y, text, kwargs))
+
+
+def _box(batch, el):
+    batch.patch(el['x'], el['y'], el['width'], el['height'],
+                el['color'], el.get('edgecolor', BORDER), el.get('linewidth', 1.5),
+                el.get('rounding', BOX_ROUNDING))
+    if el.get('label'):
+        batch.text(el['x'] + el['width'] / 2, el['y'] + el['height'] / 2, el['label'],
+                   fontsize=el.get('fontsize', 10), fontweight='bold',
+                   color=el.get('text_color', 'white'), wrap=True)
+
+
+def _container(batch, el):
+    x, y, width, height = el['x'], el['y'], el['width'], el['height']
+    batch.patch(x, y, width, height, el['color'], BORDER, 2, CONTAINER_ROUNDING)
+    batch.patch(x, y + height - TITLE_HEIGHT, width, TITLE_HEIGHT,
+                el.get('title_color', BORDER), 'none', 1, BOX_ROUNDING)
+    batch.text(x + width / 2, y + height - TITLE_HEIGHT / 2, el['title'],
+               fontsize=11, fontweight='bold', color='white')
+
+
+def _panel(batch, el):
+    batch.patch(el['x'], el['y'], el['width'], el['height'],
+                el['facecolor'], el.get('edgecolor', 'none'), el.get('linewidth', 1),
+                el.get('rounding', BOX_ROUNDING))
+
+
+def _grid(batch, el):
+    """A run of equally sized boxes laid out in rows of `columns`"""
+    columns = el.get('columns', 1)
+    dx, dy = el['step']
+    for i, item in enumerate(el['items']):
+        if not isinstance(item, dict):
+            item = {'label': item}
+        box = {key: value for key, value in el.items() if key not in ('type', 'items', 'step', 'columns')}
+        box.update(item)
+        box['x'] = el['x'] + (i % columns) * dx
+        box['y'] = el['y'] + (i // columns) * dy
+        _box(batch, box)
+
+
+def _legend(batch, el):
+    y = el['y']
+    batch.text(el['x'], y, el.get('title', 'Legend:'), ha='left', fontsize=9, fontweight='bold')
+    x = el['start']
+    for item in el['items']:
+        batch.patch(x, y - 0.15, 0.3, 0.3, item['color'], 'none', 1, 0.05)
+        batch.text(x + 0.4, y, item['label'], ha='left', fontsize=8)
+        x += el['step']
+
+
+def _arrow(batch, el):
+    batch.arrows.append((tuple(el['start']), tuple(el['end']), batch.color(el.get('color', ARROW_COLOR))))
+
+
+def _text(batch, el):
+    kwargs = {key: value for key, value in el.items() if key not in ('type', 'x', 'y', 'text')}
+    batch.text(el['x'], el['y'], el['text'], **kwargs)
+
+
+ELEMENTS = {
+    'box': _box,
+    'container': _container,
+    'panel': _panel,
+    'grid': _grid,
+    'legend': _legend,
+    'arrow': _arrow,
+    'text': _text,
+}
+
+
+def _arrow_collections(arrows, units_per_point):
+    """Build shafts and '-|>' heads for every arrow, sized in points like FancyArrowPatch"""
+    from matplotlib.collections import LineCollection, PolyCollection
+    shafts, heads, colors = [], [], []
+    shrink = ARROW_SHRINK * units_per_point
+    head_length = ARROW_HEAD_LENGTH * units_per_point
+    half_width = ARROW_HEAD_HALF_WIDTH * units_per_point
+    for (x0, y0), (x1, y1), color in arrows:
+        length = math.hypot(x1 - x0, y1 - y0)
+        if length == 0:
+            continue
+        ux, uy = (x1 - x0) / length, (y1 - y0) / length
+        sx, sy = x0 + ux * shrink, y0 + uy * shrink
+        tx, ty = x1 - ux * shrink, y1 - uy * shrink
+        bx, by = tx - ux * head_length, ty - uy * head_length
+        shafts.append([(sx, sy), (bx, by)])
+        heads.append([(tx, ty), (bx - uy * half_width, by + ux * half_width),
+                      (bx + uy * half_width, by - ux * half_width)])
+        colors.append(color)
+    return (LineCollection(shafts, colors=colors, linewidths=ARROW_WIDTH, capstyle='butt'),
+            PolyCollection(heads, facecolors=colors, edgecolors=colors, linewidths=ARROW_WIDTH,
+                           joinstyle='miter'))
+
+
+def construct(spec, theme, fmt='png'):
+    """Create the figure and its batched boxes and texts; returns (fig, ax, arrows)"""
+    from matplotlib.collections import PatchCollection
+
+    plt = pyplot(fmt)
+    width, height = spec['size']
+    fig, ax = plt.subplots(1, 1, figsize=(width, height))
+    ax.set_xlim(*spec.get('xlim', (0, width)))
+    ax.set_ylim(*spec.get('ylim', (0, height)))
+    ax.set_aspect('equal')
+    ax.axis('off')
+
+    batch = _Batch(dict(theme, **spec.get('theme', {})))
+    for el in spec['elements']:
+        try:
+            handler = ELEMENTS[el['type']]
+        except KeyError:
+            raise ValueError(f"Unknown diagram element type: {el.get('type')!r}") from None
+        handler(batch, el)
+
+    ax.add_collection(PatchCollection(batch.patches, match_original=True), autolim=False)
+    for x, y, text, kwargs in batch.texts:
+        ax.text(x, y, text, **kwargs)
+    return fig, ax, batch.arrows
+
+
+def layout(fig, ax, arrows):
+    """Lay out text with tight_layout, then add the arrows at the final scale"""
+    fig.tight_layout()
+    if arrows:
+        # Arrow heads are sized in points, so they need the final data-to-display scale
+        ax.apply_aspect()
+        (x0, _), (x1, _) = ax.transData.transform([(0, 0), (1, 0)])
+        for collection in _arrow_collections(arrows, fig.dpi / 72 / (x1 - x0)):
+            ax.add_collection(collection, autolim=False)
+
+
+def build_figure(spec, theme, fmt='png'):
+    """Build the figure for a spec; returns (fig, ax) ready to be saved"""
+    fig, ax, arrows = construct(spec, theme, fmt)
+    layout(fig, ax, arrows)
+    return fig, ax
+
+
+def save(fig, output, dpi=150, fmt='png'):
+    """Save and close a built figure; output is a path or a binary file object"""
+    fig.savefig(output, format=fmt, dpi=dpi, bbox_inches='tight', facecolor='white', edgecolor='none')
+    pyplot(fmt).close(fig)
+
+
+def render(spec, output_path, theme, dpi=150):
+    """Render a spec to output_path; the format (png, svg, ...) follows the extension"""
+    fmt = os.path.splitext(output_path)[1].lstrip('.') or 'png'
+    fig, _ = build_figure(spec, theme, fmt)
+    save(fig, output_path, dpi, fmt)
+    print(f"Saved: {output_path}")
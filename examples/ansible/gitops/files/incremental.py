@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Incremental runs of the ansible-runner Job
+
+    incremental.py check --commit 3f1c0a9...
+    incremental.py diff /tmp/ansible/diff.json
+    incremental.py record --commit 3f1c0a9...
+
+After every successful run, `record` stores the run's fingerprint in a
+ConfigMap: the commit of the playbook repository, a hash of the extra-vars,
+the playbook and a checksum of the chart's values and configuration. `check`
+compares the next Job's fingerprint with it before anything is installed or
+fetched and exits with
+
+    0  unchanged: the playbook can be skipped
+    1  changed since the recorded run: worth a check-mode diff first
+    2  no run recorded, or the ConfigMap cannot be read: run the playbook
+
+`diff` reads the results of the runner_diff callback of a check-mode run and
+exits with 0 when no task would change the cluster.
+
+Only the Python standard library is used, so `check` runs before the Job's
+setup. The API server is the in-cluster one unless --api (or KUBE_API) points
+to another, plain HTTP server. Namespace, ConfigMap, extra-vars, playbook and
+checksum default to the NAMESPACE, RUNNER_FINGERPRINT_CONFIGMAP, EXTRA_VARS,
+PLAYBOOK_PATH and RUNNER_CONFIG_CHECKSUM environment variables set by the
+chart.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sys
+import urllib.parse
+
+from kube_lite import ApiError, Kube
+
+FINGERPRINT_LABEL = 'demo.redhat.com/runner-fingerprint'
+# Fingerprint keys, in the order changes are reported
+KEYS = ('commit', 'extra_vars', 'playbook', 'config')
+
+
+def fingerprint(args):
+    return {
+        'commit': args.commit or '',
+        'extra_vars': hashlib.sha256(args.extra_vars.encode()).hexdigest(),
+        'playbook': args.playbook,
+        'config': args.config_checksum,
+    }
+
+
+def configmap_path(args, name=None):
+    path = f'/api/v1/namespaces/{urllib.parse.quote(args.namespace)}/configmaps'
+    return f'{path}/{urllib.parse.quote(name)}' if name else path
+
+
+def check(kube, args):
+    current = fingerprint(args)
+    if not current['commit']:
+        print('=== Unable to resolve the repository commit, running the playbook ===')
+        return 2
+    try:
+        recorded = kube.request('GET', configmap_path(args, args.configmap)).get('data') or {}
+    except ApiError as e:
+        if e.status == 404:
+            print('=== No successful run recorded, running the playbook ===')
+        else:
+            print(f'=== Unable to read ConfigMap {args.configmap} ({e}), running the playbook ===')
+        return 2
+    changed = [key for key in KEYS if recorded.get(key) != current[key]]
+    if not changed:
+        print(f"=== Unchanged since the successful run of {recorded.get('recorded_at', 'an earlier Job')}"
+              f" (commit {current['commit'][:12]}) ===")
+        return 0
+    details = ', '.join(f"commit {recorded.get('commit', '')[:12] or 'none'} -> {current['commit'][:12]}"
+                        if key == 'commit' else key for key in changed)
+    print(f'=== Changed since the last successful run: {details} ===')
+    return 1
+
+
+def record(kube, args):
+    data = dict(fingerprint(args), recorded_at=datetime.datetime.now(datetime.timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%SZ'), stage=args.stage)
+    body = {
+        'apiVersion': 'v1',
+        'kind': 'ConfigMap',
+        'metadata': {'name': args.configmap, 'namespace': args.namespace, 'labels': {FINGERPRINT_LABEL: 'true'}},
+        'data': data,
+    }
+    try:
+        kube.request('POST', configmap_path(args), body)
+    except ApiError as e:
+        if e.status != 409:
+            raise
+        kube.request('PUT', configmap_path(args, args.configmap), body)
+    print(f"=== Recorded commit {data['commit'][:12]} in ConfigMap {args.configmap} ===")
+    return 0
+
+
+def diff(args):
+    try:
+        with open(args.results) as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        results = {}
+    for difference in results.get('differences') or []:
+        print(f"=== Difference: {difference['task']} ({difference['action']}): {difference['reason']} ===")
+    if results.get('complete') and not results.get('differences'):
+        print('=== No task would change the cluster ===')
+        return 0
+    if not results.get('complete') and not results.get('differences'):
+        print('=== The check-mode run did not finish, running the playbook ===')
+    return 1
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Skip ansible-runner Jobs that would change nothing')
+    parser.add_argument('--api', default=os.environ.get('KUBE_API'),
+                        help='API server URL (default: $KUBE_API, or the in-cluster API)')
+    parser.add_argument('--namespace', default=os.environ.get('NAMESPACE'),
+                        help='Namespace of the ConfigMap (default: $NAMESPACE)')
+    parser.add_argument('--configmap', default=os.environ.get('RUNNER_FINGERPRINT_CONFIGMAP'),
+                        help='ConfigMap the fingerprint is recorded in (default: $RUNNER_FINGERPRINT_CONFIGMAP)')
+    parser.add_argument('--extra-vars', default=os.environ.get('EXTRA_VARS', ''),
+                        help='Extra-vars of the playbook (default: $EXTRA_VARS)')
+    parser.add_argument('--playbook', default=os.environ.get('PLAYBOOK_PATH', ''),
+                        help='Playbook (default: $PLAYBOOK_PATH)')
+    parser.add_argument('--config-checksum', default=os.environ.get('RUNNER_CONFIG_CHECKSUM', ''),
+                        help="Checksum of the chart's values and configuration (default: $RUNNER_CONFIG_CHECKSUM)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    check_parser = commands.add_parser('check', help='Compare with the last successful run')
+    check_parser.add_argument('--commit', required=True, help='Commit of the branch to run')
+    record_parser = commands.add_parser('record', help='Record a successful run')
+    record_parser.add_argument('--commit', required=True, help='Commit that was run')
+    record_parser.add_argument('--stage', default='playbook', choices=('playbook', 'diff'),
+                               help='Stage that found the cluster up to date (default: playbook)')
+    diff_parser = commands.add_parser('diff', help='Report the results of the runner_diff callback')
+    diff_parser.add_argument('results', help='JSON file written by the runner_diff callback')
+    args = parser.parse_args(argv)
+    if args.command != 'diff' and not (args.namespace and args.configmap):
+        parser.error('--namespace and --configmap are required')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command == 'diff':
+        return diff(args)
+    try:
+        kube = Kube(args.api)
+        if args.command == 'check':
+            return check(kube, args)
+        return record(kube, args)
+    except (ApiError, OSError, KeyError) as e:
+        print(f'Failed: {e}', file=sys.stderr)
+        return 2 if args.command == 'check' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
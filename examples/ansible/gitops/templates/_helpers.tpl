@@ -47,4 +47,18 @@ Selector labels
 {{- define "ansible-runner.selectorLabels" -}}
 app.kubernetes.io/name: {{ include "ansible-runner.name" . }}
 app.kubernetes.io/instance: {{ .Release.Name }}
+{{- end }}
+
+{{/*
+Name of the PersistentVolumeClaim holding the setup cache
+*/}}
+{{- define "ansible-runner.cacheClaimName" -}}
+{{- .Values.cache.persistentVolumeClaim.existingClaim | default (printf "%s-cache" (include "ansible-runner.fullname" .)) }}
+{{- end }}
+
+{{/*
+Name of the ConfigMap the fingerprint of the last successful run is stored in
+*/}}
+{{- define "ansible-runner.fingerprintConfigMap" -}}
+{{- .Values.incremental.configMapName | default (printf "%s-fingerprint" (include "ansible-runner.fullname" .)) }}
 {{- end }}
\ No newline at end of file
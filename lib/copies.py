@@ -0,0 +1,63 @@
+"""
+Keep the copies of shared files in step with their source
+
+    python3 lib/copies.py           # rewrite every copy from its source
+    python3 lib/copies.py --check   # list stale copies and fail, for CI
+
+Charts can only ship files from inside their own directory, and neither a
+chart that is packaged or synced on its own (cluster-addons is a repository
+root of its own) nor a folder copied out of the examples can follow a symlink
+that leaves it, so these are real copies. Edit the source, then run this.
+"""
+
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# source: copies, relative to the repository root
+COPIES = {
+    'lib/kube_lite.py': [
+        'cluster-addons/charts/openshift-gitops/files/kube_lite.py',
+        'cluster-addons/image-prepull/files/kube_lite.py',
+        'cluster-addons/operator-install/files/kube_lite.py',
+        'cluster-addons/rhoai/files/kube_lite.py',
+        'examples/ansible/gitops/files/kube_lite.py',
+    ],
+    'ansible-runner/helm-chart/files/fetch-repo.sh': ['examples/ansible/gitops/files/fetch-repo.sh'],
+    'ansible-runner/helm-chart/files/incremental.py': ['examples/ansible/gitops/files/incremental.py'],
+    'ansible-runner/helm-chart/files/runner_diff.py': ['examples/ansible/gitops/files/runner_diff.py'],
+    'ansible-runner/helm-chart/files/setup-env.sh': ['examples/ansible/gitops/files/setup-env.sh'],
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='only report copies that differ from their source')
+    args = parser.parse_args()
+
+    stale = []
+    for source, copies in COPIES.items():
+        for copy in copies:
+            path = os.path.join(ROOT, copy)
+            if os.path.isfile(path) and not os.path.islink(path) and filecmp.cmp(os.path.join(ROOT, source), path, shallow=False):
+                continue
+            stale.append(copy)
+            if not args.check:
+                if os.path.lexists(path):
+                    os.remove(path)
+                shutil.copy2(os.path.join(ROOT, source), path)
+                print(f'{copy}: updated from {source}')
+
+    if args.check and stale:
+        for copy in stale:
+            print(f'{copy}: differs from its source, run python3 lib/copies.py', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
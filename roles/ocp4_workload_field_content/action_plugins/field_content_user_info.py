@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+action: field_content_user_info
+short_description: Publish shared and per-user data to agnosticd_user_info in one task
+description:
+  - Publishes I(data) and every entry of I(users) through C(agnosticd.core.agnosticd_user_info) from
+    inside a single task, instead of one looped task invocation per user.
+  - The publisher is run in-process for each entry, so the stored user data is exactly what the
+    equivalent loop would have produced.
+  - C(agnosticd_user_info) has no bulk form, so it still stores its data once per entry. What the
+    task saves is the task executor overhead of a loop, not those writes.
+options:
+  data:
+    description: Data shared by all users, published without a user.
+    type: dict
+  users:
+    description: Mapping of user name to the data published for that user.
+    type: dict
+  publisher:
+    description: Action or module that stores the data.
+    type: str
+    default: agnosticd.core.agnosticd_user_info
+'''
+
+EXAMPLES = r'''
+- name: Publish ConfigMap data and every user in one task
+  field_content_user_info:
+    data: "{{ cm_userinfo.resources | field_content_userinfo_data }}"
+    users: "{{ (cm_userinfo.resources | field_content_users_json).users | default({}) }}"
+'''
+
+RETURN = r'''
+published_users:
+  description: Number of users published.
+  type: int
+  returned: always
+'''
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_native
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(('data', 'users', 'publisher'))
+
+    def _publisher(self, name, args):
+        """Build the publisher action for one call, like the task executor does for a looped task"""
+        task = self._task.copy()
+        task.action = name
+        task.args = args
+        return self._shared_loader_obj.action_loader.get(
+            name,
+            task=task,
+            connection=self._connection,
+            play_context=self._play_context,
+            loader=self._loader,
+            templar=self._templar,
+            shared_loader_obj=self._shared_loader_obj,
+        )
+
+    def _publish(self, name, args, task_vars):
+        if self._shared_loader_obj.action_loader.has_plugin(name):
+            return self._publisher(name, args).run(task_vars=task_vars)
+        return self._execute_module(module_name=name, module_args=args, task_vars=task_vars)
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        args = self._task.args
+        data = args.get('data') or {}
+        users = args.get('users') or {}
+        publisher = args.get('publisher') or 'agnosticd.core.agnosticd_user_info'
+        for name, value in (('data', data), ('users', users)):
+            if not isinstance(value, dict):
+                raise AnsibleActionFail('%s must be a dictionary, got %s' % (name, type(value).__name__))
+
+        calls = [dict(data=data)] if data else []
+        calls.extend(dict(user=user, data=user_data) for user, user_data in users.items())
+
+        facts = {}
+        for call in calls:
+            try:
+                call_result = self._publish(publisher, call, task_vars)
+            except Exception as e:
+                raise AnsibleActionFail('%s failed for %s: %s'
+                                        % (publisher, call.get('user', 'shared data'), to_native(e)))
+            if call_result.get('failed'):
+                result.update(call_result)
+                result['msg'] = '%s failed for %s: %s' % (publisher, call.get('user', 'shared data'),
+                                                          call_result.get('msg', 'unknown error'))
+                return result
+            result['changed'] = result.get('changed', False) or call_result.get('changed', False)
+            call_facts = call_result.get('ansible_facts')
+            if call_facts:
+                # Later calls see and override the facts of earlier ones, as with a loop
+                facts.update(call_facts)
+                task_vars = dict(task_vars or {}, **call_facts)
+
+        if facts:
+            result['ansible_facts'] = facts
+        result['published_users'] = len(users)
+        return result
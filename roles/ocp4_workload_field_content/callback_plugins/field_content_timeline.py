@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+name: field_content_timeline
+type: aggregate
+short_description: Record where provisioning time goes, as JSON and Prometheus metrics
+description:
+  - Records how long every task took on every host, how often it was retried and how long it
+    spent waiting. Waiting covers the delays between retries, C(pause), C(wait_for), the
+    C(elapsed) of the field content wait and teardown modules and C(k8s) waits.
+  - Tasks are grouped into phases, one per role, or per play for tasks outside a role.
+  - Stages timed before the playbook started are read from I(stages_file) and reported
+    alongside the phases. The ansible-runner Job writes setup, fetch and requirements there.
+  - At the end of the playbook the callback writes C(timeline.json) and C(metrics.prom), in the
+    Prometheus text format, to I(output_dir). With I(configmap), the callback also stores both
+    files in that ConfigMap with the C(demo.redhat.com/timeline) label. This needs the kubernetes
+    Python client.
+requirements:
+  - enable in configuration, for example with C(callbacks_enabled = field_content_timeline)
+options:
+  output_dir:
+    description: Directory the timeline and metrics files are written to.
+    type: path
+    default: ~/.ansible/field_content_timeline
+    env:
+      - name: FIELD_CONTENT_TIMELINE_DIR
+    ini:
+      - section: callback_field_content_timeline
+        key: output_dir
+  stages_file:
+    description:
+      - JSON lines file of stages timed before the playbook, one C({"name", "start", "end"})
+        object per line with epoch seconds.
+    type: path
+    env:
+      - name: FIELD_CONTENT_TIMELINE_STAGES
+    ini:
+      - section: callback_field_content_timeline
+        key: stages_file
+  labels:
+    description:
+      - Comma separated C(key=value) labels added to every metric, for example the order GUID.
+      - A label named like one the callback sets itself, such as C(phase) or C(status), gets the
+        C(exported_) prefix, the way Prometheus renames conflicting labels.
+    type: str
+    default: ''
+    env:
+      - name: FIELD_CONTENT_TIMELINE_LABELS
+    ini:
+      - section: callback_field_content_timeline
+        key: labels
+  configmap:
+    description: Name of a ConfigMap to store the timeline and metrics in.
+    type: str
+    env:
+      - name: FIELD_CONTENT_TIMELINE_CONFIGMAP
+    ini:
+      - section: callback_field_content_timeline
+        key: configmap
+  namespace:
+    description: Namespace of I(configmap).
+    type: str
+    env:
+      - name: FIELD_CONTENT_TIMELINE_NAMESPACE
+      - name: NAMESPACE
+    ini:
+      - section: callback_field_content_timeline
+        key: namespace
+'''
+
+import collections
+import json
+import os
+import time
+
+from ansible.module_utils.common.text.converters import to_text
+from ansible.plugins.callback import CallbackBase
+
+TIMELINE_LABEL = 'demo.redhat.com/timeline'
+METRIC_PREFIX = 'field_content_provision'
+# Labels the callback sets on its metrics; user labels must not replace them
+METRIC_LABELS = frozenset(('playbook', 'stage', 'phase', 'task', 'index', 'action', 'host', 'status'))
+
+# Result keys reporting how long a module waited, in seconds
+WAIT_KEYS = {
+    'ansible.builtin.pause': 'delta',
+    'ansible.builtin.wait_for': 'elapsed',
+    'ansible.builtin.wait_for_connection': 'elapsed',
+    'field_content_application_wait': 'elapsed',
+    'field_content_teardown': 'elapsed',
+    'kubernetes.core.k8s': 'duration',
+}
+
+
+def wait_seconds(action, result):
+    """Seconds a module reports it spent waiting, 0 when it does not"""
+    key = WAIT_KEYS.get(action) or WAIT_KEYS.get('ansible.builtin.' + action) \
+        or WAIT_KEYS.get('kubernetes.core.' + action)
+    try:
+        return max(0.0, float(result.get(key) or 0)) if key else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def escape(value):
+    return to_text(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def metric(name, labels, value):
+    pairs = ','.join('%s="%s"' % (key, escape(labels[key])) for key in labels)
+    return '%s%s %s' % (name, '{%s}' % pairs if pairs else '', round(value, 3))
+
+
+class CallbackModule(CallbackBase):
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'field_content_timeline'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, *args, **kwargs):
+        super(CallbackModule, self).__init__(*args, **kwargs)
+        self.playbook = None
+        self.play = None
+        self.start = time.time()
+        self.labels = collections.OrderedDict()
+        # Task uuid -> task record, in the order tasks started
+        self.tasks = collections.OrderedDict()
+
+    def set_options(self, *args, **kwargs):
+        super(CallbackModule, self).set_options(*args, **kwargs)
+        self.labels = collections.OrderedDict()
+        for pair in (self.get_option('labels') or '').split(','):
+            key, _, value = pair.partition('=')
+            key = key.strip()
+            if not key:
+                continue
+            if key in METRIC_LABELS:
+                self._display.warning('field_content_timeline: label %s is set by the callback, '
+                                      'reporting it as exported_%s' % (key, key))
+                key = 'exported_' + key
+            self.labels[key] = value.strip()
+
+    # Events
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook = os.path.basename(playbook._file_name)
+        self.start = time.time()
+
+    def v2_playbook_on_play_start(self, play):
+        self.play = play.get_name().strip() or 'play'
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        role = task._role.get_name() if task._role else None
+        self.tasks[task._uuid] = dict(
+            index=len(self.tasks) + 1,
+            name=task.get_name().strip(),
+            action=task.action,
+            phase=role or self.play,
+            play=self.play,
+            delay=self.delay(task),
+            start=time.time(),
+            hosts=collections.OrderedDict(),
+        )
+
+    @staticmethod
+    def delay(task):
+        try:
+            return float(task.delay or 0)
+        except (TypeError, ValueError):
+            # Still a template; the retry wait is then unknown
+            return 0.0
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def v2_runner_on_start(self, host, task):
+        record = self.tasks.get(task._uuid)
+        if record is not None:
+            record['hosts'][host.get_name()] = dict(start=time.time(), retries=0)
+
+    def v2_runner_retry(self, result):
+        entry = self.host_entry(result)
+        if entry is not None:
+            entry['retries'] += 1
+
+    def v2_runner_on_ok(self, result):
+        self.finish(result, 'changed' if result._result.get('changed') else 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self.finish(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self.finish(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self.finish(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):
+        end = time.time()
+        failed = any(stats.failures.get(host) or stats.dark.get(host) for host in stats.processed)
+        timeline = self.timeline(end, 'failed' if failed else 'successful')
+        output_dir = os.path.expanduser(self.get_option('output_dir'))
+        try:
+            if not os.path.isdir(output_dir):
+                os.makedirs(output_dir)
+            with open(os.path.join(output_dir, 'timeline.json'), 'w') as f:
+                json.dump(timeline, f, indent=2)
+            with open(os.path.join(output_dir, 'metrics.prom'), 'w') as f:
+                f.write(self.metrics(timeline))
+        except (IOError, OSError) as e:
+            self._display.warning('field_content_timeline: could not write to %s: %s' % (output_dir, e))
+        if self.get_option('configmap'):
+            self.publish(timeline)
+        self._display.display('Provisioning timeline: %s in %.1fs (%s)' % (
+            ', '.join('%s %.1fs' % (phase['name'], phase['seconds'])
+                      for phase in timeline['stages'] + timeline['phases']),
+            timeline['seconds'], timeline['status']))
+
+    # Bookkeeping
+
+    def host_entry(self, result):
+        record = self.tasks.get(result._task._uuid)
+        if record is None:
+            return None
+        return record['hosts'].setdefault(result._host.get_name(), dict(start=record['start'], retries=0))
+
+    def finish(self, result, status):
+        entry = self.host_entry(result)
+        if entry is None or 'status' in entry:
+            # Loop items report per item; the task result for the host is what counts
+            return
+        record = self.tasks[result._task._uuid]
+        entry['end'] = time.time()
+        entry['status'] = status
+        entry['retries'] = max(entry['retries'], int(result._result.get('attempts') or 1) - 1)
+        entry['wait'] = entry['retries'] * record['delay'] + wait_seconds(record['action'], result._result)
+
+    def read_stages(self):
+        path = self.get_option('stages_file')
+        stages = []
+        if not path or not os.path.exists(path):
+            return stages
+        with open(path) as f:
+            for line in f:
+                try:
+                    stage = json.loads(line)
+                    stages.append(dict(name=stage['name'], start=float(stage['start']),
+                                       seconds=round(float(stage['end']) - float(stage['start']), 3)))
+                except (ValueError, KeyError, TypeError):
+                    self._display.warning('field_content_timeline: ignoring stage %r' % line.strip())
+        return stages
+
+    def timeline(self, end, status):
+        tasks = []
+        phases = collections.OrderedDict()
+        for record in self.tasks.values():
+            for host, entry in record['hosts'].items():
+                if 'status' not in entry:
+                    continue
+                seconds = max(0.0, entry['end'] - entry['start'])
+                tasks.append(dict(
+                    index=record['index'], name=record['name'], action=record['action'], phase=record['phase'], play=record['play'],
+                    host=host, status=entry['status'], seconds=round(seconds, 3),
+                    retries=entry['retries'], wait_seconds=round(entry['wait'], 3)))
+            ended = [entry['end'] for entry in record['hosts'].values() if 'end' in entry]
+            if not ended:
+                continue
+            phase = phases.setdefault(record['phase'], dict(name=record['phase'], start=record['start'],
+                                                            end=record['start'], tasks=0, retries=0, wait=0.0))
+            phase['end'] = max(phase['end'], max(ended))
+            phase['tasks'] += 1
+
+        for task in tasks:
+            phases[task['phase']]['retries'] += task['retries']
+            phases[task['phase']]['wait'] += task['wait_seconds']
+        stages = self.read_stages()
+        return dict(
+            playbook=self.playbook,
+            status=status,
+            start=min([self.start] + [stage['start'] for stage in stages]),
+            seconds=round(end - min([self.start] + [stage['start'] for stage in stages]), 3),
+            labels=self.labels,
+            stages=stages,
+            phases=[dict(name=phase['name'], start=phase['start'], seconds=round(phase['end'] - phase['start'], 3),
+                         tasks=phase['tasks'], retries=phase['retries'], wait_seconds=round(phase['wait'], 3))
+                    for phase in phases.values()],
+            tasks=tasks,
+            totals=dict(tasks=len(tasks),
+                        retries=sum(task['retries'] for task in tasks),
+                        wait_seconds=round(sum(task['wait_seconds'] for task in tasks), 3),
+                        by_status=dict(collections.Counter(task['status'] for task in tasks))),
+        )
+
+    def metrics(self, timeline):
+        def labelled(**extra):
+            labels = collections.OrderedDict(self.labels)
+            labels['playbook'] = timeline['playbook']
+            labels.update(extra)
+            return labels
+
+        lines = []
+
+        def family(name, help_text, samples):
+            lines.append('# HELP %s_%s %s' % (METRIC_PREFIX, name, help_text))
+            lines.append('# TYPE %s_%s gauge' % (METRIC_PREFIX, name))
+            # A series may only appear once, so samples with the same labels, such
+            # as stages recorded twice, are added up
+            series = collections.OrderedDict()
+            for labels, value in samples:
+                key = tuple(labels.items())
+                series[key] = series.get(key, 0) + value
+            for labels, value in series.items():
+                lines.append(metric('%s_%s' % (METRIC_PREFIX, name), collections.OrderedDict(labels), value))
+
+        family('duration_seconds', 'Wall time of the whole run, including stages before the playbook.',
+               [(labelled(status=timeline['status']), timeline['seconds'])])
+        family('success', '1 if the playbook succeeded, 0 otherwise.',
+               [(labelled(), 1 if timeline['status'] == 'successful' else 0)])
+        family('stage_duration_seconds', 'Wall time of a stage before the playbook.',
+               [(labelled(stage=stage['name']), stage['seconds']) for stage in timeline['stages']])
+        family('phase_duration_seconds', 'Wall time of a phase (role, or play outside roles).',
+               [(labelled(phase=phase['name']), phase['seconds']) for phase in timeline['phases']])
+        family('phase_retries', 'Task retries within a phase.',
+               [(labelled(phase=phase['name']), phase['retries']) for phase in timeline['phases']])
+        family('phase_wait_seconds', 'Seconds tasks of a phase spent waiting or between retries.',
+               [(labelled(phase=phase['name']), phase['wait_seconds']) for phase in timeline['phases']])
+        family('task_duration_seconds', 'Wall time of a task on a host.',
+               [(labelled(phase=task['phase'], task=task['name'], index=task['index'], action=task['action'],
+                          host=task['host'], status=task['status']), task['seconds']) for task in timeline['tasks']])
+        family('task_retries', 'Retries of a task on a host.',
+               [(labelled(phase=task['phase'], task=task['name'], index=task['index'], host=task['host']),
+                 task['retries']) for task in timeline['tasks'] if task['retries']])
+        family('task_wait_seconds', 'Seconds a task spent waiting or between retries on a host.',
+               [(labelled(phase=task['phase'], task=task['name'], index=task['index'], host=task['host']),
+                 task['wait_seconds']) for task in timeline['tasks'] if task['wait_seconds']])
+        family('tasks', 'Task results by status.',
+               [(labelled(status=status), count) for status, count in sorted(timeline['totals']['by_status'].items())])
+        return '\n'.join(lines) + '\n'
+
+    def publish(self, timeline):
+        """Store the timeline and metrics in the ConfigMap; failures only warn"""
+        name, namespace = self.get_option('configmap'), self.get_option('namespace')
+        try:
+            from kubernetes import client, config
+            from kubernetes.client.rest import ApiException
+            try:
+                config.load_incluster_config()
+            except config.ConfigException:
+                config.load_kube_config()
+            body = {
+                'apiVersion': 'v1',
+                'kind': 'ConfigMap',
+                'metadata': {'name': name, 'namespace': namespace, 'labels': {TIMELINE_LABEL: ''}},
+                'data': {'timeline.json': json.dumps(timeline, indent=2), 'metrics.prom': self.metrics(timeline)},
+            }
+            api = client.CoreV1Api()
+            try:
+                api.create_namespaced_config_map(namespace, body)
+            except ApiException as e:
+                if e.status != 409:
+                    raise
+                api.replace_namespaced_config_map(name, namespace, body)
+        except Exception as e:
+            self._display.warning('field_content_timeline: could not publish ConfigMap %s/%s: %s'
+                                  % (namespace, name, e))
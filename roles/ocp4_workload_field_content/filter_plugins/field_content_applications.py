@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Filter that names the Applications of a batch of orders and places them on
+# ArgoCD application controller shards
+#
+# ArgoCD shards by destination cluster, so every shard reaches the local
+# cluster through its own alias (in-cluster, in-cluster-1, ...), registered by
+# the openshift-gitops chart. New orders go to the shard with the fewest
+# expected resources, largest order first, counting the Applications already
+# on each shard. An order whose Application exists keeps its shard: moving it
+# would change its destination.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import re
+
+from ansible.errors import AnsibleFilterError
+
+PREFIX = 'field-content'
+SHARD_ANNOTATION = 'demo.redhat.com/controller-shard'
+RESOURCES_ANNOTATION = 'demo.redhat.com/expected-resources'
+# Application names are also label values
+MAX_NAME = 63
+
+
+def _application_name(prefix, order_name):
+    """prefix-<order name>, with a hash of the order name when it had to be shortened or cleaned up"""
+    slug = re.sub(r'[^a-z0-9-]+', '-', order_name.lower()).strip('-')
+    name = '%s-%s' % (prefix, slug)
+    if slug == order_name and len(name) <= MAX_NAME:
+        return name
+    digest = hashlib.sha1(order_name.encode('utf-8')).hexdigest()[:8]
+    return '%s-%s' % (name[:MAX_NAME - 9].rstrip('-'), digest)
+
+
+def _count(value, what):
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise AnsibleFilterError('%s must be a number, got %r' % (what, value))
+    if count < 0:
+        raise AnsibleFilterError('%s must not be negative, got %d' % (what, count))
+    return count
+
+
+def shard_destination(shard):
+    """Name of the cluster alias of shard"""
+    return 'in-cluster' if shard == 0 else 'in-cluster-%d' % shard
+
+
+def field_content_shard_orders(orders, shards=1, applications=None, expected_resources=20, prefix=PREFIX):
+    """Give every order a unique Application name and a controller shard
+
+    applications are the Applications already in the ArgoCD namespace. The
+    orders are returned in their order, each with application, shard,
+    destination and expected_resources set.
+    """
+    shards = _count(shards, 'shards') or 1
+    loads = [0] * shards
+    existing = {}
+    for application in applications or []:
+        metadata = application.get('metadata') or {}
+        annotations = metadata.get('annotations') or {}
+        try:
+            shard = int(annotations.get(SHARD_ANNOTATION))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= shard < shards:
+            continue
+        resources = len((application.get('status') or {}).get('resources') or [])
+        loads[shard] += resources or _count(annotations.get(RESOURCES_ANNOTATION, expected_resources),
+                                            'Annotation %s of %s' % (RESOURCES_ANNOTATION, metadata.get('name')))
+        existing[metadata.get('name')] = shard
+
+    placed = []
+    names = {}
+    for order in orders or []:
+        if not isinstance(order, dict) or not order.get('name'):
+            raise AnsibleFilterError('Every order needs a name, got %r' % (order,))
+        order_name = str(order['name'])
+        name = _application_name(prefix, order_name)
+        if name in names:
+            raise AnsibleFilterError('Orders %s and %s would share the Application %s' % (names[name], order_name, name))
+        names[name] = order_name
+        placed.append(dict(order, application=name, shard=existing.get(name),
+                           expected_resources=_count(order.get('expected_resources', expected_resources),
+                                                     'expected_resources of order %s' % order_name)))
+
+    # Largest order first onto the least loaded shard
+    for order in sorted((order for order in placed if order['shard'] is None),
+                        key=lambda order: (-order['expected_resources'], order['application'])):
+        order['shard'] = loads.index(min(loads))
+        loads[order['shard']] += order['expected_resources']
+    for order in placed:
+        order['destination'] = shard_destination(order['shard'])
+    return placed
+
+
+class FilterModule(object):
+
+    def filters(self):
+        return {
+            'field_content_shard_orders': field_content_shard_orders,
+        }
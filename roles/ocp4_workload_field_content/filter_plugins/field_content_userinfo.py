@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# Filters that fold demo.redhat.com/userinfo ConfigMaps into agnosticd_user_info data
+#
+# Each filter makes a single pass over the ConfigMaps and deep-merges into one
+# accumulator in place, instead of a set_fact loop that copies the whole
+# accumulated dict with combine(recursive=True) on every iteration.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+
+from ansible.errors import AnsibleFilterError
+from ansible.module_utils.common.text.converters import to_native
+from ansible.utils.display import Display
+
+display = Display()
+
+USERS_JSON = 'users_json'
+
+
+def _configmap_data(configmaps):
+    """Yield the data of each ConfigMap; accepts ConfigMap resources or bare data dicts"""
+    for configmap in configmaps or []:
+        if not isinstance(configmap, dict):
+            raise AnsibleFilterError('Expected a ConfigMap or its data, got %s' % type(configmap).__name__)
+        data = configmap.get('data') if 'metadata' in configmap or 'kind' in configmap else configmap
+        yield configmap, data or {}
+
+
+def _configmap_name(configmap):
+    return (configmap.get('metadata') or {}).get('name', '<unknown>')
+
+
+def _merge_into(target, source):
+    """Recursively merge source into target in place; same result as combine(recursive=True)"""
+    for key, value in source.items():
+        current = target.get(key)
+        if isinstance(current, dict) and isinstance(value, dict):
+            _merge_into(current, value)
+        else:
+            target[key] = value
+    return target
+
+
+def field_content_users_json(configmaps):
+    """Parse and deep-merge the users_json payloads of all ConfigMaps"""
+    merged = {}
+    for configmap, data in _configmap_data(configmaps):
+        payload = data.get(USERS_JSON)
+        if payload is None:
+            continue
+        try:
+            parsed = json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+        except ValueError as e:
+            raise AnsibleFilterError('Invalid users_json in ConfigMap %s: %s'
+                                     % (_configmap_name(configmap), to_native(e)))
+        if not isinstance(parsed, dict):
+            raise AnsibleFilterError('users_json must be a JSON object, got %s' % type(parsed).__name__)
+        _merge_into(merged, parsed)
+    return merged
+
+
+def field_content_userinfo_data(configmaps):
+    """Merge all ConfigMap data except users_json; later ConfigMaps win on conflicts, with a warning"""
+    merged = {}
+    sources = {}
+    for configmap, data in _configmap_data(configmaps):
+        for key, value in data.items():
+            if key == USERS_JSON:
+                continue
+            if key in merged and merged[key] != value:
+                display.warning('userinfo key %s of ConfigMap %s overrides the value from ConfigMap %s'
+                                % (key, _configmap_name(configmap), sources[key]))
+            merged[key] = value
+            sources[key] = _configmap_name(configmap)
+    return merged
+
+
+class FilterModule(object):
+
+    def filters(self):
+        return {
+            'field_content_users_json': field_content_users_json,
+            'field_content_userinfo_data': field_content_userinfo_data,
+        }
@@ -0,0 +1,320 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: field_content_application_wait
+short_description: Wait for ArgoCD Applications to become healthy and synced using a watch
+description:
+  - Lists the selected ArgoCD Applications once and then follows a Kubernetes watch from the
+    returned resourceVersion, returning as soon as every Application is healthy and C(Synced).
+  - Replaces polling with C(k8s_info) retries, so the task finishes within one watch event of the
+    Applications converging instead of on the next poll.
+  - Selects either a single Application by I(name) or every Application matching I(label_selector).
+options:
+  name:
+    description: Name of a single Application to wait for. Requires I(namespace).
+    type: str
+  namespace:
+    description: Namespace of the Application(s). Omit with I(label_selector) to watch all namespaces.
+    type: str
+  label_selector:
+    description: Label selector of the Applications to wait for, for example C(demo.redhat.com/application).
+    type: str
+  healthy_statuses:
+    description: Health statuses that count as healthy.
+    type: list
+    elements: str
+    default: [Healthy]
+  timeout:
+    description: Overall deadline in seconds.
+    type: int
+    default: 600
+  settle:
+    description:
+      - Seconds every Application must stay healthy and synced, with no new Application appearing,
+        before the wait succeeds. Covers app-of-apps children that are created after their parent syncs.
+    type: int
+    default: 0
+  kubeconfig:
+    description: Path to a kubeconfig. Defaults to C(K8S_AUTH_KUBECONFIG), then C(~/.kube/config), then in-cluster.
+    type: path
+  context:
+    description: kubeconfig context to use.
+    type: str
+  host:
+    description: Kubernetes API URL, overriding the kubeconfig.
+    type: str
+  api_key:
+    description: Bearer token, overriding the kubeconfig.
+    type: str
+  validate_certs:
+    description: Whether to verify the API server certificate.
+    type: bool
+    aliases: [verify_ssl]
+  ca_cert:
+    description: CA bundle used to verify the API server.
+    type: path
+    aliases: [ssl_ca_cert]
+requirements:
+  - kubernetes
+'''
+
+EXAMPLES = r'''
+- name: Wait for the field-content Application
+  field_content_application_wait:
+    name: field-content
+    namespace: openshift-gitops
+    timeout: 600
+
+- name: Wait for every labelled Application in any namespace
+  field_content_application_wait:
+    label_selector: demo.redhat.com/application
+    healthy_statuses: [Healthy, Suspended]
+    settle: 10
+    timeout: 900
+'''
+
+RETURN = r'''
+elapsed:
+  description: Seconds spent waiting.
+  type: float
+  returned: always
+events:
+  description: Number of watch events processed.
+  type: int
+  returned: always
+applications:
+  description: Final state of every watched Application and how long it took to become ready.
+  type: list
+  elements: dict
+  returned: always
+  sample:
+    - name: field-content
+      namespace: openshift-gitops
+      health: Healthy
+      sync: Synced
+      ready_after: 42.7
+api:
+  description:
+    - Requests sent to the API server and connections opened for them. Requests on an open
+      keep-alive connection saved a connection.
+  type: dict
+  returned: always
+  sample: {requests: 3, connections: 1, connections_saved: 2}
+'''
+
+import math
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.field_content_k8s import (
+    ARGOCD_APPLICATIONS,
+    ARGOCD_GROUP,
+    ARGOCD_VERSION,
+    AUTH_ARG_SPEC,
+    api_stats,
+    application_status,
+    get_api_client,
+    resource_key,
+)
+
+try:
+    from kubernetes import client, watch
+    from kubernetes.client.rest import ApiException
+except ImportError:
+    # Reported by get_api_client()
+    pass
+
+# Upper bound for a single watch request; the loop re-watches until the deadline
+WATCH_WINDOW = 300
+
+
+class WatchExpired(Exception):
+    """The resourceVersion we watch from is too old (HTTP 410 Gone)"""
+
+
+class ApplicationWaiter:
+
+    def __init__(self, api, namespace=None, name=None, label_selector=None,
+                 healthy_statuses=('Healthy',), settle=0, timeout=600, clock=time.monotonic):
+        self.api = api
+        self.healthy_statuses = set(healthy_statuses)
+        self.settle = settle
+        self.timeout = timeout
+        self.clock = clock
+        self.apps = {}
+        self.ready_after = {}
+        self.events = 0
+
+        kwargs = dict(group=ARGOCD_GROUP, version=ARGOCD_VERSION, plural=ARGOCD_APPLICATIONS)
+        if name:
+            kwargs['field_selector'] = 'metadata.name=%s' % name
+        if label_selector:
+            kwargs['label_selector'] = label_selector
+        if namespace:
+            self.list_func = api.list_namespaced_custom_object
+            kwargs['namespace'] = namespace
+        else:
+            self.list_func = api.list_cluster_custom_object
+        self.list_kwargs = kwargs
+
+    def is_ready(self, app):
+        health, sync = application_status(app)
+        return health in self.healthy_statuses and sync == 'Synced'
+
+    def all_ready(self):
+        return bool(self.apps) and all(self.is_ready(app) for app in self.apps.values())
+
+    def update(self, event_type, app):
+        key = resource_key(app)
+        if event_type == 'DELETED':
+            self.apps.pop(key, None)
+            self.ready_after.pop(key, None)
+            return
+        self.apps[key] = app
+        if not self.is_ready(app):
+            self.ready_after.pop(key, None)
+        elif key not in self.ready_after:
+            self.ready_after[key] = round(self.clock() - self.start, 3)
+
+    def relist(self):
+        result = self.list_func(**self.list_kwargs)
+        self.apps = {}
+        for app in result.get('items', []):
+            self.update('ADDED', app)
+        # Keep timings only for Applications that are still ready
+        self.ready_after = dict((key, value) for key, value in self.ready_after.items() if key in self.apps)
+        return result['metadata']['resourceVersion']
+
+    def watch(self, resource_version, seconds):
+        """Process events until readiness flips or the window closes; returns the last resourceVersion"""
+        was_ready = self.all_ready()
+        known = len(self.apps)
+        stream = watch.Watch()
+        try:
+            for event in stream.stream(self.list_func, resource_version=resource_version,
+                                       allow_watch_bookmarks=True,
+                                       timeout_seconds=max(1, int(math.ceil(seconds))),
+                                       _request_timeout=seconds + 30, **self.list_kwargs):
+                obj = event['object']
+                if event['type'] == 'ERROR':
+                    if obj.get('code') == 410:
+                        raise WatchExpired()
+                    raise ApiException(status=obj.get('code'), reason=obj.get('message'))
+                resource_version = obj['metadata']['resourceVersion']
+                if event['type'] == 'BOOKMARK':
+                    continue
+                self.events += 1
+                self.update(event['type'], obj)
+                if self.all_ready() != was_ready or len(self.apps) != known:
+                    break
+        except ApiException as e:
+            if e.status == 410:
+                raise WatchExpired()
+            raise
+        finally:
+            stream.stop()
+        return resource_version
+
+    def run(self):
+        """Wait until every Application is ready for `settle` seconds; returns True on success"""
+        self.start = self.clock()
+        deadline = self.start + self.timeout
+        resource_version = self.relist()
+        ready_since = None
+        while True:
+            now = self.clock()
+            if self.all_ready():
+                ready_since = now if ready_since is None else ready_since
+                settle_left = self.settle - (now - ready_since)
+                if settle_left <= 0:
+                    return True
+                window = settle_left
+            else:
+                ready_since = None
+                window = WATCH_WINDOW
+            remaining = deadline - now
+            if remaining <= 0:
+                return False
+            watched = set(self.apps)
+            try:
+                resource_version = self.watch(resource_version, min(window, remaining))
+            except WatchExpired:
+                resource_version = self.relist()
+            if set(self.apps) != watched:
+                # A new or removed Application restarts the settle period
+                ready_since = None
+
+    def report(self):
+        applications = []
+        for key in sorted(self.apps):
+            app = self.apps[key]
+            health, sync = application_status(app)
+            applications.append(dict(
+                name=app['metadata']['name'],
+                namespace=app['metadata'].get('namespace'),
+                health=health,
+                sync=sync,
+                ready_after=self.ready_after.get(key),
+            ))
+        return applications
+
+
+def main():
+    argument_spec = dict(
+        name=dict(type='str'),
+        namespace=dict(type='str'),
+        label_selector=dict(type='str'),
+        healthy_statuses=dict(type='list', elements='str', default=['Healthy']),
+        timeout=dict(type='int', default=600),
+        settle=dict(type='int', default=0),
+    )
+    argument_spec.update(AUTH_ARG_SPEC)
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        required_one_of=[('name', 'label_selector')],
+        required_by={'name': 'namespace'},
+        supports_check_mode=True,
+    )
+
+    api_client = get_api_client(module)
+    api = client.CustomObjectsApi(api_client)
+    params = module.params
+    waiter = ApplicationWaiter(
+        api,
+        namespace=params['namespace'],
+        name=params['name'],
+        label_selector=params['label_selector'],
+        healthy_statuses=params['healthy_statuses'],
+        settle=params['settle'],
+        timeout=params['timeout'],
+    )
+    try:
+        ready = waiter.run()
+    except ApiException as e:
+        module.fail_json(msg='Kubernetes API error while waiting for Applications: %s' % e,
+                         applications=waiter.report(), events=waiter.events, api=api_stats(api_client))
+
+    result = dict(
+        changed=False,
+        elapsed=round(time.monotonic() - waiter.start, 3),
+        events=waiter.events,
+        applications=waiter.report(),
+        api=api_stats(api_client),
+    )
+    if not ready:
+        pending = ['%s/%s (%s, %s)' % (app['namespace'], app['name'], app['health'], app['sync'])
+                   for app in result['applications'] if app['ready_after'] is None]
+        if not result['applications']:
+            pending = ['no matching Applications found']
+        module.fail_json(msg='Timed out after %ss waiting for Applications: %s'
+                         % (params['timeout'], ', '.join(pending)), **result)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,501 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+DOCUMENTATION = r'''
+---
+module: field_content_teardown
+short_description: Delete everything the field content workload created, in parallel
+description:
+  - Discovers the root ArgoCD Application (I(application) in I(application_namespace)), every
+    Application and namespace with the I(application_label) label and every ConfigMap with the
+    I(userinfo_label) label.
+  - Deletes them in three phases so nothing is recreated while it is being removed. The root
+    Application goes first, then the labelled Applications, then the namespaces. Userinfo
+    ConfigMaps outside those namespaces are deleted in the last phase too.
+  - Within a phase, up to I(parallelism) deletions are in flight at once. One watch per phase
+    reports when each object is gone, and the next deletion starts as soon as a slot frees up.
+  - An object still present I(finalizer_timeout) seconds after its deletion has stuck finalizers.
+    With I(remove_finalizers), the module removes them. For an Application these are its own
+    finalizers. For a namespace, they are the finalizers of its terminating content. The object
+    then gets I(finalizer_grace) more seconds before it is reported as stuck.
+  - Namespaces named in I(protected_namespaces), or starting with C(openshift-) or C(kube-),
+    are never deleted.
+options:
+  application:
+    description: Name of the root Application created by the workload.
+    type: str
+    default: field-content
+  application_namespace:
+    description: Namespace of the root Application; ArgoCD's namespace.
+    type: str
+    default: openshift-gitops
+  application_label:
+    description: Label selecting the Applications and namespaces to delete.
+    type: str
+    default: demo.redhat.com/application
+  userinfo_label:
+    description: Label selecting the userinfo ConfigMaps to delete.
+    type: str
+    default: demo.redhat.com/userinfo
+  protected_namespaces:
+    description: Namespaces that are never deleted, even when labelled.
+    type: list
+    elements: str
+    default: [default, openshift-gitops]
+  parallelism:
+    description: Deletions in flight at the same time within a phase.
+    type: int
+    default: 10
+  finalizer_timeout:
+    description: Seconds after its deletion before an object counts as stuck on finalizers.
+    type: int
+    default: 300
+  remove_finalizers:
+    description: Remove the finalizers of stuck objects instead of only reporting them.
+    type: bool
+    default: true
+  finalizer_grace:
+    description: Seconds a stuck object gets to disappear after its finalizers were removed.
+    type: int
+    default: 60
+  timeout:
+    description: Overall deadline in seconds.
+    type: int
+    default: 1800
+  discovery_cache_dir:
+    description:
+      - Directory of the API discovery cache used to find what is left in stuck namespaces.
+        Defaults to C(FIELD_CONTENT_DISCOVERY_CACHE_DIR), then the temporary directory.
+    type: path
+  discovery_cache_ttl:
+    description:
+      - Seconds the discovery cache is reused before it is refreshed, so resource types added
+        since, such as CRDs of newly installed operators, are found. Defaults to
+        C(FIELD_CONTENT_DISCOVERY_CACHE_TTL), then 600.
+    type: int
+    default: 600
+  kubeconfig:
+    description: Path to a kubeconfig. Defaults to C(K8S_AUTH_KUBECONFIG), then C(~/.kube/config), then in-cluster.
+    type: path
+  context:
+    description: kubeconfig context to use.
+    type: str
+  host:
+    description: Kubernetes API URL, overriding the kubeconfig.
+    type: str
+  api_key:
+    description: Bearer token, overriding the kubeconfig.
+    type: str
+  validate_certs:
+    description: Whether to verify the API server certificate.
+    type: bool
+    aliases: [verify_ssl]
+  ca_cert:
+    description: CA bundle used to verify the API server.
+    type: path
+    aliases: [ssl_ca_cert]
+notes:
+  - In check mode the resources are discovered and reported with the result C(would_delete).
+requirements:
+  - kubernetes
+'''
+
+EXAMPLES = r'''
+- name: Remove the field content workload
+  field_content_teardown:
+    application: field-content
+    application_namespace: openshift-gitops
+    parallelism: 20
+    finalizer_timeout: 120
+'''
+
+RETURN = r'''
+elapsed:
+  description: Seconds the whole removal took.
+  type: float
+  returned: always
+phases:
+  description: Seconds spent in each phase.
+  type: dict
+  returned: always
+  sample: {root_application: 1.2, applications: 8.4, namespaces: 95.0}
+resources:
+  description: Every discovered resource, how its deletion ended and how long it took.
+  type: list
+  elements: dict
+  returned: always
+  sample:
+    - resource: Namespace/user1-showroom
+      kind: Namespace
+      namespace: null
+      name: user1-showroom
+      result: deleted
+      seconds: 12.4
+      finalizers_removed: false
+api:
+  description:
+    - Requests sent to the API server and connections opened for them. Requests on an open
+      keep-alive connection saved a connection.
+    - When stuck namespaces needed discovery, whether the discovery cache was used, expired or
+      missing, and the discovery requests made and saved by it.
+  type: dict
+  returned: always
+  sample: {requests: 42, connections: 3, connections_saved: 39, discovery_cache: hit,
+           discovery_requests: 0, discovery_requests_saved: 58}
+'''
+
+import collections
+import json
+import math
+import time
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible.module_utils.field_content_k8s import (
+    ARGOCD_APPLICATIONS,
+    ARGOCD_GROUP,
+    ARGOCD_VERSION,
+    AUTH_ARG_SPEC,
+    DISCOVERY_ARG_SPEC,
+    api_stats,
+    get_api_client,
+    get_dynamic_client,
+    resource_key,
+)
+
+try:
+    from kubernetes import client, watch
+    from kubernetes.client.rest import ApiException
+except ImportError:
+    # Reported by get_api_client()
+    pass
+
+# Upper bound for a single watch request; the loop re-watches until the next deadline
+WATCH_WINDOW = 300
+PROTECTED_PREFIXES = ('openshift-', 'kube-')
+
+
+class WatchExpired(Exception):
+    """The resourceVersion we watch from is too old (HTTP 410 Gone)"""
+
+
+def list_raw(list_func, **kwargs):
+    """Call a list function and return the raw JSON, whatever API class it belongs to"""
+    response = list_func(_preload_content=False, **kwargs)
+    return json.loads(response.data)
+
+
+class Kind:
+    """How to list, watch, delete and un-finalize one kind of resource"""
+
+    def __init__(self, name, list_func, delete, unfinalize, **list_kwargs):
+        self.name = name
+        self.list_func = list_func
+        self.list_kwargs = list_kwargs
+        self.delete = delete
+        self.unfinalize = unfinalize
+
+    def list(self):
+        return list_raw(self.list_func, **self.list_kwargs)
+
+
+class Teardown:
+
+    def __init__(self, api_client, application='field-content', application_namespace='openshift-gitops',
+                 application_label='demo.redhat.com/application', userinfo_label='demo.redhat.com/userinfo',
+                 protected_namespaces=('default', 'openshift-gitops'), parallelism=10, finalizer_timeout=300,
+                 remove_finalizers=True, finalizer_grace=60, timeout=1800, check_mode=False,
+                 discovery_cache_dir=None, discovery_cache_ttl=600, clock=time.monotonic):
+        self.api_client = api_client
+        self.core = client.CoreV1Api(api_client)
+        self.custom = client.CustomObjectsApi(api_client)
+        self.application = application
+        self.application_namespace = application_namespace
+        self.application_label = application_label
+        self.userinfo_label = userinfo_label
+        self.protected_namespaces = set(protected_namespaces)
+        self.parallelism = max(1, parallelism)
+        self.finalizer_timeout = finalizer_timeout
+        self.remove_finalizers = remove_finalizers
+        self.finalizer_grace = finalizer_grace
+        self.timeout = timeout
+        self.check_mode = check_mode
+        self.discovery_cache_dir = discovery_cache_dir
+        self.discovery_cache_ttl = discovery_cache_ttl
+        self.clock = clock
+        self.results = []
+        self.phases = collections.OrderedDict()
+        self._namespaced_resources = None
+
+    # Kinds
+
+    def applications(self, **list_kwargs):
+        def delete(obj):
+            metadata = obj['metadata']
+            self.custom.delete_namespaced_custom_object(
+                ARGOCD_GROUP, ARGOCD_VERSION, metadata['namespace'], ARGOCD_APPLICATIONS, metadata['name'],
+                propagation_policy='Background')
+
+        def unfinalize(obj):
+            metadata = obj['metadata']
+            self.custom.patch_namespaced_custom_object(
+                ARGOCD_GROUP, ARGOCD_VERSION, metadata['namespace'], ARGOCD_APPLICATIONS, metadata['name'],
+                {'metadata': {'finalizers': None}})
+
+        list_func = self.custom.list_cluster_custom_object
+        if 'namespace' in list_kwargs:
+            list_func = self.custom.list_namespaced_custom_object
+        return Kind('Application', list_func, delete, unfinalize,
+                    group=ARGOCD_GROUP, version=ARGOCD_VERSION, plural=ARGOCD_APPLICATIONS, **list_kwargs)
+
+    def namespaces(self):
+        def delete(obj):
+            self.core.delete_namespace(obj['metadata']['name'], propagation_policy='Background')
+
+        return Kind('Namespace', self.core.list_namespace, delete, self.unfinalize_namespace_content,
+                    label_selector=self.application_label)
+
+    def configmaps(self):
+        def delete(obj):
+            self.core.delete_namespaced_config_map(obj['metadata']['name'], obj['metadata']['namespace'])
+
+        def unfinalize(obj):
+            self.core.patch_namespaced_config_map(obj['metadata']['name'], obj['metadata']['namespace'],
+                                                  {'metadata': {'finalizers': None}})
+
+        return Kind('ConfigMap', self.core.list_config_map_for_all_namespaces, delete, unfinalize,
+                    label_selector=self.userinfo_label)
+
+    def unfinalize_namespace_content(self, obj):
+        """Remove the finalizers of every terminating object left in the namespace"""
+        from kubernetes.dynamic.resource import ResourceList
+        namespace = obj['metadata']['name']
+        if self._namespaced_resources is None:
+            discovered = get_dynamic_client(self.api_client, self.discovery_cache_dir,
+                                            self.discovery_cache_ttl).resources
+            self._namespaced_resources = [
+                resource for resource in discovered.search(namespaced=True)
+                if not isinstance(resource, ResourceList) and '/' not in resource.name
+                and {'list', 'patch'} <= set(resource.verbs or [])]
+        for resource in self._namespaced_resources:
+            try:
+                items = resource.get(namespace=namespace).to_dict().get('items') or []
+            except ApiException:
+                # Not listable here (forbidden, gone, aggregated API down); nothing to unblock
+                continue
+            for item in items:
+                metadata = item['metadata']
+                if metadata.get('deletionTimestamp') and metadata.get('finalizers'):
+                    resource.patch(name=metadata['name'], namespace=namespace,
+                                   body={'metadata': {'finalizers': None}},
+                                   content_type='application/merge-patch+json')
+
+    # Discovery
+
+    def protected(self, namespace):
+        return namespace in self.protected_namespaces or namespace.startswith(PROTECTED_PREFIXES)
+
+    def discover(self):
+        """(kind, objects) per phase, in deletion order"""
+        root = self.applications(namespace=self.application_namespace,
+                                 field_selector='metadata.name=%s' % self.application)
+        applications = self.applications(label_selector=self.application_label)
+        namespaces = self.namespaces()
+        configmaps = self.configmaps()
+
+        root_items = root.list()['items']
+        root_keys = set(resource_key(app) for app in root_items)
+        application_items = [app for app in applications.list()['items'] if resource_key(app) not in root_keys]
+        namespace_items = [ns for ns in namespaces.list()['items'] if not self.protected(ns['metadata']['name'])]
+        doomed = set(ns['metadata']['name'] for ns in namespace_items)
+        # ConfigMaps in a namespace being deleted go with it
+        configmap_items = [cm for cm in configmaps.list()['items'] if cm['metadata']['namespace'] not in doomed]
+        return [
+            ('root_application', [(root, root_items)]),
+            ('applications', [(applications, application_items)]),
+            ('namespaces', [(namespaces, namespace_items), (configmaps, configmap_items)]),
+        ]
+
+    # Deletion
+
+    def record(self, kind, obj, result, started=None, forced=False):
+        metadata = obj['metadata']
+        self.results.append(dict(
+            resource='%s/%s' % (kind.name, '/'.join(filter(None, (metadata.get('namespace'), metadata['name'])))),
+            kind=kind.name,
+            namespace=metadata.get('namespace'),
+            name=metadata['name'],
+            result=result,
+            seconds=None if started is None else round(self.clock() - started, 3),
+            finalizers_removed=forced,
+        ))
+
+    def delete_kind(self, kind, objects):
+        """Delete objects of one kind, parallelism at a time, until gone or stuck"""
+        if self.check_mode:
+            for obj in objects:
+                self.record(kind, obj, 'would_delete')
+            return
+        # Listed before the first delete so the watch sees every DELETED event
+        resource_version = kind.list()['metadata']['resourceVersion']
+        pending = collections.deque(sorted(objects, key=resource_key))
+        inflight = collections.OrderedDict()
+        while pending or inflight:
+            now = self.clock()
+            if now >= self.deadline:
+                for obj, started, forced_at in inflight.values():
+                    self.record(kind, obj, 'timeout', started, forced_at is not None)
+                for obj in pending:
+                    self.record(kind, obj, 'not_started')
+                return
+            while pending and len(inflight) < self.parallelism:
+                obj = pending.popleft()
+                started = self.clock()
+                try:
+                    kind.delete(obj)
+                except ApiException as e:
+                    if e.status != 404:
+                        raise
+                    self.record(kind, obj, 'absent', started)
+                    continue
+                inflight[resource_key(obj)] = [obj, started, None]
+
+            # Stuck finalizers: remove them once, then give up after the grace period
+            next_deadline = self.deadline
+            for key, entry in list(inflight.items()):
+                obj, started, forced_at = entry
+                if forced_at is None and now - started >= self.finalizer_timeout:
+                    if not self.remove_finalizers:
+                        self.record(kind, obj, 'stuck', started)
+                        del inflight[key]
+                        continue
+                    try:
+                        kind.unfinalize(obj)
+                    except ApiException as e:
+                        if e.status != 404:
+                            raise
+                    entry[2] = forced_at = self.clock()
+                elif forced_at is not None and now - forced_at >= self.finalizer_grace:
+                    self.record(kind, obj, 'stuck', started, True)
+                    del inflight[key]
+                    continue
+                entry_deadline = started + self.finalizer_timeout if forced_at is None \
+                    else forced_at + self.finalizer_grace
+                next_deadline = min(next_deadline, entry_deadline)
+            if not inflight:
+                continue
+
+            try:
+                resource_version = self.watch(kind, resource_version, inflight,
+                                              min(WATCH_WINDOW, max(1, next_deadline - self.clock())),
+                                              refill=bool(pending))
+            except WatchExpired:
+                # Relist: whatever is no longer listed has been deleted
+                listed = kind.list()
+                resource_version = listed['metadata']['resourceVersion']
+                present = set(resource_key(obj) for obj in listed['items'])
+                for key in [key for key in inflight if key not in present]:
+                    obj, started, forced_at = inflight.pop(key)
+                    self.record(kind, obj, 'deleted', started, forced_at is not None)
+
+    def watch(self, kind, resource_version, inflight, seconds, refill=False):
+        """Record deletions of in-flight objects until the window closes
+
+        Returns early once everything in flight is gone or, with refill, as soon
+        as one object is gone so the caller can start the next deletion.
+        """
+        stream = watch.Watch()
+        try:
+            for event in stream.stream(kind.list_func, resource_version=resource_version,
+                                       timeout_seconds=max(1, int(math.ceil(seconds))),
+                                       _request_timeout=seconds + 30, **kind.list_kwargs):
+                obj = event['raw_object']
+                if event['type'] == 'ERROR':
+                    if obj.get('code') == 410:
+                        raise WatchExpired()
+                    raise ApiException(status=obj.get('code'), reason=obj.get('message'))
+                resource_version = obj['metadata']['resourceVersion']
+                key = resource_key(obj)
+                if event['type'] == 'DELETED' and key in inflight:
+                    _, started, forced_at = inflight.pop(key)
+                    self.record(kind, obj, 'deleted', started, forced_at is not None)
+                    if refill or not inflight:
+                        break
+        except ApiException as e:
+            if e.status == 410:
+                raise WatchExpired()
+            raise
+        finally:
+            stream.stop()
+        return resource_version
+
+    def run(self):
+        """Discover and delete everything; returns True when nothing is left behind"""
+        self.start = self.clock()
+        self.deadline = self.start + self.timeout
+        for phase, kinds in self.discover():
+            phase_start = self.clock()
+            for kind, objects in kinds:
+                self.delete_kind(kind, objects)
+            self.phases[phase] = round(self.clock() - phase_start, 3)
+        return not [result for result in self.results if result['result'] in ('stuck', 'timeout', 'not_started')]
+
+
+def main():
+    argument_spec = dict(
+        application=dict(type='str', default='field-content'),
+        application_namespace=dict(type='str', default='openshift-gitops'),
+        application_label=dict(type='str', default='demo.redhat.com/application'),
+        userinfo_label=dict(type='str', default='demo.redhat.com/userinfo'),
+        protected_namespaces=dict(type='list', elements='str', default=['default', 'openshift-gitops']),
+        parallelism=dict(type='int', default=10),
+        finalizer_timeout=dict(type='int', default=300),
+        remove_finalizers=dict(type='bool', default=True),
+        finalizer_grace=dict(type='int', default=60),
+        timeout=dict(type='int', default=1800),
+    )
+    argument_spec.update(AUTH_ARG_SPEC)
+    argument_spec.update(DISCOVERY_ARG_SPEC)
+    module = AnsibleModule(argument_spec=argument_spec, supports_check_mode=True)
+
+    params = module.params
+    teardown = Teardown(
+        get_api_client(module),
+        application=params['application'],
+        application_namespace=params['application_namespace'],
+        application_label=params['application_label'],
+        userinfo_label=params['userinfo_label'],
+        protected_namespaces=params['protected_namespaces'] + [params['application_namespace']],
+        parallelism=params['parallelism'],
+        finalizer_timeout=params['finalizer_timeout'],
+        remove_finalizers=params['remove_finalizers'],
+        finalizer_grace=params['finalizer_grace'],
+        timeout=params['timeout'],
+        check_mode=module.check_mode,
+        discovery_cache_dir=params['discovery_cache_dir'],
+        discovery_cache_ttl=params['discovery_cache_ttl'],
+    )
+    try:
+        clean = teardown.run()
+    except ApiException as e:
+        module.fail_json(msg='Kubernetes API error while removing the workload: %s' % e,
+                         resources=teardown.results, phases=teardown.phases, api=api_stats(teardown.api_client))
+
+    result = dict(
+        changed=any(r['result'] in ('deleted', 'would_delete') for r in teardown.results),
+        elapsed=round(time.monotonic() - teardown.start, 3),
+        phases=teardown.phases,
+        resources=teardown.results,
+        api=api_stats(teardown.api_client),
+    )
+    if not clean:
+        left = ['%s (%s)' % (r['resource'], r['result']) for r in teardown.results
+                if r['result'] in ('stuck', 'timeout', 'not_started')]
+        module.fail_json(msg='Resources left behind: %s' % ', '.join(left), **result)
+    module.exit_json(**result)
+
+
+if __name__ == '__main__':
+    main()
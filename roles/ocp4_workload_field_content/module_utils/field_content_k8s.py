@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+# Shared Kubernetes client helpers for the ocp4_workload_field_content modules
+#
+# Connection options mirror kubernetes.core (including the K8S_AUTH_*
+# environment variables), so the modules authenticate exactly like the
+# kubernetes.core.k8s / k8s_info tasks around them.
+#
+# A process keeps one ApiClient, and with it one pool of keep-alive
+# connections, per set of connection options. Dynamic clients read API
+# discovery from a cache file that is refreshed once it is older than a TTL,
+# so a module run does not repeat the discovery requests of the one before it.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import traceback
+
+from ansible.module_utils.basic import env_fallback, missing_required_lib
+
+KUBERNETES_IMPORT_ERROR = None
+try:
+    from kubernetes import client, config
+    from kubernetes.dynamic import DynamicClient
+    from kubernetes.dynamic.discovery import LazyDiscoverer
+    HAS_KUBERNETES = True
+except ImportError:
+    KUBERNETES_IMPORT_ERROR = traceback.format_exc()
+    HAS_KUBERNETES = False
+    DynamicClient = LazyDiscoverer = object
+
+ARGOCD_GROUP = 'argoproj.io'
+ARGOCD_VERSION = 'v1alpha1'
+ARGOCD_APPLICATIONS = 'applications'
+
+AUTH_ARG_SPEC = dict(
+    kubeconfig=dict(type='path', fallback=(env_fallback, ['K8S_AUTH_KUBECONFIG'])),
+    context=dict(type='str', fallback=(env_fallback, ['K8S_AUTH_CONTEXT'])),
+    host=dict(type='str', fallback=(env_fallback, ['K8S_AUTH_HOST'])),
+    api_key=dict(type='str', no_log=True, fallback=(env_fallback, ['K8S_AUTH_API_KEY'])),
+    validate_certs=dict(type='bool', aliases=['verify_ssl'], fallback=(env_fallback, ['K8S_AUTH_VERIFY_SSL'])),
+    ca_cert=dict(type='path', aliases=['ssl_ca_cert'], fallback=(env_fallback, ['K8S_AUTH_SSL_CA_CERT'])),
+)
+
+DISCOVERY_ARG_SPEC = dict(
+    discovery_cache_dir=dict(type='path', fallback=(env_fallback, ['FIELD_CONTENT_DISCOVERY_CACHE_DIR'])),
+    discovery_cache_ttl=dict(type='int', default=600, fallback=(env_fallback, ['FIELD_CONTENT_DISCOVERY_CACHE_TTL'])),
+)
+
+# Time the documents of a discovery cache file were requested; the runner chart sets it too
+DISCOVERED_AT = 'field_content_discovered_at'
+
+# /version, /api, /api/v1, /apis, /apis/<group> and /apis/<group>/<version>
+DISCOVERY_PATH = re.compile(r'^/?(?:version|api(?:/v1)?|apis(?:/[^/]+){0,2})/?$')
+
+# ApiClients of this process by connection options, and the dynamic client of each
+_pool = {}
+_dynamic = {}
+
+
+def check_kubernetes(module):
+    """Fail the module when the kubernetes Python client is missing"""
+    if not HAS_KUBERNETES:
+        module.fail_json(msg=missing_required_lib('kubernetes'), exception=KUBERNETES_IMPORT_ERROR)
+
+
+def get_api_client(module):
+    """Build an ApiClient from the module's connection options
+
+    Falls back to the default kubeconfig and then to the in-cluster service
+    account, the same order kubernetes.core uses.
+    """
+    check_kubernetes(module)
+    params = module.params
+    configuration = client.Configuration()
+    kubeconfig = params.get('kubeconfig')
+    try:
+        if kubeconfig or os.path.exists(os.path.expanduser(config.KUBE_CONFIG_DEFAULT_LOCATION)):
+            config.load_kube_config(config_file=kubeconfig, context=params.get('context'),
+                                    client_configuration=configuration)
+        elif not params.get('host'):
+            config.load_incluster_config(client_configuration=configuration)
+    except Exception as e:
+        module.fail_json(msg='Failed to load Kubernetes configuration: %s' % e)
+
+    if params.get('host'):
+        configuration.host = params['host']
+    if params.get('api_key'):
+        configuration.api_key = {'authorization': 'Bearer %s' % params['api_key']}
+    if params.get('validate_certs') is not None:
+        configuration.verify_ssl = params['validate_certs']
+    if params.get('ca_cert'):
+        configuration.ssl_ca_cert = params['ca_cert']
+
+    digest = configuration_digest(configuration)
+    if digest not in _pool:
+        _pool[digest] = client.ApiClient(configuration)
+    return _pool[digest]
+
+
+def configuration_digest(configuration):
+    """Hash of everything that makes two Configurations connect differently"""
+    options = dict((name, getattr(configuration, name, None)) for name in (
+        'host', 'api_key', 'api_key_prefix', 'username', 'password', 'cert_file', 'key_file',
+        'ssl_ca_cert', 'verify_ssl', 'proxy'))
+    return hashlib.sha256(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class CountingDiscoverer(LazyDiscoverer):
+    """LazyDiscoverer that stamps its cache with the discovery time and records the group versions used"""
+
+    def search(self, **kwargs):
+        results = super(CountingDiscoverer, self).search(**kwargs)
+        self.client.discovery['used'].update(
+            resource.group_version for resource in results if getattr(resource, 'group_version', None))
+        return results
+
+    def _write_cache(self):
+        # A refresh starts from an empty cache, so only rediscovered documents get a new time
+        self._cache.setdefault(DISCOVERED_AT, time.time())
+        super(CountingDiscoverer, self)._write_cache()
+
+
+class CachedDynamicClient(DynamicClient):
+    """DynamicClient whose discovery cache file expires, counting its discovery requests
+
+    A cache file discovered more than ttl seconds ago is removed before
+    discovery reads it, so resources added since, such as the CRDs of a newly
+    installed operator, show up in searches. kubernetes itself only refreshes
+    the file when a lookup misses, which a search over every resource never
+    does.
+    """
+
+    def __init__(self, api_client, cache_file, ttl):
+        self.discovery = dict(cache='miss', requests=0, used=set())
+        if os.path.exists(cache_file):
+            if time.time() - discovered_at(cache_file) > ttl:
+                try:
+                    os.remove(cache_file)
+                except OSError:
+                    # Already removed by a concurrent module run
+                    pass
+                self.discovery['cache'] = 'expired'
+            else:
+                self.discovery['cache'] = 'hit'
+        super(CachedDynamicClient, self).__init__(api_client, cache_file=cache_file, discoverer=CountingDiscoverer)
+
+    def request(self, method, path, body=None, **params):
+        if method.upper() == 'GET' and DISCOVERY_PATH.match(path):
+            self.discovery['requests'] += 1
+        return super(CachedDynamicClient, self).request(method, path, body=body, **params)
+
+
+def discovered_at(cache_file):
+    """When the documents in a discovery cache file were requested; 0 when unknown"""
+    try:
+        with open(cache_file) as f:
+            return float(json.load(f).get(DISCOVERED_AT) or 0)
+    except (IOError, OSError, ValueError, AttributeError):
+        return 0
+
+
+def discovery_cache_file(api_client, cache_dir=None):
+    """Cache file of the API server api_client talks to"""
+    host = api_client.configuration.host.encode('utf-8')
+    return os.path.join(cache_dir or tempfile.gettempdir(),
+                        'field-content-discovery-%s.json' % hashlib.sha256(host).hexdigest()[:16])
+
+
+def get_dynamic_client(api_client, cache_dir=None, ttl=600):
+    """The process's DynamicClient for api_client, discovering through the cache file in cache_dir"""
+    key = id(api_client)
+    if key not in _dynamic:
+        if cache_dir and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        _dynamic[key] = CachedDynamicClient(api_client, discovery_cache_file(api_client, cache_dir), ttl)
+    return _dynamic[key]
+
+
+def api_stats(api_client):
+    """Requests and connections of api_client's pool and discovery requests its cache saved
+
+    A request on an already open keep-alive connection saved a connection.
+    Without a cache, discovery requests /version, /apis and each group version
+    it used; every one of those not requested came from the cache file.
+    """
+    requests = connections = 0
+    pools = api_client.rest_client.pool_manager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is not None:
+            requests += pool.num_requests
+            connections += pool.num_connections
+    stats = dict(requests=requests, connections=connections, connections_saved=max(0, requests - connections))
+    dynamic = _dynamic.get(id(api_client))
+    if dynamic is not None:
+        discovery = dynamic.discovery
+        stats.update(discovery_cache=discovery['cache'], discovery_requests=discovery['requests'],
+                     discovery_requests_saved=max(0, 2 + len(discovery['used']) - discovery['requests']))
+    return stats
+
+
+def resource_key(obj):
+    """namespace/name of an object, used to key watch state"""
+    metadata = obj.get('metadata', {})
+    return '%s/%s' % (metadata.get('namespace', ''), metadata.get('name'))
+
+
+def application_status(app):
+    """(health, sync) of an ArgoCD Application; None for fields not reported yet"""
+    status = app.get('status') or {}
+    return (status.get('health') or {}).get('status'), (status.get('sync') or {}).get('status')
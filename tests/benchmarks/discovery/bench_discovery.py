@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pooled client and persistent discovery cache of the role's modules
+
+Extends tests/benchmarks/fake_api.py with --groups API groups of --kinds
+custom resources each, the discovery tree of a cluster with many operators,
+and runs --jobs provisioning Jobs of --tasks task processes each, the way
+every Ansible task is its own Python process. A task looks up --ops resource
+types of different groups and lists them. Every Job starts with an empty
+temporary directory, like a new runner pod, and runs the same tasks.
+
+Clients compared, with what each one keeps:
+
+    per-operation  a new ApiClient and an uncached discovery for every operation
+    per-job        one ApiClient per task, discovery cached in the Job's
+                   temporary directory (kubernetes' default, lost with the pod)
+    shared         get_api_client() and get_dynamic_client() of
+                   module_utils/field_content_k8s.py, discovery cached in a
+                   directory every Job shares, refreshed after --ttl seconds
+    shared-expired the same with a TTL of 0, so every task rediscovers
+
+For each it reports wall time, API requests, discovery requests and
+connections the stand-in served, and for shared clients what
+field_content_k8s.api_stats() says they saved:
+
+    python tests/benchmarks/discovery/bench_discovery.py
+    python tests/benchmarks/discovery/bench_discovery.py --groups 400 --jobs 5 --tasks 20
+    python tests/benchmarks/discovery/bench_discovery.py --search    # also search like the teardown module
+
+Requires ansible-core and the kubernetes Python client. Results are printed
+as JSON.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLE_DIR = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'roles', 'ocp4_workload_field_content'))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import fake_api  # noqa: E402
+from fake_api import Store, kubeconfig, serve  # noqa: E402
+
+MODES = ('per-operation', 'per-job', 'shared', 'shared-expired')
+NAMESPACE = 'demo'
+
+
+def load_layer():
+    path = os.path.join(ROLE_DIR, 'module_utils', 'field_content_k8s.py')
+    spec = importlib.util.spec_from_file_location('field_content_k8s', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def add_groups(groups, kinds):
+    """Serve groups API groups of kinds namespaced custom resources each; returns their apiVersions"""
+    versions = []
+    for g in range(groups):
+        group = 'operator%d.example.com' % g
+        versions.append(group + '/v1')
+        for k in range(kinds):
+            fake_api.RESOURCES.append((group, 'v1', 'Kind%d' % k, 'kind%ds' % k, True))
+    return versions
+
+
+class Module:
+    """What get_api_client() needs of an AnsibleModule"""
+
+    def __init__(self, kubeconfig):
+        self.params = dict(kubeconfig=kubeconfig, context=None, host=None, api_key=None,
+                           validate_certs=None, ca_cert=None)
+
+    def fail_json(self, **kwargs):
+        raise SystemExit(json.dumps(kwargs))
+
+
+def task(spec):
+    """One task process: look up and list spec['ops'] resource types; prints the layer's stats"""
+    from kubernetes import client, config
+    from kubernetes.dynamic import DynamicClient
+
+    layer = load_layer()
+    module = Module(spec['kubeconfig'])
+
+    def new_api_client():
+        configuration = client.Configuration()
+        config.load_kube_config(config_file=spec['kubeconfig'], client_configuration=configuration)
+        return client.ApiClient(configuration)
+
+    stats = None
+    for api_version in spec['api_versions']:
+        if spec['mode'] == 'per-operation':
+            cache = tempfile.NamedTemporaryFile(dir=spec['tmp'], suffix='.json', delete=False)
+            cache.close()
+            os.remove(cache.name)
+            dynamic = DynamicClient(new_api_client(), cache_file=cache.name)
+        elif spec['mode'] == 'per-job':
+            if stats is None:
+                dynamic = DynamicClient(new_api_client(), cache_file=os.path.join(spec['tmp'], 'osrcp.json'))
+                stats = {}
+        else:
+            api_client = layer.get_api_client(module)
+            dynamic = layer.get_dynamic_client(api_client, spec['cache_dir'], spec['ttl'])
+        if spec['search']:
+            dynamic.resources.search(namespaced=True)
+        dynamic.resources.get(api_version=api_version, kind='Kind0').get(namespace=NAMESPACE)
+    if spec['mode'].startswith('shared'):
+        stats = layer.api_stats(api_client)
+    print(json.dumps(stats or {}))
+
+
+def run(mode, api_versions, args):
+    store = Store()
+    store.put('v1', 'namespaces', {'metadata': {'name': NAMESPACE}})
+    server = serve(store)
+    saved = {'connections_saved': 0, 'discovery_requests_saved': 0}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = kubeconfig(os.path.join(tmp, 'kubeconfig'), server)
+        cache_dir = os.path.join(tmp, 'cache')
+        start = time.perf_counter()
+        for job in range(args.jobs):
+            job_tmp = os.path.join(tmp, 'job-%d' % job)
+            os.makedirs(job_tmp)
+            for index in range(args.tasks):
+                # Every Job runs the same playbook, so task index looks up the same types in each
+                first = index * args.ops
+                spec = dict(mode=mode, kubeconfig=path, tmp=job_tmp, cache_dir=cache_dir, search=args.search,
+                            ttl=0 if mode == 'shared-expired' else args.ttl,
+                            api_versions=[api_versions[(first + op) % len(api_versions)] for op in range(args.ops)])
+                result = subprocess.run([sys.executable, os.path.abspath(__file__), '--task', json.dumps(spec)],
+                                        env=dict(os.environ, TMPDIR=job_tmp), stdin=subprocess.DEVNULL,
+                                        capture_output=True, text=True)
+                if result.returncode:
+                    raise SystemExit('%s task failed:\n%s' % (mode, result.stderr[-4000:]))
+                for key, value in json.loads(result.stdout).items():
+                    if key in saved:
+                        saved[key] += value
+            shutil.rmtree(job_tmp)
+        seconds = round(time.perf_counter() - start, 2)
+    server.shutdown()
+
+    entry = {
+        'seconds': seconds,
+        'requests': store.requests,
+        'discovery_requests': sum(1 for _, _, path in store.log if fake_api.discovery(path) is not None),
+        'connections': store.connections,
+    }
+    if mode.startswith('shared'):
+        entry['reported'] = saved
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the pooled client and persistent discovery cache')
+    parser.add_argument('--groups', type=int, default=200,
+                        help='API groups served besides the built-in ones (default: 200)')
+    parser.add_argument('--kinds', type=int, default=10, help='Resource types per API group (default: 10)')
+    parser.add_argument('--jobs', type=int, default=3, help='Provisioning Jobs, each in a new pod (default: 3)')
+    parser.add_argument('--tasks', type=int, default=8, help='Task processes per Job (default: 8)')
+    parser.add_argument('--ops', type=int, default=3, help='Resource types each task looks up (default: 3)')
+    parser.add_argument('--ttl', type=int, default=600, help='Discovery cache TTL in seconds (default: 600)')
+    parser.add_argument('--search', action='store_true',
+                        help='Search every namespaced resource type in each operation, like the teardown module')
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES), help='Clients to compare')
+    parser.add_argument('--task', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.task:
+        task(json.loads(args.task))
+        return 0
+
+    api_versions = add_groups(args.groups, args.kinds)
+    report = {'groups': args.groups, 'kinds': args.kinds, 'jobs': args.jobs, 'tasks': args.tasks, 'ops': args.ops,
+              'ttl': args.ttl, 'search': args.search, 'modes': {}}
+    for mode in args.mode:
+        report['modes'][mode] = run(mode, api_versions, args)
+        print('%s done' % mode, file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
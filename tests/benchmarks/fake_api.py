@@ -0,0 +1,375 @@
+"""
+In-memory stand-in for the Kubernetes API server used by the benchmarks
+
+Serves discovery, list (label and metadata.name field selectors), watch, get,
+create, replace, merge and apply patches (also of the status subresource) and
+delete over plain HTTP for the resource types in RESOURCES, so the kubernetes
+Python client, kubernetes.core modules and the role's own modules can run
+against it unchanged:
+
+    from fake_api import Store, serve
+    store = Store(namespace_delay=0.5)
+    server = serve(store)            # http://127.0.0.1:<server.server_port>
+    store.put('v1', 'namespaces', {'metadata': {'name': 'demo'}})
+
+Deletion follows the API server's rules closely enough for teardown tests: an
+object with finalizers only gets a deletionTimestamp and goes away once a
+patch removes its last finalizer, and a namespace terminates by deleting its
+contents, then disappears namespace_delay seconds later once nothing is left
+in it. Every request is logged in Store.log as (server name, method, path),
+and Store.connections counts the connections clients opened. Store.compact()
+drops the event history the way etcd compaction does: a watch from an older
+resourceVersion gets an ERROR event with code 410 (Gone) and has to relist.
+"""
+
+import datetime
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PATH = re.compile(r'^/(?:api/(?P<cv>v1)|apis/(?P<g>[^/]+)/(?P<v>[^/]+))'
+                  r'(?:/namespaces/(?P<ns>[^/]+))?/(?P<plural>[^/]+)(?:/(?P<name>[^/]+)(?:/status)?)?$')
+
+# (group, version, kind, plural, namespaced) served by discovery
+RESOURCES = [
+    ('', 'v1', 'Namespace', 'namespaces', False),
+    ('', 'v1', 'Node', 'nodes', False),
+    ('', 'v1', 'ConfigMap', 'configmaps', True),
+    ('', 'v1', 'Secret', 'secrets', True),
+    ('', 'v1', 'Service', 'services', True),
+    ('', 'v1', 'ServiceAccount', 'serviceaccounts', True),
+    ('', 'v1', 'Pod', 'pods', True),
+    ('', 'v1', 'PersistentVolumeClaim', 'persistentvolumeclaims', True),
+    ('apps', 'v1', 'Deployment', 'deployments', True),
+    ('batch', 'v1', 'Job', 'jobs', True),
+    ('route.openshift.io', 'v1', 'Route', 'routes', True),
+    ('rbac.authorization.k8s.io', 'v1', 'Role', 'roles', True),
+    ('rbac.authorization.k8s.io', 'v1', 'RoleBinding', 'rolebindings', True),
+    ('rbac.authorization.k8s.io', 'v1', 'ClusterRole', 'clusterroles', False),
+    ('rbac.authorization.k8s.io', 'v1', 'ClusterRoleBinding', 'clusterrolebindings', False),
+    ('argoproj.io', 'v1alpha1', 'Application', 'applications', True),
+    ('argoproj.io', 'v1alpha1', 'ApplicationSet', 'applicationsets', True),
+    ('operators.coreos.com', 'v1alpha1', 'Subscription', 'subscriptions', True),
+    ('operators.coreos.com', 'v1alpha1', 'InstallPlan', 'installplans', True),
+    ('operators.coreos.com', 'v1alpha1', 'ClusterServiceVersion', 'clusterserviceversions', True),
+    ('operators.coreos.com', 'v1', 'OperatorGroup', 'operatorgroups', True),
+    ('gateway.networking.k8s.io', 'v1', 'Gateway', 'gateways', True),
+]
+
+
+def group_version(group, version):
+    return '%s/%s' % (group, version) if group else version
+
+
+def discovery(path):
+    """Discovery document for path, or None when path is not a discovery endpoint"""
+    if path == '/version':
+        return {'major': '1', 'minor': '29', 'gitVersion': 'v1.29.0'}
+    if path == '/api':
+        return {'kind': 'APIVersions', 'versions': ['v1']}
+    if path == '/apis':
+        groups = {}
+        for group, version, _, _, _ in RESOURCES:
+            if group and version not in groups.setdefault(group, []):
+                groups[group].append(version)
+        return {'kind': 'APIGroupList', 'apiVersion': 'v1', 'groups': [
+            {'name': group,
+             'versions': [{'groupVersion': group_version(group, v), 'version': v} for v in versions],
+             'preferredVersion': {'groupVersion': group_version(group, versions[0]), 'version': versions[0]}}
+            for group, versions in groups.items()]}
+    match = re.match(r'^/(?:api/(v1)|apis/([^/]+)/([^/]+))$', path)
+    if not match:
+        return None
+    group, version = ('', 'v1') if match.group(1) else (match.group(2), match.group(3))
+    return {'kind': 'APIResourceList', 'apiVersion': 'v1', 'groupVersion': group_version(group, version),
+            'resources': [{'name': plural, 'singularName': kind.lower(), 'namespaced': namespaced, 'kind': kind,
+                           'verbs': ['create', 'delete', 'get', 'list', 'patch', 'update', 'watch']}
+                          for g, v, kind, plural, namespaced in RESOURCES if (g, v) == (group, version)]}
+
+
+def merge_patch(target, patch):
+    """RFC 7386 JSON merge patch, in place"""
+    for key, value in patch.items():
+        if value is None:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            merge_patch(target[key], value)
+        else:
+            target[key] = value
+    return target
+
+
+def matches(obj, namespace, query):
+    metadata = obj['metadata']
+    if namespace and metadata.get('namespace') != namespace:
+        return False
+    labels = metadata.get('labels') or {}
+    for selector in query.get('labelSelector', [''])[0].split(','):
+        if not selector:
+            continue
+        key, equals, value = selector.partition('=')
+        if key not in labels or (equals and labels[key] != value):
+            return False
+    field_selector = query.get('fieldSelector', [''])[0]
+    if field_selector.startswith('metadata.name=') and metadata['name'] != field_selector.split('=', 1)[1]:
+        return False
+    return True
+
+
+class Store:
+    """Objects keyed by (groupVersion, plural, namespace, name), with an event log for watches"""
+
+    def __init__(self, namespace_delay=0.0):
+        self.namespace_delay = namespace_delay
+        self.cond = threading.Condition()
+        self.rv = 1
+        self.compacted = 0
+        self.objects = {}
+        self.events = []
+        self.log = []
+        self.connections = 0
+        threading.Thread(target=self._namespace_controller, daemon=True).start()
+
+    @property
+    def requests(self):
+        return len(self.log)
+
+    def get(self, gv, plural, namespace, name):
+        return self.objects.get((gv, plural, namespace or '', name))
+
+    def put(self, gv, plural, obj, event=None):
+        with self.cond:
+            metadata = obj.setdefault('metadata', {})
+            obj.setdefault('apiVersion', gv)
+            for group, version, kind, plural_, _ in RESOURCES:
+                if plural_ == plural and group_version(group, version) == gv:
+                    obj.setdefault('kind', kind)
+            key = (gv, plural, metadata.get('namespace', ''), metadata['name'])
+            event = event or ('MODIFIED' if key in self.objects else 'ADDED')
+            self.rv += 1
+            metadata['resourceVersion'] = str(self.rv)
+            metadata.setdefault('uid', 'uid-%d' % self.rv)
+            metadata.setdefault('creationTimestamp', now())
+            if event == 'DELETED':
+                self.objects.pop(key, None)
+            else:
+                self.objects[key] = obj
+            self.events.append((self.rv, gv, plural, event, json.loads(json.dumps(obj))))
+            self.cond.notify_all()
+            return obj
+
+    def compact(self):
+        """Expire every resourceVersion up to now for watches"""
+        with self.cond:
+            self.compacted = self.rv
+            self.cond.notify_all()
+
+    def delete(self, gv, plural, namespace, name):
+        """Delete like the API server: finalizers and namespaces only start termination"""
+        with self.cond:
+            obj = self.get(gv, plural, namespace, name)
+            if obj is None:
+                return None
+            if obj['metadata'].get('finalizers') or plural == 'namespaces':
+                if not obj['metadata'].get('deletionTimestamp'):
+                    obj = json.loads(json.dumps(obj))
+                    obj['metadata']['deletionTimestamp'] = now()
+                    if plural == 'namespaces':
+                        obj.setdefault('status', {})['phase'] = 'Terminating'
+                    self.put(gv, plural, obj)
+                return obj
+            return self.put(gv, plural, obj, 'DELETED')
+
+    def _namespace_controller(self):
+        """Delete the contents of terminating namespaces, then the namespaces themselves"""
+        terminating = {}
+        while True:
+            with self.cond:
+                self.cond.wait(0.05)
+                for (gv, plural, _, name), obj in list(self.objects.items()):
+                    if plural != 'namespaces' or not obj['metadata'].get('deletionTimestamp'):
+                        continue
+                    since = terminating.setdefault(name, time.monotonic())
+                    content = [key for key in self.objects if key[2] == name]
+                    for key in content:
+                        self.delete(*key)
+                    if not content and not obj['metadata'].get('finalizers') \
+                            and time.monotonic() - since >= self.namespace_delay:
+                        self.put(gv, plural, obj, 'DELETED')
+                        terminating.pop(name, None)
+
+
+def now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def make_handler(store, name):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def setup(self):
+            # Once per connection; keep-alive requests on it are handled by the same instance
+            with store.cond:
+                store.connections += 1
+            BaseHTTPRequestHandler.setup(self)
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def status(self, code, reason):
+            self.send(code, {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure', 'code': code,
+                             'reason': reason, 'message': reason})
+
+        def parse(self):
+            url = urlparse(self.path)
+            store.log.append((name, self.command, url.path))
+            match = PATH.match(url.path)
+            query = parse_qs(url.query)
+            if not match:
+                return None, query
+            route = match.groupdict()
+            route['gv'] = route['cv'] or group_version(route['g'], route['v'])
+            route['ns'] = route['ns'] or ''
+            return route, query
+
+        def body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_GET(self):
+            found = discovery(urlparse(self.path).path)
+            route, query = self.parse()
+            if found is not None:
+                return self.send(200, found)
+            if route is None:
+                return self.status(404, 'NotFound')
+            if route['name']:
+                obj = store.get(route['gv'], route['plural'], route['ns'], route['name'])
+                return self.send(200, obj) if obj else self.status(404, 'NotFound')
+            if query.get('watch', [''])[0] in ('1', 'true'):
+                return self.watch(route, query)
+            with store.cond:
+                items = [obj for (gv, plural, _, _), obj in store.objects.items()
+                         if (gv, plural) == (route['gv'], route['plural']) and matches(obj, route['ns'], query)]
+                self.send(200, {'kind': 'List', 'apiVersion': 'v1', 'items': items,
+                                'metadata': {'resourceVersion': str(store.rv)}})
+
+        def watch(self, route, query):
+            rv = int(query.get('resourceVersion', ['0'])[0] or 0)
+            deadline = time.monotonic() + int(query.get('timeoutSeconds', ['30'])[0])
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                while True:
+                    with store.cond:
+                        if rv < store.compacted:
+                            line = (json.dumps({'type': 'ERROR', 'object': {
+                                'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure', 'code': 410,
+                                'reason': 'Expired', 'message': 'too old resource version: %d' % rv}}) + '\n').encode()
+                            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                            break
+                        pending = [event for event in store.events if event[0] > rv
+                                   and (event[1], event[2]) == (route['gv'], route['plural'])]
+                        if not pending:
+                            left = deadline - time.monotonic()
+                            if left <= 0:
+                                break
+                            store.cond.wait(min(left, 0.5))
+                            continue
+                    for event_rv, _, _, event, obj in pending:
+                        rv = event_rv
+                        if matches(obj, route['ns'], query):
+                            line = (json.dumps({'type': event, 'object': obj}) + '\n').encode()
+                            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                            self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            route, _ = self.parse()
+            obj = self.body()
+            if route['ns']:
+                obj['metadata']['namespace'] = route['ns']
+            if store.get(route['gv'], route['plural'], route['ns'], obj['metadata']['name']):
+                return self.status(409, 'AlreadyExists')
+            self.send(201, store.put(route['gv'], route['plural'], obj))
+
+        def do_PUT(self):
+            route, _ = self.parse()
+            obj = self.body()
+            if route['ns']:
+                obj['metadata']['namespace'] = route['ns']
+            if not store.get(route['gv'], route['plural'], route['ns'], route['name']):
+                return self.status(404, 'NotFound')
+            self.send(200, store.put(route['gv'], route['plural'], obj))
+
+        def do_PATCH(self):
+            route, _ = self.parse()
+            patch = self.body()
+            with store.cond:
+                obj = store.get(route['gv'], route['plural'], route['ns'], route['name'])
+                if obj is None:
+                    if 'apply-patch' not in (self.headers.get('Content-Type') or ''):
+                        return self.status(404, 'NotFound')
+                    # Server-side apply creates missing objects
+                    if route['ns']:
+                        patch['metadata']['namespace'] = route['ns']
+                    return self.send(201, store.put(route['gv'], route['plural'], patch))
+                merged = merge_patch(json.loads(json.dumps(obj)), patch)
+                if merged == obj:
+                    # Nothing changed: no new resourceVersion, like the API server
+                    return self.send(200, obj)
+                metadata = merged['metadata']
+                if metadata.get('deletionTimestamp') and not metadata.get('finalizers') \
+                        and route['plural'] != 'namespaces':
+                    # The last finalizer is gone: deletion completes
+                    return self.send(200, store.put(route['gv'], route['plural'], merged, 'DELETED'))
+                self.send(200, store.put(route['gv'], route['plural'], merged))
+
+        def do_DELETE(self):
+            route, _ = self.parse()
+            self.body()
+            obj = store.delete(route['gv'], route['plural'], route['ns'], route['name'])
+            if obj is None:
+                return self.status(404, 'NotFound')
+            self.send(200, obj)
+
+    return Handler
+
+
+def serve(store, port=0, name='api'):
+    """Serve store on 127.0.0.1 from a background thread; returns the server
+
+    Requests are logged under name, so several servers of one store can tell
+    their clients apart.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(store, name))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def kubeconfig(path, server):
+    """Write a kubeconfig for the stand-in at path"""
+    with open(path, 'w') as f:
+        json.dump({
+            'apiVersion': 'v1', 'kind': 'Config', 'current-context': 'fake',
+            'clusters': [{'name': 'fake', 'cluster': {'server': 'http://127.0.0.1:%d' % server.server_port}}],
+            'users': [{'name': 'fake', 'user': {'token': 'fake'}}],
+            'contexts': [{'name': 'fake', 'context': {'cluster': 'fake', 'user': 'fake'}}],
+        }, f)
+    return path
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the image-prepull controller against a stand-in container runtime
+
+Builds an image list like a workbench catalogue: images of different sizes,
+some listed twice (by tag and by digest) and some already on the node. For
+each list size it times, on a fresh fake node (fake_crictl.py):
+
+- initContainers: what the DaemonSet's init containers do, one pull after
+  another for every entry; present images are skipped unless tagged :latest
+  (pull policy Always)
+- controller: cluster-addons/image-prepull/files/prepull.py pull at each
+  --concurrency, then a second run on the now warm node
+
+    python tests/benchmarks/image-prepull/bench_prepull.py                  # 10 and 30 images
+    python tests/benchmarks/image-prepull/bench_prepull.py --images 50 --concurrency 1 4 8
+    python tests/benchmarks/image-prepull/bench_prepull.py --scale 0.2      # shorter simulated pulls
+
+The stand-in models per-image pull latency, not shared node bandwidth, so the
+concurrent speed-up is an upper bound. Results are printed as JSON.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PREPULL = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'cluster-addons', 'image-prepull',
+                                        'files', 'prepull.py'))
+FAKE_CRICTL = os.path.join(BENCH_DIR, 'fake_crictl.py')
+
+
+def catalogue(count):
+    """(image list, fake registry, fake node) for count distinct images"""
+    images, registry, node = [], {}, {}
+    for i in range(count):
+        digest = 'sha256:' + hashlib.sha256(b'image-%d' % i).hexdigest()
+        repo = 'quay.io/example/workbench-%d' % i
+        tag = '%s:%s' % (repo, 'latest' if i % 7 == 0 else '2024.%d' % (i % 3))
+        image = {'id': 'sha256:' + hashlib.sha256(b'id-%d' % i).hexdigest(),
+                 'digest': digest, 'seconds': 0.5 + (i * 37 % 10) / 4}
+        registry[tag] = registry[repo + '@' + digest] = image
+        images.append(tag)
+        if i % 5 == 0:
+            # The same image listed again, pinned by digest
+            images.append(repo + '@' + digest)
+        if i % 4 == 3:
+            node[image['id']] = {'repoTags': [tag], 'repoDigests': [repo + '@' + digest]}
+    return images, registry, node
+
+
+def fake_node(tmp, registry, node):
+    path = os.path.join(tmp, 'crictl-state-%d.json' % time.monotonic_ns())
+    with open(path, 'w') as f:
+        json.dump({'registry': registry, 'node': node, 'pulls': 0}, f)
+    return path
+
+
+def pulls(state):
+    with open(state) as f:
+        return json.load(f)['pulls']
+
+
+def crictl(state, scale, *args):
+    env = dict(os.environ, FAKE_CRICTL_STATE=state, FAKE_CRICTL_SCALE=str(scale))
+    return subprocess.run([sys.executable, FAKE_CRICTL] + list(args), env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+
+def init_containers(images, state, scale):
+    """One init container per entry, in order"""
+    start = time.perf_counter()
+    present = json.loads(crictl(state, scale, 'images', '-o', 'json'))['images']
+    present = {ref for image in present for ref in image['repoTags'] + image['repoDigests']}
+    for image in images:
+        if image in present and not image.endswith(':latest'):
+            continue
+        crictl(state, scale, 'pull', image)
+    return {'seconds': round(time.perf_counter() - start, 2), 'pulls': pulls(state)}
+
+
+def controller(images_path, state, scale, concurrency):
+    env = dict(os.environ, FAKE_CRICTL_STATE=state, FAKE_CRICTL_SCALE=str(scale))
+    env.pop('PREPULL_STATUS_CONFIGMAP', None)
+    before = pulls(state)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, PREPULL, '--images', images_path, '--retries', '0', 'pull',
+                             '--node', 'bench', '--concurrency', str(concurrency),
+                             '--runtime', '%s %s' % (sys.executable, FAKE_CRICTL)],
+                            env=env, capture_output=True, text=True)
+    seconds = round(time.perf_counter() - start, 2)
+    if result.returncode:
+        raise SystemExit('prepull.py failed:\n' + result.stderr)
+    status = json.loads(result.stdout.splitlines()[-1])
+    return {'seconds': seconds, 'pulls': pulls(state) - before, 'pulled': status.get('pulled', 0),
+            'present': status.get('present', 0), 'phase': status['phase']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the image-prepull controller')
+    parser.add_argument('--images', metavar='N', type=int, nargs='+', default=[10, 30],
+                        help='Distinct images per list (default: 10 30)')
+    parser.add_argument('--concurrency', metavar='N', type=int, nargs='+', default=[1, 3, 6],
+                        help='Controller concurrency levels (default: 1 3 6)')
+    parser.add_argument('--scale', type=float, default=0.5,
+                        help='Multiplier of the simulated pull times (default: 0.5)')
+    args = parser.parse_args(argv)
+
+    report = {'scale': args.scale, 'images': {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.images:
+            images, registry, node = catalogue(count)
+            images_path = os.path.join(tmp, 'images-%d.txt' % count)
+            with open(images_path, 'w') as f:
+                f.write('\n'.join(images) + '\n')
+
+            entry = {'entries': len(images), 'already_present': len(node)}
+            entry['initContainers'] = init_containers(images, fake_node(tmp, registry, node), args.scale)
+            for concurrency in args.concurrency:
+                state = fake_node(tmp, registry, node)
+                cold = controller(images_path, state, args.scale, concurrency)
+                warm = controller(images_path, state, args.scale, concurrency)
+                cold['speedup'] = round(entry['initContainers']['seconds'] / cold['seconds'], 2)
+                entry['controller_c%d' % concurrency] = {'cold': cold, 'warm': warm}
+            report['images'][str(count)] = entry
+            print('%d images done' % count, file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
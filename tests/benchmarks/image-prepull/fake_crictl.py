@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Stand-in for crictl used by the image-prepull benchmark
+
+Implements the three commands the prepull controller runs, against a JSON
+state file named by FAKE_CRICTL_STATE:
+
+    {
+      "registry": {"<reference>": {"id": "sha256:...", "digest": "sha256:...", "seconds": 1.5}},
+      "node": {"<image id>": {"repoTags": [...], "repoDigests": [...]}},
+      "pulls": 0
+    }
+
+`pull` sleeps for the image's seconds (scaled by FAKE_CRICTL_SCALE, default 1)
+to simulate the transfer, unless the image id is already on the node, in which
+case only a manifest round trip (5% of the time) is paid. The state file is
+locked for reads and writes, not while "transferring", so concurrent pulls
+overlap like real ones.
+"""
+
+import fcntl
+import json
+import os
+import sys
+import time
+
+STATE = os.environ.get('FAKE_CRICTL_STATE', 'crictl-state.json')
+SCALE = float(os.environ.get('FAKE_CRICTL_SCALE', '1'))
+
+
+class Locked:
+    def __enter__(self):
+        self.file = open(STATE, 'r+')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        self.state = json.load(self.file)
+        return self.state
+
+    def __exit__(self, *exc):
+        self.file.seek(0)
+        self.file.truncate()
+        json.dump(self.state, self.file)
+        self.file.close()
+
+
+def repository(reference):
+    name = reference.partition('@')[0]
+    last = name.rsplit('/', 1)[-1]
+    return name[:len(name) - len(last)] + last.partition(':')[0]
+
+
+def find(state, reference):
+    """Image id of a reference on the node, or None"""
+    for image_id, image in state['node'].items():
+        if reference in image['repoTags'] or reference in image['repoDigests']:
+            return image_id
+    return None
+
+
+def main(argv):
+    command, args = argv[0], argv[1:]
+    if command == 'images':
+        with Locked() as state:
+            images = [dict(image, id=image_id) for image_id, image in state['node'].items()]
+        print(json.dumps({'images': images}))
+    elif command == 'inspecti':
+        with Locked() as state:
+            image_id = find(state, args[-1])
+            if image_id is None:
+                print(f'no such image "{args[-1]}" present', file=sys.stderr)
+                return 1
+            print(json.dumps({'status': dict(state['node'][image_id], id=image_id)}))
+    elif command == 'pull':
+        reference = args[-1]
+        with Locked() as state:
+            image = state['registry'].get(reference)
+            if image is None:
+                print(f'pulling image: {reference}: manifest unknown', file=sys.stderr)
+                return 1
+            seconds = image['seconds'] * (0.05 if image['id'] in state['node'] else 1)
+            state['pulls'] += 1
+        time.sleep(seconds * SCALE)
+        with Locked() as state:
+            entry = state['node'].setdefault(image['id'], {'repoTags': [], 'repoDigests': []})
+            name = reference.partition('@')[0]
+            if ':' in name.rsplit('/', 1)[-1] and name not in entry['repoTags']:
+                entry['repoTags'].append(name)
+            digest = repository(reference) + '@' + image['digest']
+            if digest not in entry['repoDigests']:
+                entry['repoDigests'].append(digest)
+        print(f'Image is up to date for {image["id"]}')
+    else:
+        print(f'unsupported command {command}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
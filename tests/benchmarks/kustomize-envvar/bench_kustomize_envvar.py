@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark the kustomize-envvar config management plugin
+
+Generates a kustomization of --resources manifests referencing
+${CLUSTER_DOMAIN} and ${API_URL} and runs the plugin
+(cluster-addons/charts/openshift-gitops/files/kustomize_envvar.py) the way
+the ArgoCD repo server does on every refresh, --refreshes times:
+
+- buffered: kustomize build read whole, then substituted; the plugin
+  without its cache or streaming
+- uncached: the plugin with the cache disabled, substituting while
+  streaming
+- cached: the plugin with its cache; the first refresh is a miss, the
+  others are hits
+
+It reports the wall time per refresh, the CPU time of the plugin and
+kustomize together, and the largest resident set size.
+
+    python tests/benchmarks/kustomize-envvar/bench_kustomize_envvar.py                  # 100 and 2000 resources
+    python tests/benchmarks/kustomize-envvar/bench_kustomize_envvar.py --resources 10000 --refreshes 5
+
+Requires kustomize (or --kustomize). Results are printed as JSON.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'cluster-addons', 'charts', 'openshift-gitops',
+                                       'files', 'kustomize_envvar.py'))
+
+# The plugin without cache and streaming: the whole build in memory, then substituted
+BUFFERED = '''
+import os, subprocess, sys
+output = subprocess.run([os.environ['KUSTOMIZE_BIN'], 'build', '.'], stdout=subprocess.PIPE, check=True).stdout
+for name, value in os.environ.items():
+    if name.startswith('ARGOCD_ENV_'):
+        output = output.replace(('${%s}' % name[11:]).encode(), value.encode())
+sys.stdout.buffer.write(output)
+'''
+
+DEPLOYMENT = '''\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: app-{i}
+  namespace: field-content
+  annotations:
+    field-content/api: ${{API_URL}}
+spec:
+  replicas: 1
+  selector:
+    matchLabels:
+      app: app-{i}
+  template:
+    metadata:
+      labels:
+        app: app-{i}
+    spec:
+      containers:
+      - name: app
+        image: quay.io/example/app:{i}
+        env:
+        - name: PUBLIC_URL
+          value: https://app-{i}.${{CLUSTER_DOMAIN}}
+        - name: API_URL
+          value: ${{API_URL}}
+'''
+
+
+def kustomization(directory, count):
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'resources.yaml'), 'w') as f:
+        f.write('---\n'.join(DEPLOYMENT.format(i=i) for i in range(count)))
+    with open(os.path.join(directory, 'kustomization.yaml'), 'w') as f:
+        f.write('resources:\n- resources.yaml\n')
+
+
+def refresh(command, directory, env):
+    """(seconds, CPU seconds, max RSS in MiB) of one plugin run"""
+    start = time.perf_counter()
+    with open(os.devnull, 'wb') as devnull:
+        process = subprocess.Popen(command, cwd=directory, env=env, stdout=devnull, stderr=subprocess.DEVNULL)
+        _, status, usage = os.wait4(process.pid, 0)
+    if os.waitstatus_to_exitcode(status):
+        raise RuntimeError('%s failed in %s' % (' '.join(command), directory))
+    return time.perf_counter() - start, usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+
+def run(mode, directory, env, refreshes):
+    command = [sys.executable, '-c', BUFFERED] if mode == 'buffered' else [sys.executable, PLUGIN]
+    results = [refresh(command, directory, env) for _ in range(refreshes)]
+    seconds = sorted(result[0] for result in results)
+    return {
+        'first_s': round(results[0][0], 3),
+        'p50_s': round(seconds[len(seconds) // 2], 3),
+        'total_s': round(sum(seconds), 3),
+        'cpu_s': round(sum(result[1] for result in results), 3),
+        'max_rss_mib': round(max(result[2] for result in results), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the kustomize-envvar config management plugin')
+    parser.add_argument('--resources', metavar='N', type=int, nargs='+', default=[100, 2000],
+                        help='Manifests in the kustomization (default: 100 2000)')
+    parser.add_argument('--refreshes', type=int, default=10,
+                        help='Plugin runs per mode, as ArgoCD refreshes (default: 10)')
+    parser.add_argument('--kustomize', default=shutil.which('kustomize'),
+                        help='kustomize binary (default: kustomize on PATH)')
+    args = parser.parse_args(argv)
+    if not args.kustomize:
+        parser.error('kustomize not found, pass --kustomize')
+
+    report = {'refreshes': args.refreshes}
+    for count in args.resources:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, 'content')
+            kustomization(directory, count)
+            env = dict(os.environ,
+                       KUSTOMIZE_BIN=args.kustomize,
+                       ARGOCD_ENV_CLUSTER_DOMAIN='apps.cluster-abc12.example.com',
+                       ARGOCD_ENV_API_URL='https://api.cluster-abc12.example.com:6443',
+                       ARGOCD_APP_REVISION='4f9d2c0b1e7a3d5c6b8a9f0e1d2c3b4a5f6e7d8c',
+                       ARGOCD_APP_SOURCE_REPO_URL='https://github.com/rhpds/field-sourced-content',
+                       ARGOCD_APP_SOURCE_PATH='content')
+            report['resources_%d' % count] = {
+                'buffered': run('buffered', directory, env, args.refreshes),
+                'uncached': run('uncached', directory, dict(env, KUSTOMIZE_ENVVAR_CACHE_DIR=''), args.refreshes),
+                'cached': run('cached', directory, dict(env, KUSTOMIZE_ENVVAR_CACHE_DIR=os.path.join(tmp, 'cache')),
+                              args.refreshes),
+            }
+        print('%d resources done' % count, file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark installing several operators with operator-install
+
+Runs the chart's readiness barrier (cluster-addons/operator-install/files/
+operator_wait.py) against a simulated cluster (../patterns/cluster.py) whose
+OLM takes a set time per operator to resolve the InstallPlan and to bring
+the CSV to Succeeded:
+
+- stacked: one chart per operator in consecutive sync waves, as labs did
+  before; each Subscription is created once the previous operator is ready
+  and ArgoCD's wave delay has passed
+- concurrent: every Subscription in one wave and one barrier watching them
+  all, as the chart does with `operators`
+
+    python tests/benchmarks/operator-install/bench_operator_install.py                # web-terminal, CNV and RHOAI
+    python tests/benchmarks/operator-install/bench_operator_install.py --scale 0.1    # shorter simulated installs
+    python tests/benchmarks/operator-install/bench_operator_install.py --operators a:1:5 b:2:20 c:2:30 d:1:10
+
+The Subscriptions are created the way the chart renders them. Results are
+printed as JSON.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+WAIT = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'cluster-addons', 'operator-install', 'files',
+                                     'operator_wait.py'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'patterns'))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from cluster import Cluster  # noqa: E402
+
+# name:installplan seconds:CSV seconds, roughly what these operators take
+OPERATORS = ['web-terminal:5:20', 'kubevirt-hyperconverged:10:90', 'rhods-operator:10:60']
+
+
+def subscription(name):
+    return {'apiVersion': 'operators.coreos.com/v1alpha1', 'kind': 'Subscription',
+            'metadata': {'name': name, 'namespace': 'ns-' + name},
+            'spec': {'name': name, 'channel': 'stable', 'installPlanApproval': 'Automatic',
+                     'source': 'redhat-operators', 'sourceNamespace': 'openshift-marketplace'}}
+
+
+def barrier(cluster, names, timeout):
+    """Run operator_wait.py for names; returns its JSON report"""
+    server = cluster.server('wait')
+    result = subprocess.run(
+        [sys.executable, WAIT, '--api', 'http://127.0.0.1:%d' % server.server_port, '--timeout', str(timeout)]
+        + ['--operator=ns-%s/%s' % (name, name) for name in names],
+        capture_output=True, text=True)
+    report = json.loads(result.stdout[result.stdout.index('\n{') + 1:])
+    report['rc'] = result.returncode
+    return report
+
+
+def run(mode, operators, args):
+    latencies = {name: (installplan * args.scale, csv * args.scale) for name, installplan, csv in operators}
+    cluster = Cluster(mode, render=None, operator_latencies=latencies)
+    names = [name for name, _, _ in operators]
+    start = time.perf_counter()
+    reports = []
+    if mode == 'stacked':
+        for i, name in enumerate(names):
+            if i:
+                time.sleep(args.wave_delay)
+            cluster.apply(subscription(name), None)
+            reports.append(barrier(cluster, [name], args.timeout))
+    else:
+        for name in names:
+            cluster.apply(subscription(name), None)
+        reports.append(barrier(cluster, names, args.timeout))
+    seconds = time.perf_counter() - start
+    requests = cluster.requests().get('wait', 0)
+    cluster.stop()
+    return {
+        'seconds': round(seconds, 2),
+        'ready': all(report['rc'] == 0 for report in reports),
+        'api_requests': requests,
+        'operators': {key: {field: value[field] for field in ('state', 'installplan_s', 'succeeded_s')}
+                      for report in reports for key, value in report['operators'].items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark stacked and concurrent operator installs')
+    parser.add_argument('--operators', nargs='+', default=OPERATORS, metavar='NAME:INSTALLPLAN:CSV',
+                        help='Operators and their simulated InstallPlan and CSV seconds')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier of the simulated install times (default: 1)')
+    parser.add_argument('--wave-delay', type=float, default=2.0,
+                        help="ArgoCD's delay between sync waves in seconds (default: 2)")
+    parser.add_argument('--timeout', type=int, default=1200,
+                        help='Seconds the barrier waits (default: 1200)')
+    args = parser.parse_args(argv)
+    operators = []
+    for operator in args.operators:
+        name, installplan, csv = operator.split(':')
+        operators.append((name, float(installplan), float(csv)))
+
+    report = {'scale': args.scale,
+              'slowest_operator_s': round(max(i + c for _, i, c in operators) * args.scale, 2),
+              'sum_of_operators_s': round(sum(i + c for _, i, c in operators) * args.scale, 2)}
+    for mode in ('stacked', 'concurrent'):
+        report[mode] = run(mode, operators, args)
+        print('%s done' % mode, file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
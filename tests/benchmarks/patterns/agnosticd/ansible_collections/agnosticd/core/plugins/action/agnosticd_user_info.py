@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# Stand-in for agnosticd.core.agnosticd_user_info used by the pattern benchmark
+#
+# Merges each call into <seat_output_dir>/user-data.json, with per-user data
+# under users.<user>, like the real plugin's user data.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        path = os.path.join(task_vars['seat_output_dir'], 'user-data.json')
+        try:
+            with open(path) as f:
+                user_data = json.load(f)
+        except (OSError, ValueError):
+            user_data = {}
+
+        data = self._task.args.get('data') or {}
+        user = self._task.args.get('user')
+        if user:
+            user_data.setdefault('users', {}).setdefault(user, {}).update(data)
+        else:
+            user_data.update(data)
+
+        with open(path, 'w') as f:
+            json.dump(user_data, f)
+        result['changed'] = True
+        return result
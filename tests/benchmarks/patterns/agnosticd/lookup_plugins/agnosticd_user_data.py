@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Stand-in for the agnosticd_user_data lookup used by the pattern benchmark:
+# returns what the agnosticd_user_info stand-in stored for the seat
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+
+from ansible.plugins.lookup import LookupBase
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        path = os.path.join(variables['seat_output_dir'], 'user-data.json')
+        try:
+            with open(path) as f:
+                user_data = json.load(f)
+        except (OSError, ValueError):
+            user_data = {}
+        return [user_data if term == '*' else user_data.get(term) for term in terms]
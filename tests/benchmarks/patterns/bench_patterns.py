@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmark of the helm, kustomize and ansible patterns
+
+Provisions every example the way RHDP does: ansible-playbook runs the
+ocp4_workload_field_content role's workload.yml (provision.yml), which
+creates the field-content Application and waits for it. Each seat is one
+order with its own simulated cluster (cluster.py): an in-memory API server
+with ArgoCD, OLM and kubelet stand-ins. All seats are provisioned at once by
+one ansible-playbook run with one fork per seat.
+
+- helm: ArgoCD renders examples/helm with helm template and the role's values
+- kustomize: ArgoCD renders examples/kustomize with kustomize build
+  (or kubectl kustomize)
+- ansible: ArgoCD renders examples/ansible/gitops; its Sync hook Job runs
+  examples/ansible/playbooks/site.yml with ansible-playbook against the
+  seat's cluster. The Job's setup and repository fetch are not simulated.
+  deploy-showroom gets a stand-in showroom chart from its cache, so nothing
+  is downloaded
+
+For every pattern and seat count it reports:
+
+- time from Application creation to Healthy (p50, p95 and max over seats)
+- the role's wall time
+- API requests per seat, made by the role and by the ansible Job
+- resources ArgoCD applied
+- per sync wave: resources, apply time, time until healthy, and the wave
+  delay ArgoCD adds before the next wave
+
+    python tests/benchmarks/patterns/bench_patterns.py                        # every pattern, 1 and 5 seats
+    python tests/benchmarks/patterns/bench_patterns.py --patterns helm kustomize --seats 1 10 25
+    python tests/benchmarks/patterns/bench_patterns.py --scale 0.25           # shorter simulated latencies
+
+Requires ansible-core, kubernetes.core, the kubernetes Python client and
+PyYAML. The helm and ansible patterns need helm. The kustomize pattern needs
+kustomize or kubectl. A pattern whose tool is missing is reported as skipped.
+Results are printed as JSON.
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..'))
+ROLE_DIR = os.path.join(REPO_DIR, 'roles', 'ocp4_workload_field_content')
+SHOWROOM_ROLE = os.path.join(REPO_DIR, 'examples', 'ansible', 'playbooks', 'roles', 'deploy-showroom')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from cluster import Cluster, percentile  # noqa: E402
+
+PATTERNS = {
+    'helm': dict(path='examples/helm', deployment_type='helm', tools=('helm',)),
+    'kustomize': dict(path='examples/kustomize', deployment_type='kustomize', tools=('kustomize', 'kubectl')),
+    'ansible': dict(path='examples/ansible/gitops', deployment_type='helm', tools=('helm',)),
+}
+
+# Templates of the stand-in showroom chart deploy-showroom renders in the ansible pattern
+SHOWROOM_CHART = {
+    'Chart.yaml': 'apiVersion: v2\nname: {name}\nversion: {version}\n',
+    'values.yaml': '{}\n',
+    'templates/showroom.yaml': '''\
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: {{ .Release.Name }}
+  namespace: {{ .Release.Namespace }}
+spec:
+  replicas: 1
+  selector:
+    matchLabels:
+      app.kubernetes.io/name: {{ .Release.Name }}
+  template:
+    metadata:
+      labels:
+        app.kubernetes.io/name: {{ .Release.Name }}
+    spec:
+      containers:
+      - name: content
+        image: {{ .Values.content.image | quote }}
+---
+apiVersion: v1
+kind: Service
+metadata:
+  name: {{ .Release.Name }}
+  namespace: {{ .Release.Namespace }}
+spec:
+  selector:
+    app.kubernetes.io/name: {{ .Release.Name }}
+  ports:
+  - port: 8080
+---
+apiVersion: route.openshift.io/v1
+kind: Route
+metadata:
+  name: {{ .Release.Name }}
+  namespace: {{ .Release.Namespace }}
+spec:
+  host: {{ printf "showroom-%s.%s" (toString .Values.guid) .Values.deployer.domain }}
+  to:
+    kind: Service
+    name: {{ .Release.Name }}
+''',
+}
+
+
+def find_tool(name, override):
+    if override:
+        return override
+    return shutil.which(name)
+
+
+class Renderer:
+    """Manifest generation, as the ArgoCD repo server does it"""
+
+    def __init__(self, tmp, helm, kustomize, kubectl):
+        self.tmp = tmp
+        self.helm = helm
+        self.kustomize = kustomize
+        self.kubectl = kubectl
+
+    def __call__(self, app):
+        source = app['spec']['source']
+        path = os.path.join(REPO_DIR, source['path'])
+        if os.path.exists(os.path.join(path, 'Chart.yaml')):
+            fd, values = tempfile.mkstemp(suffix='.yaml', dir=self.tmp)
+            with os.fdopen(fd, 'w') as f:
+                f.write((source.get('helm') or {}).get('values') or '')
+            command = [self.helm, 'template', app['metadata']['name'], path, '-f', values,
+                       '--namespace', app['spec']['destination'].get('namespace') or 'default']
+        elif self.kustomize:
+            command = [self.kustomize, 'build', path]
+        else:
+            command = [self.kubectl, 'kustomize', path]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode:
+            raise RuntimeError('%s failed: %s' % (' '.join(command[:2]), result.stderr.strip()))
+        output = result.stdout
+        # The kustomize-envvar plugin substitutes the Application's plugin environment
+        for variable in (source.get('plugin') or {}).get('env') or []:
+            output = output.replace('${%s}' % variable['name'], variable['value'])
+        return [doc for doc in yaml.safe_load_all(output) if doc]
+
+
+def showroom_cache(tmp):
+    """CACHE_DIR with the stand-in showroom chart where deploy-showroom looks for it"""
+    with open(os.path.join(SHOWROOM_ROLE, 'defaults', 'main.yml')) as f:
+        defaults = yaml.safe_load(f)
+    name = defaults['showroom_deployer_chart_name']
+    requested = defaults['showroom_deployer_chart_version']
+    version = re.sub(r'^[^0-9]*', '', requested)
+    cache_dir = os.path.join(tmp, 'cache')
+    chart_dir = os.path.join(cache_dir, 'showroom', 'charts',
+                             '%s-%s' % (name, re.sub(r'[^A-Za-z0-9._-]', '_', requested)))
+    os.makedirs(chart_dir)
+    with tarfile.open(os.path.join(chart_dir, '%s-%s.tgz' % (name, version)), 'w:gz') as tar:
+        for path, content in SHOWROOM_CHART.items():
+            data = content.replace('{name}', name).replace('{version}', version).encode()
+            info = tarfile.TarInfo('%s/%s' % (name, path))
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return cache_dir
+
+
+class JobRunner:
+    """Runs the ansible-runner Job's playbook against the seat's cluster"""
+
+    def __init__(self, tmp, helm):
+        self.tmp = tmp
+        self.helm = helm
+        self.cache_dir = showroom_cache(tmp)
+        with open(os.path.join(REPO_DIR, 'examples', 'ansible', 'gitops', 'values.yaml')) as f:
+            self.values = yaml.safe_load(f)
+        self.logs = {}
+
+    def __call__(self, cluster, job):
+        container = job['spec']['template']['spec']['containers'][0]
+        env = {variable['name']: variable.get('value', '') for variable in container.get('env') or []}
+        extra_vars = dict(cluster_domain=env.get('CLUSTER_DOMAIN'), cluster_api_url=env.get('CLUSTER_API_URL'),
+                          namespace=env.get('NAMESPACE'), guid=cluster.name)
+        extra_vars.update(self.values['ansible'].get('extraVars') or {})
+        playbooks = os.path.join(REPO_DIR, self.values['ansible']['repository']['path'])
+        extra_vars_path = os.path.join(self.tmp, '%s-job-vars.json' % cluster.name)
+        with open(extra_vars_path, 'w') as f:
+            json.dump(extra_vars, f)
+        kubeconfig = cluster.kubeconfig(self.tmp, 'job')
+        result = subprocess.run(
+            ['ansible-playbook', '-i', 'localhost,', '-c', 'local', '--extra-vars', '@' + extra_vars_path,
+             '-e', 'ansible_python_interpreter=' + sys.executable, self.values['ansible']['playbook']],
+            cwd=playbooks, stdin=subprocess.DEVNULL, capture_output=True, text=True,
+            env=dict(os.environ, KUBECONFIG=kubeconfig, K8S_AUTH_KUBECONFIG=kubeconfig, CACHE_DIR=self.cache_dir,
+                     ANSIBLE_CONFIG=os.path.join(playbooks, 'ansible.cfg'),
+                     PATH=os.pathsep.join([os.path.dirname(os.path.abspath(self.helm)), os.environ['PATH']])))
+        self.logs[cluster.name] = result.stdout[-3000:]
+        return result.returncode == 0
+
+
+def collections_path():
+    configured = os.environ.get('ANSIBLE_COLLECTIONS_PATH') or os.environ.get('ANSIBLE_COLLECTIONS_PATHS') \
+        or os.pathsep.join([os.path.expanduser('~/.ansible/collections'), '/usr/share/ansible/collections'])
+    return os.pathsep.join([os.path.join(BENCH_DIR, 'agnosticd'), configured])
+
+
+def provision(pattern, seats, tools, args, tmp):
+    spec = PATTERNS[pattern]
+    renderer = Renderer(tmp, tools.get('helm'), tools.get('kustomize'), tools.get('kubectl'))
+    job_runner = JobRunner(tmp, tools['helm']) if pattern == 'ansible' else None
+    clusters = [Cluster('seat%d' % i, renderer, job_runner=job_runner, sync_timeout=args.timeout,
+                        installplan_latency=args.installplan_latency * args.scale,
+                        csv_latency=args.csv_latency * args.scale, pod_latency=args.pod_latency * args.scale,
+                        wave_delay=args.wave_delay * args.scale)
+                for i in range(1, seats + 1)]
+
+    hosts = {}
+    for cluster in clusters:
+        output_dir = os.path.join(tmp, cluster.name)
+        os.makedirs(output_dir)
+        hosts[cluster.name] = dict(
+            ansible_connection='local',
+            ansible_python_interpreter=sys.executable,
+            seat_kubeconfig=cluster.kubeconfig(tmp, 'role'),
+            seat_output_dir=output_dir,
+            openshift_cluster_ingress_domain='apps.%s.example.com' % cluster.name,
+            openshift_api_url='https://api.%s.example.com:6443' % cluster.name,
+        )
+    inventory = os.path.join(tmp, 'inventory.json')
+    with open(inventory, 'w') as f:
+        json.dump({'seats': {'hosts': hosts}}, f)
+    extra_vars = os.path.join(tmp, 'extra-vars.json')
+    with open(extra_vars, 'w') as f:
+        json.dump({
+            'ocp4_workload_field_content_gitops_repo_url': 'https://github.com/rhpds/field-sourced-content',
+            'ocp4_workload_field_content_gitops_repo_path': spec['path'],
+            'ocp4_workload_field_content_deployment_type': spec['deployment_type'],
+            'ocp4_workload_field_content_health_timeout': args.timeout,
+            'ocp4_workload_field_content_application_health_timeout': args.timeout,
+        }, f)
+
+    timeline_dir = os.path.join(tmp, 'timeline')
+    env = dict(
+        os.environ,
+        ANSIBLE_ROLES_PATH=os.path.join(REPO_DIR, 'roles'),
+        ANSIBLE_COLLECTIONS_PATH=collections_path(),
+        ANSIBLE_LOOKUP_PLUGINS=os.path.join(BENCH_DIR, 'agnosticd', 'lookup_plugins'),
+        ANSIBLE_CALLBACK_PLUGINS=os.path.join(ROLE_DIR, 'callback_plugins'),
+        ANSIBLE_CALLBACKS_ENABLED='field_content_timeline',
+        FIELD_CONTENT_TIMELINE_DIR=timeline_dir,
+        ANSIBLE_FORKS=str(seats),
+        ANSIBLE_LOCALHOST_WARNING='false',
+    )
+    start = time.perf_counter()
+    result = subprocess.run(['ansible-playbook', '-i', inventory, '-e', '@' + extra_vars,
+                             os.path.join(BENCH_DIR, 'provision.yml')],
+                            env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+    playbook_s = round(time.perf_counter() - start, 2)
+    for cluster in clusters:
+        cluster.stop()
+    return clusters, job_runner, playbook_s, result, timeline_dir
+
+
+def summarize(clusters, job_runner, playbook_s, result, timeline_dir):
+    apps = [cluster.applications.get('field-content') or {} for cluster in clusters]
+    healthy = [app['healthy'] - app['created'] for app in apps if app.get('healthy')]
+    requests = [cluster.requests() for cluster in clusters]
+    report = {
+        'playbook_s': playbook_s,
+        'playbook_rc': result.returncode,
+        'healthy_seats': len(healthy),
+        'time_to_healthy_s': {
+            'p50': round(percentile(healthy, 0.5), 2) if healthy else None,
+            'p95': round(percentile(healthy, 0.95), 2) if healthy else None,
+            'max': round(max(healthy), 2) if healthy else None,
+        },
+        'render_s': round(sum(app.get('render_s') or 0 for app in apps) / len(apps), 3),
+        'api_requests_per_seat': {
+            client: round(sum(r.get(client, 0) for r in requests) / len(requests), 1)
+            for client in sorted(set(client for r in requests for client in r))},
+        'argocd_applies_per_seat': round(sum(app.get('applies', 0) for app in apps) / len(apps), 1),
+    }
+
+    # Sync waves, averaged over the seats
+    waves = {}
+    for app in apps:
+        for wave in app.get('waves') or []:
+            entry = waves.setdefault((wave['phase'], wave['wave']), dict(
+                phase=wave['phase'], wave=wave['wave'], resources=wave['resources'], kinds=wave['kinds'],
+                apply_s=[], healthy_s=[], delay_s=[]))
+            for key in ('apply_s', 'healthy_s', 'delay_s'):
+                entry[key].append(wave[key])
+    report['waves'] = []
+    for entry in waves.values():
+        for key in ('apply_s', 'healthy_s', 'delay_s'):
+            entry[key] = round(sum(entry[key]) / len(entry[key]), 3)
+        report['waves'].append(entry)
+
+    timeline_path = os.path.join(timeline_dir, 'timeline.json')
+    if os.path.exists(timeline_path):
+        with open(timeline_path) as f:
+            tasks = json.load(f)['tasks']
+        waits = [task['seconds'] for task in tasks if task['action'] == 'field_content_application_wait']
+        report['role_wait_s'] = round(max(waits), 2) if waits else None
+    skipped = sorted(set(name for app in apps for name in app.get('skipped') or []))
+    if skipped:
+        report['not_simulated'] = skipped
+    errors = {cluster.name: app['error'] for cluster, app in zip(clusters, apps) if app.get('error')}
+    if errors:
+        report['errors'] = errors
+    if result.returncode:
+        report['playbook_output'] = result.stdout[-2000:]
+    if job_runner is not None and (errors or result.returncode):
+        report['job_output'] = job_runner.logs
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the helm, kustomize and ansible patterns offline')
+    parser.add_argument('--patterns', nargs='+', choices=sorted(PATTERNS), default=['helm', 'kustomize', 'ansible'],
+                        help='Patterns to benchmark (default: all)')
+    parser.add_argument('--seats', metavar='N', type=int, nargs='+', default=[1, 5],
+                        help='Seat counts, one simulated cluster per seat (default: 1 5)')
+    parser.add_argument('--helm', help='helm binary (default: helm on PATH)')
+    parser.add_argument('--kustomize', help='kustomize binary (default: kustomize, else kubectl kustomize)')
+    parser.add_argument('--installplan-latency', type=float, default=2.0,
+                        help='Seconds until a Subscription gets its InstallPlan and CSV (default: 2)')
+    parser.add_argument('--csv-latency', type=float, default=5.0,
+                        help='Seconds until a CSV succeeds (default: 5)')
+    parser.add_argument('--pod-latency', type=float, default=3.0,
+                        help='Seconds until a Pod is ready and a Job without a runner completes (default: 3)')
+    parser.add_argument('--wave-delay', type=float, default=2.0,
+                        help="ArgoCD's delay between sync waves in seconds (default: 2)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Multiplier of all simulated latencies (default: 1)')
+    parser.add_argument('--timeout', type=int, default=900,
+                        help='Seconds the role and ArgoCD wait for an Application (default: 900)')
+    args = parser.parse_args(argv)
+
+    tools = {
+        'helm': find_tool('helm', args.helm),
+        'kustomize': find_tool('kustomize', args.kustomize),
+        'kubectl': shutil.which('kubectl'),
+    }
+    report = {'scale': args.scale, 'patterns': {}}
+    for pattern in args.patterns:
+        if not any(tools.get(tool) for tool in PATTERNS[pattern]['tools']):
+            report['patterns'][pattern] = {'skipped': '%s not found' % ' or '.join(PATTERNS[pattern]['tools'])}
+            continue
+        entry = {}
+        for seats in args.seats:
+            with tempfile.TemporaryDirectory() as tmp:
+                entry['seats_%d' % seats] = summarize(*provision(pattern, seats, tools, args, tmp))
+            print('%s, %d seats done' % (pattern, seats), file=sys.stderr)
+        report['patterns'][pattern] = entry
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
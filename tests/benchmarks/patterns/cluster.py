@@ -0,0 +1,316 @@
+"""
+Simulated OpenShift cluster for the pattern benchmark
+
+A Cluster is a fake_api Store with its own API server plus the controllers
+that make objects converge the way they do on a real cluster, with latencies
+taken from the benchmark's arguments:
+
+- ArgoCD syncs every Application from manifests produced by a render
+  callable, phase by phase (PreSync, Sync, PostSync) and wave by wave. It
+  waits for a wave to be healthy and then for the wave delay
+  (ARGOCD_SYNC_WAVE_DELAY, 2s by default) before applying the next one, and
+  records what every wave cost
+- OLM gives a Subscription a completed InstallPlan and an installing CSV
+  after installplan_latency; the CSV succeeds and the Subscription reaches
+  AtLatestKnown csv_latency later. operator_latencies overrides both per
+  package: {package: (installplan_latency, csv_latency)}
+- the kubelet starts a Pod for every Deployment replica, Running and ready
+  after pod_latency, binds PersistentVolumeClaims and completes Jobs after
+  pod_latency, or hands them to a job runner callable (the ansible pattern
+  runs its playbook there)
+"""
+
+import collections
+import copy
+import os
+import threading
+import time
+
+import fake_api
+
+KINDS = {kind: (fake_api.group_version(group, version), plural, namespaced)
+         for group, version, kind, plural, namespaced in fake_api.RESOURCES}
+PHASES = ('PreSync', 'Sync', 'PostSync')
+ARGOCD = 'argoproj.io/v1alpha1'
+OLM = 'operators.coreos.com/v1alpha1'
+
+
+class SyncFailed(Exception):
+    pass
+
+
+def annotation(obj, name, default=None):
+    return ((obj.get('metadata') or {}).get('annotations') or {}).get(name, default)
+
+
+def sync_plan(manifests):
+    """[(phase, wave, objects)] in the order ArgoCD applies them"""
+    steps = collections.defaultdict(list)
+    for obj in manifests:
+        hook = annotation(obj, 'argocd.argoproj.io/hook')
+        phase = hook if hook in PHASES else 'Sync'
+        wave = int(annotation(obj, 'argocd.argoproj.io/sync-wave', '0'))
+        steps[(PHASES.index(phase), wave)].append(obj)
+    return [(PHASES[phase], wave, steps[(phase, wave)]) for phase, wave in sorted(steps)]
+
+
+class Cluster:
+
+    def __init__(self, name, render, installplan_latency=2.0, csv_latency=5.0, pod_latency=3.0,
+                 wave_delay=2.0, sync_timeout=1800, job_runner=None, operator_latencies=None):
+        self.name = name
+        self.render = render
+        self.installplan_latency = installplan_latency
+        self.csv_latency = csv_latency
+        self.operator_latencies = operator_latencies or {}
+        self.pod_latency = pod_latency
+        self.wave_delay = wave_delay
+        self.sync_timeout = sync_timeout
+        self.job_runner = job_runner
+        self.store = fake_api.Store()
+        self.servers = {}
+        # Application name -> {created, healthy, render_s, waves, applies, error}
+        self.applications = {}
+        self.due = {}
+        self.running = True
+        for namespace in ('openshift-gitops', 'openshift-operators', 'openshift-marketplace'):
+            self.store.put('v1', 'namespaces', {'metadata': {'name': namespace}})
+        threading.Thread(target=self._controllers, daemon=True).start()
+
+    def server(self, client='api'):
+        """Server of this cluster that logs requests under client"""
+        if client not in self.servers:
+            self.servers[client] = fake_api.serve(self.store, name=client)
+        return self.servers[client]
+
+    def kubeconfig(self, directory, client='api'):
+        return fake_api.kubeconfig(os.path.join(directory, '%s-%s.kubeconfig' % (self.name, client)),
+                                   self.server(client))
+
+    def requests(self):
+        return dict(collections.Counter(client for client, _, _ in self.store.log))
+
+    def stop(self):
+        self.running = False
+        for server in self.servers.values():
+            server.shutdown()
+
+    # Objects
+
+    def get(self, obj, namespace=None):
+        gv, plural, namespaced = KINDS[obj['kind']]
+        metadata = obj['metadata']
+        return self.store.get(gv, plural, (metadata.get('namespace') or namespace) if namespaced else '',
+                              metadata['name'])
+
+    def apply(self, obj, namespace):
+        """Create or update obj like a sync; the status of an existing object is kept"""
+        obj = copy.deepcopy(obj)
+        gv, plural, namespaced = KINDS[obj['kind']]
+        metadata = obj['metadata']
+        if namespaced:
+            metadata['namespace'] = metadata.get('namespace') or namespace
+        else:
+            metadata.pop('namespace', None)
+        with self.store.cond:
+            current = self.store.get(gv, plural, metadata.get('namespace'), metadata['name'])
+            if current is not None:
+                if 'status' in current:
+                    obj['status'] = current['status']
+                metadata['uid'] = current['metadata']['uid']
+            return self.store.put(gv, plural, obj)
+
+    def health(self, obj, namespace):
+        """Healthy, Progressing or Degraded, following ArgoCD's health checks"""
+        live = self.get(obj, namespace)
+        if live is None:
+            return 'Progressing'
+        status = live.get('status') or {}
+        kind = live['kind']
+        if kind == 'Deployment':
+            ready = status.get('readyReplicas', 0) >= live.get('spec', {}).get('replicas', 1)
+            return 'Healthy' if ready else 'Progressing'
+        if kind == 'Job':
+            if status.get('failed'):
+                return 'Degraded'
+            return 'Healthy' if status.get('succeeded') else 'Progressing'
+        if kind == 'Subscription':
+            return 'Healthy' if status.get('state') == 'AtLatestKnown' else 'Progressing'
+        if kind == 'ClusterServiceVersion':
+            return 'Healthy' if status.get('phase') == 'Succeeded' else 'Progressing'
+        if kind == 'PersistentVolumeClaim':
+            return 'Healthy' if status.get('phase') == 'Bound' else 'Progressing'
+        if kind == 'Pod':
+            return 'Healthy' if status.get('phase') in ('Running', 'Succeeded') else 'Progressing'
+        return 'Healthy'
+
+    # ArgoCD
+
+    def set_application_status(self, app, sync, health, phase, message=''):
+        with self.store.cond:
+            live = self.store.get(ARGOCD, 'applications', app['metadata']['namespace'], app['metadata']['name'])
+            if live is None:
+                return
+            live = copy.deepcopy(live)
+            live['status'] = {
+                'sync': {'status': sync},
+                'health': {'status': health},
+                'operationState': {'phase': phase, 'message': message},
+            }
+            self.store.put(ARGOCD, 'applications', live)
+
+    def sync(self, app):
+        record = self.applications[app['metadata']['name']]
+        namespace = app['spec']['destination'].get('namespace') or 'default'
+        self.set_application_status(app, 'OutOfSync', 'Progressing', 'Running')
+        try:
+            start = time.monotonic()
+            manifests = self.render(app)
+            record['render_s'] = round(time.monotonic() - start, 3)
+            if 'CreateNamespace=true' in ((app['spec'].get('syncPolicy') or {}).get('syncOptions') or []):
+                self.apply({'kind': 'Namespace', 'metadata': {'name': namespace}}, None)
+            deadline = time.monotonic() + self.sync_timeout
+            steps = sync_plan(manifests)
+            for index, (phase, wave, objects) in enumerate(steps):
+                start = time.monotonic()
+                for obj in objects:
+                    if obj.get('kind') not in KINDS:
+                        record['skipped'].append('%s/%s' % (obj.get('kind'), obj['metadata'].get('name')))
+                        continue
+                    self.apply(obj, namespace)
+                    record['applies'] += 1
+                applied = time.monotonic()
+                while True:
+                    health = [self.health(obj, namespace) for obj in objects if obj.get('kind') in KINDS]
+                    if 'Degraded' in health:
+                        raise SyncFailed('%s wave %s is degraded' % (phase, wave))
+                    if all(status == 'Healthy' for status in health):
+                        break
+                    if time.monotonic() > deadline:
+                        raise SyncFailed('timed out in %s wave %s' % (phase, wave))
+                    time.sleep(0.05)
+                healthy = time.monotonic()
+                if index < len(steps) - 1:
+                    time.sleep(self.wave_delay)
+                record['waves'].append(dict(
+                    phase=phase, wave=wave, resources=len(objects),
+                    kinds=dict(collections.Counter(obj.get('kind') for obj in objects)),
+                    apply_s=round(applied - start, 3), healthy_s=round(healthy - applied, 3),
+                    delay_s=round(time.monotonic() - healthy, 3)))
+            record['healthy'] = time.monotonic()
+            self.set_application_status(app, 'Synced', 'Healthy', 'Succeeded')
+        except Exception as e:
+            record['error'] = str(e)
+            self.set_application_status(app, 'OutOfSync', 'Degraded', 'Failed', str(e))
+
+    # Controllers
+
+    def after(self, key, seconds, now):
+        """True once seconds have passed since key was first seen"""
+        return now - self.due.setdefault(key, now) >= seconds
+
+    def _controllers(self):
+        while self.running:
+            with self.store.cond:
+                self.store.cond.wait(0.05)
+                objects = list(self.store.objects.items())
+            now = time.monotonic()
+            for (gv, plural, namespace, name), obj in objects:
+                uid = obj['metadata']['uid']
+                if plural == 'applications' and name not in self.applications:
+                    self.applications[name] = dict(created=now, healthy=None, render_s=None, waves=[],
+                                                   applies=0, skipped=[], error=None)
+                    threading.Thread(target=self.sync, args=(copy.deepcopy(obj),), daemon=True).start()
+                elif plural == 'subscriptions':
+                    self._olm(obj, uid, now)
+                elif plural == 'deployments':
+                    self._deployment(obj, uid, now)
+                elif plural == 'pods' and not (obj.get('status') or {}).get('phase') == 'Running' \
+                        and self.after(uid, self.pod_latency, now):
+                    self._update(gv, plural, obj, status={
+                        'phase': 'Running',
+                        'containerStatuses': [{'name': c['name'], 'ready': True}
+                                              for c in obj['spec'].get('containers') or []]})
+                elif plural == 'persistentvolumeclaims' and not obj.get('status'):
+                    self._update(gv, plural, obj, status={'phase': 'Bound'})
+                elif plural == 'jobs':
+                    self._job(obj, uid, now)
+
+    def _update(self, gv, plural, obj, status):
+        with self.store.cond:
+            live = self.store.get(gv, plural, obj['metadata'].get('namespace'), obj['metadata']['name'])
+            if live is None or live['metadata']['uid'] != obj['metadata']['uid']:
+                return
+            live = copy.deepcopy(live)
+            live['status'] = dict(live.get('status') or {}, **status)
+            self.store.put(gv, plural, live)
+
+    def _olm(self, sub, uid, now):
+        status = sub.get('status') or {}
+        namespace = sub['metadata']['namespace']
+        csv = '%s.v1.0.0' % sub['spec']['name']
+        installplan_latency, csv_latency = self.operator_latencies.get(
+            sub['spec']['name'], (self.installplan_latency, self.csv_latency))
+        if not status.get('currentCSV') and self.after(uid, installplan_latency, now):
+            self.store.put(OLM, 'installplans', {'metadata': {'name': 'install-%s' % sub['spec']['name'],
+                                                              'namespace': namespace},
+                                                 'spec': {'clusterServiceVersionNames': [csv], 'approved': True},
+                                                 'status': {'phase': 'Complete'}})
+            self.store.put(OLM, 'clusterserviceversions', {'metadata': {'name': csv, 'namespace': namespace},
+                                                           'status': {'phase': 'Installing'}})
+            self._update(OLM, 'subscriptions', sub, status={
+                'currentCSV': csv, 'state': 'UpgradePending',
+                'installPlanRef': {'name': 'install-%s' % sub['spec']['name'], 'namespace': namespace}})
+            self.due[uid + '/csv'] = now
+        elif status.get('state') == 'UpgradePending' and self.after(uid + '/csv', csv_latency, now):
+            csv_obj = self.store.get(OLM, 'clusterserviceversions', namespace, csv)
+            if csv_obj is not None:
+                self._update(OLM, 'clusterserviceversions', csv_obj, status={'phase': 'Succeeded'})
+            self._update(OLM, 'subscriptions', sub, status={'state': 'AtLatestKnown', 'installedCSV': csv})
+
+    def _deployment(self, deployment, uid, now):
+        replicas = deployment.get('spec', {}).get('replicas', 1)
+        namespace = deployment['metadata']['namespace']
+        template = deployment.get('spec', {}).get('template') or {}
+        if uid not in self.due:
+            self.due[uid] = now
+            for i in range(replicas):
+                self.store.put('v1', 'pods', {
+                    'metadata': {'name': '%s-%s-%d' % (deployment['metadata']['name'], uid[-5:], i),
+                                 'namespace': namespace,
+                                 'labels': dict((template.get('metadata') or {}).get('labels') or {})},
+                    'spec': copy.deepcopy(template.get('spec') or {'containers': [{'name': 'main'}]}),
+                    'status': {'phase': 'Pending'}})
+        elif (deployment.get('status') or {}).get('readyReplicas', 0) < replicas \
+                and self.after(uid, self.pod_latency, now):
+            self._update('apps/v1', 'deployments', deployment,
+                         status={'replicas': replicas, 'readyReplicas': replicas, 'availableReplicas': replicas})
+
+    def _job(self, job, uid, now):
+        if (job.get('status') or {}).get('succeeded') or (job.get('status') or {}).get('failed') \
+                or uid + '/running' in self.due:
+            return
+        if self.job_runner is not None:
+            self.due[uid + '/running'] = now
+
+            def run():
+                succeeded = self.job_runner(self, copy.deepcopy(job))
+                self._finish_job(job, succeeded)
+
+            threading.Thread(target=run, daemon=True).start()
+        elif self.after(uid, self.pod_latency, now):
+            self._finish_job(job, True)
+
+    def _finish_job(self, job, succeeded):
+        condition = 'Complete' if succeeded else 'Failed'
+        self._update('batch/v1', 'jobs', job, status={
+            'succeeded' if succeeded else 'failed': 1,
+            'conditions': [{'type': condition, 'status': 'True'}]})
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the rhoai addon's gateway route patcher
+
+Runs the patcher (cluster-addons/rhoai/files/gateway_route.py) against the
+in-memory API server (../fake_api.py). The Gateway appears --gateway-delay
+seconds after the PostSync hook starts and its Service --service-delay
+seconds after that, as when the operator is still rolling out:
+
+- resync: one attempt that gives up unless both already exist, repeated
+  every --resync seconds, the way make_route.sh needed a re-sync of the
+  Application each time it failed
+- watch: one run that follows Gateways and Services and makes the Route as
+  soon as both exist, as the chart runs it
+
+    python tests/benchmarks/rhoai/bench_gateway_route.py
+    python tests/benchmarks/rhoai/bench_gateway_route.py --gateway-delay 20 --service-delay 10 --resync 30
+
+It reports when the Route was created, the attempts and the API requests.
+Results are printed as JSON.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PATCHER = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'cluster-addons', 'rhoai', 'files',
+                                        'gateway_route.py'))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_api import Store, serve  # noqa: E402
+
+NAMESPACE = 'openshift-ingress'
+GATEWAY = 'data-science-gateway'
+
+
+def create_later(store, gateway_delay, service_delay):
+    """Create the Gateway, then its Service, after the delays"""
+    time.sleep(gateway_delay)
+    store.put('gateway.networking.k8s.io/v1', 'gateways', {
+        'metadata': {'name': GATEWAY, 'namespace': NAMESPACE},
+        'spec': {'gatewayClassName': 'openshift-default',
+                 'listeners': [{'name': 'https', 'port': 443, 'protocol': 'HTTPS',
+                                'hostname': 'rh-ai.apps.cluster-abc12.example.com'}]}})
+    time.sleep(service_delay)
+    store.put('v1', 'services', {
+        'metadata': {'name': GATEWAY + '-openshift-default', 'namespace': NAMESPACE,
+                     'labels': {'gateway.networking.k8s.io/gateway-name': GATEWAY}},
+        'spec': {'type': 'LoadBalancer', 'ports': [{'name': 'https', 'port': 443}]}})
+
+
+def attempt(api, timeout):
+    result = subprocess.run([sys.executable, PATCHER, '--api', api, '--timeout', str(timeout)],
+                            capture_output=True, text=True)
+    return result.returncode
+
+
+def run(mode, args):
+    store = Store()
+    server = serve(store)
+    api = 'http://127.0.0.1:%d' % server.server_port
+    threading.Thread(target=create_later, args=(store, args.gateway_delay, args.service_delay), daemon=True).start()
+    start = time.perf_counter()
+    attempts = 0
+    while True:
+        attempts += 1
+        if mode == 'watch':
+            returncode = attempt(api, args.timeout)
+        else:
+            returncode = attempt(api, 1)
+        if returncode == 0 or mode == 'watch' or time.perf_counter() - start > args.timeout:
+            break
+        time.sleep(args.resync)
+    seconds = time.perf_counter() - start
+    route = store.get('route.openshift.io/v1', 'routes', NAMESPACE, 'gateway-lb-' + GATEWAY)
+    server.shutdown()
+    return {
+        'seconds': round(seconds, 2),
+        'route': route is not None,
+        'attempts': attempts,
+        'api_requests': store.requests,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the rhoai addon's gateway route patcher")
+    parser.add_argument('--gateway-delay', type=float, default=5.0,
+                        help='Seconds until the Gateway exists (default: 5)')
+    parser.add_argument('--service-delay', type=float, default=5.0,
+                        help='Seconds from the Gateway until its Service exists (default: 5)')
+    parser.add_argument('--resync', type=float, default=15.0,
+                        help='Seconds between attempts in resync mode (default: 15)')
+    parser.add_argument('--timeout', type=int, default=120,
+                        help='Seconds either mode waits at most (default: 120)')
+    args = parser.parse_args(argv)
+
+    report = {'objects_ready_s': args.gateway_delay + args.service_delay}
+    for mode in ('resync', 'watch'):
+        report[mode] = run(mode, args)
+        print('%s done' % mode, file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark placing field content Applications on ArgoCD controller shards
+
+Simulates one resync of every Application: each controller shard refreshes
+its Applications with --processors workers, and a refresh takes --base-ms
+plus --resource-ms per managed resource. The Applications arrive in orders
+of --batch at a time, with resource counts drawn from a long-tailed
+distribution, and are placed three ways:
+
+- single: all on in-cluster, as without cluster aliases; every Application
+  is on shard 0 however many replicas the controller has
+- round-robin: one shard after the other, ignoring their sizes
+- balanced: the role's field_content_shard_orders filter, batch by batch,
+  counting the Applications already placed
+
+It reports how long after the resync the Applications are reconciled
+(p50, p95, last) and the resources of the fullest and emptiest shard.
+
+    python tests/benchmarks/sharding/bench_sharding.py                       # 100, 500, 1000 Applications on 3 shards
+    python tests/benchmarks/sharding/bench_sharding.py --applications 2000 --shards 5 --batch 50
+
+Results are printed as JSON.
+"""
+
+import argparse
+import heapq
+import importlib.util
+import json
+import os
+import random
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLE_DIR = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'roles', 'ocp4_workload_field_content'))
+
+
+def load_filter():
+    path = os.path.join(ROLE_DIR, 'filter_plugins', 'field_content_applications.py')
+    spec = importlib.util.spec_from_file_location('field_content_applications', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def orders(count, seed):
+    """count orders; most are small labs, a few bring whole operators and many users"""
+    rng = random.Random(seed)
+    return [{'name': 'order%04d' % i, 'expected_resources': max(3, min(600, int(rng.lognormvariate(3.2, 1.0))))}
+            for i in range(count)]
+
+
+def place(strategy, batch_orders, shards, batch, module):
+    if strategy == 'single':
+        return [0] * len(batch_orders)
+    if strategy == 'round-robin':
+        return [i % shards for i in range(len(batch_orders))]
+    applications = []
+    placement = []
+    for start in range(0, len(batch_orders), batch):
+        placed = module.field_content_shard_orders(batch_orders[start:start + batch], shards=shards,
+                                                   applications=applications)
+        for order in placed:
+            placement.append(order['shard'])
+            # Once synced, an Application reports the resources it manages
+            applications.append({
+                'metadata': {'name': order['application'],
+                             'annotations': {module.SHARD_ANNOTATION: str(order['shard'])}},
+                'status': {'resources': [{}] * order['expected_resources']},
+            })
+    return placement
+
+
+def resync(resources, placement, shards, processors, base_ms, resource_ms, seed):
+    """Seconds until each Application is reconciled when every one is queued at once"""
+    rng = random.Random(seed)
+    queues = [[] for _ in range(shards)]
+    for count, shard in zip(resources, placement):
+        queues[shard].append(count)
+    done = []
+    for queue in queues:
+        rng.shuffle(queue)
+        workers = [0.0] * processors
+        for count in queue:
+            start = heapq.heappop(workers)
+            finish = start + (base_ms + resource_ms * count) / 1000
+            heapq.heappush(workers, finish)
+            done.append(finish)
+    return sorted(done)
+
+
+def run(strategy, batch_orders, args, module):
+    placement = place(strategy, batch_orders, args.shards, args.batch, module)
+    resources = [order['expected_resources'] for order in batch_orders]
+    done = resync(resources, placement, args.shards, args.processors, args.base_ms, args.resource_ms, args.seed)
+    loads = [0] * args.shards
+    for count, shard in zip(resources, placement):
+        loads[shard] += count
+    return {
+        'p50_s': round(done[len(done) // 2], 2),
+        'p95_s': round(done[int(len(done) * 0.95)], 2),
+        'last_s': round(done[-1], 2),
+        'fullest_shard_resources': max(loads),
+        'emptiest_shard_resources': min(loads),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark placing Applications on controller shards')
+    parser.add_argument('--applications', metavar='N', type=int, nargs='+', default=[100, 500, 1000],
+                        help='Applications on the cluster (default: 100 500 1000)')
+    parser.add_argument('--shards', type=int, default=3, help='Controller shards (default: 3)')
+    parser.add_argument('--batch', type=int, default=10, help='Orders placed per role run (default: 10)')
+    parser.add_argument('--processors', type=int, default=50,
+                        help="Status processors per shard, the chart's default (default: 50)")
+    parser.add_argument('--base-ms', type=float, default=50.0,
+                        help='Milliseconds of every refresh (default: 50)')
+    parser.add_argument('--resource-ms', type=float, default=15.0,
+                        help='Milliseconds per managed resource of a refresh (default: 15)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    module = load_filter()
+
+    report = {'shards': args.shards, 'processors': args.processors}
+    for count in args.applications:
+        batch_orders = orders(count, args.seed)
+        report['applications_%d' % count] = {strategy: run(strategy, batch_orders, args, module)
+                                             for strategy in ('single', 'round-robin', 'balanced')}
+        print('%d applications done' % count, file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark the field content workload removal against a stand-in API server
+
+Fills tests/benchmarks/fake_api.py with what a lab of N seats leaves behind:
+the field-content Application, one labelled Application with the ArgoCD
+resources finalizer per seat, one labelled namespace per seat with a
+Deployment and a userinfo ConfigMap in it, and a shared userinfo ConfigMap.
+A stand-in ArgoCD removes the finalizer of a deleted Application after
+--app-delay seconds; namespaces take --namespace-delay seconds to terminate.
+With --stuck N, N Applications keep their finalizer and N namespaces hold a
+finalized Pod that nothing removes, so the finalizer deadline is exercised.
+
+For each seat count and --parallelism it runs the role's remove_workload.yml
+(teardown.yml) with ansible-playbook and reports wall time, the module's
+per-phase timings, API requests and how each resource ended:
+
+    python tests/benchmarks/teardown/bench_teardown.py                     # 20 and 100 seats
+    python tests/benchmarks/teardown/bench_teardown.py --seats 100 --parallelism 1 25 100
+    python tests/benchmarks/teardown/bench_teardown.py --seats 20 --stuck 2 --finalizer-timeout 3
+
+Requires ansible-core, kubernetes.core and the kubernetes Python client.
+Results are printed as JSON.
+"""
+
+import argparse
+import collections
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..'))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_api import Store, kubeconfig, serve  # noqa: E402
+
+ARGOCD = 'argoproj.io/v1alpha1'
+GITOPS = 'openshift-gitops'
+APP_FINALIZER = 'resources-finalizer.argocd.argoproj.io'
+
+
+def populate(store, seats, stuck):
+    """Objects a lab of seats leaves behind; returns the names of the stuck Applications"""
+    store.put('v1', 'namespaces', {'metadata': {'name': GITOPS}})
+    store.put(ARGOCD, 'applications', {'metadata': {
+        'name': 'field-content', 'namespace': GITOPS, 'finalizers': [APP_FINALIZER],
+        'labels': {'demo.redhat.com/application': 'field-content'}}})
+    store.put('v1', 'configmaps', {'metadata': {
+        'name': 'field-content-info', 'namespace': GITOPS, 'labels': {'demo.redhat.com/userinfo': ''}},
+        'data': {'demo_url': 'https://demo.apps.cluster.example.com'}})
+    stuck_apps = set()
+    for i in range(1, seats + 1):
+        user = 'user%d' % i
+        namespace = '%s-showroom' % user
+        labels = {'demo.redhat.com/application': 'showroom-%s' % user}
+        store.put(ARGOCD, 'applications', {'metadata': {
+            'name': 'showroom-%s' % user, 'namespace': GITOPS, 'finalizers': [APP_FINALIZER], 'labels': labels}})
+        store.put('v1', 'namespaces', {'metadata': {'name': namespace, 'labels': labels}})
+        store.put('apps/v1', 'deployments', {'metadata': {'name': 'showroom', 'namespace': namespace}})
+        store.put('v1', 'configmaps', {'metadata': {
+            'name': 'showroom-userinfo', 'namespace': namespace, 'labels': {'demo.redhat.com/userinfo': ''}},
+            'data': {'%s_showroom_url' % user: 'https://showroom-%s.apps.cluster.example.com' % user}})
+        if i <= stuck:
+            stuck_apps.add('showroom-%s' % user)
+            store.put('v1', 'pods', {'metadata': {
+                'name': 'stuck', 'namespace': namespace, 'finalizers': ['example.com/never-removed']}})
+    return stuck_apps
+
+
+def argocd(store, delay, stuck_apps):
+    """Remove the resources finalizer of deleted Applications after delay seconds"""
+    seen = {}
+    while True:
+        with store.cond:
+            store.cond.wait(0.02)
+            now = time.monotonic()
+            for (gv, plural, namespace, name), obj in list(store.objects.items()):
+                if plural != 'applications' or not obj['metadata'].get('deletionTimestamp') \
+                        or name in stuck_apps:
+                    continue
+                if now - seen.setdefault(name, now) >= delay:
+                    store.put(gv, plural, obj, 'DELETED')
+
+
+def run(seats, parallelism, args):
+    store = Store(namespace_delay=args.namespace_delay)
+    stuck_apps = populate(store, seats, args.stuck)
+    threading.Thread(target=argocd, args=(store, args.app_delay, stuck_apps), daemon=True).start()
+    server = serve(store)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            K8S_AUTH_KUBECONFIG=kubeconfig(os.path.join(tmp, 'kubeconfig'), server),
+            ANSIBLE_ROLES_PATH=os.path.join(REPO_DIR, 'roles'),
+            ANSIBLE_LOCALHOST_WARNING='false',
+            ANSIBLE_INVENTORY_UNPARSED_WARNING='false',
+        )
+        output_file = os.path.join(tmp, 'teardown.json')
+        start = time.perf_counter()
+        result = subprocess.run(
+            ['ansible-playbook', os.path.join(BENCH_DIR, 'teardown.yml'),
+             '-e', 'output_file=' + output_file,
+             '-e', 'ocp4_workload_field_content_remove_parallelism=%d' % parallelism,
+             '-e', 'ocp4_workload_field_content_remove_finalizer_timeout=%d' % args.finalizer_timeout],
+            env=env, stdin=subprocess.DEVNULL, capture_output=True, text=True)
+        seconds = round(time.perf_counter() - start, 2)
+        if result.returncode:
+            raise SystemExit('teardown.yml failed:\n' + result.stdout[-4000:])
+        with open(output_file) as f:
+            report = json.load(f)
+    server.shutdown()
+
+    left = sorted('%s/%s' % (key[1], '/'.join(filter(None, key[2:]))) for key in store.objects
+                  if key[2:] != ('', GITOPS))
+    seconds_by_kind = collections.defaultdict(list)
+    for resource in report['resources']:
+        seconds_by_kind[resource['kind']].append(resource['seconds'] or 0)
+    return {
+        'playbook_s': seconds,
+        'teardown_s': report['elapsed'],
+        'phases': report['phases'],
+        'api_requests': store.requests,
+        'results': dict(collections.Counter(resource['result'] for resource in report['resources'])),
+        'finalizers_removed': sum(1 for resource in report['resources'] if resource['finalizers_removed']),
+        'slowest_s': {kind: max(values) for kind, values in seconds_by_kind.items()},
+        'left_behind': left,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the field content workload removal')
+    parser.add_argument('--seats', metavar='N', type=int, nargs='+', default=[20, 100],
+                        help='Seat counts to benchmark (default: 20 100)')
+    parser.add_argument('--parallelism', metavar='N', type=int, nargs='+', default=[1, 10, 50],
+                        help='Deletions in flight (default: 1 10 50)')
+    parser.add_argument('--app-delay', type=float, default=0.2,
+                        help='Seconds ArgoCD takes to finalize a deleted Application (default: 0.2)')
+    parser.add_argument('--namespace-delay', type=float, default=0.3,
+                        help='Seconds an empty namespace takes to terminate (default: 0.3)')
+    parser.add_argument('--stuck', metavar='N', type=int, default=0,
+                        help='Applications and namespaces whose finalizers are never removed (default: 0)')
+    parser.add_argument('--finalizer-timeout', type=int, default=5,
+                        help='Seconds before finalizers are removed (default: 5)')
+    args = parser.parse_args(argv)
+
+    report = {'app_delay': args.app_delay, 'namespace_delay': args.namespace_delay, 'stuck': args.stuck,
+              'seats': {}}
+    for seats in args.seats:
+        entry = {}
+        for parallelism in args.parallelism:
+            entry['parallelism_%d' % parallelism] = run(seats, parallelism, args)
+            print('%d seats, parallelism %d done' % (seats, parallelism), file=sys.stderr)
+        report['seats'][str(seats)] = entry
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
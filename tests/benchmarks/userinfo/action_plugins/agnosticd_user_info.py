@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Stand-in for agnosticd.core.agnosticd_user_info used by the userinfo benchmark
+#
+# Like the real plugin it merges each call into user data kept on disk, with
+# per-user data under users.<user>, so both benchmark variants pay the same
+# storage cost and only the task structure differs.
+
+from __future__ import absolute_import, division, print_function
+__metaclass__ = type
+
+import json
+import os
+
+from ansible.plugins.action import ActionBase
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+
+    def run(self, tmp=None, task_vars=None):
+        result = super(ActionModule, self).run(tmp, task_vars)
+        path = os.path.join(task_vars['output_dir'], 'user-data.json')
+        try:
+            with open(path) as f:
+                user_data = json.load(f)
+        except (OSError, ValueError):
+            user_data = {}
+
+        data = self._task.args.get('data') or {}
+        user = self._task.args.get('user')
+        if user:
+            user_data.setdefault('users', {}).setdefault(user, {}).update(data)
+        else:
+            user_data.update(data)
+
+        with open(path, 'w') as f:
+            json.dump(user_data, f)
+        result['changed'] = True
+        return result
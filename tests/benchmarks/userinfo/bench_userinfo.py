@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark userinfo processing of the ocp4_workload_field_content role
+
+Generates one demo.redhat.com/userinfo ConfigMap per user plus one with shared
+data, then times two things for each user count:
+
+- merge: deep-merging every users_json payload in-process, once with the
+  per-item combine(recursive=True) the role used to run in a set_fact loop,
+  once with the role's single-pass field_content_users_json filter
+- playbook: ansible-playbook wall time of legacy.yml (looped set_fact and one
+  agnosticd_user_info call per user) and bulk.yml (filters and one
+  field_content_user_info task), publishing to a local agnosticd_user_info
+  stand-in; both must leave identical user data behind
+
+    python tests/benchmarks/userinfo/bench_userinfo.py                  # 10, 100, 1000 users
+    python tests/benchmarks/userinfo/bench_userinfo.py --users 200 --repeat 3
+    python tests/benchmarks/userinfo/bench_userinfo.py --merge-only     # skip ansible-playbook
+
+Results are printed as JSON.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROLE_DIR = os.path.normpath(os.path.join(BENCH_DIR, '..', '..', '..', 'roles', 'ocp4_workload_field_content'))
+
+
+def load_filters():
+    path = os.path.join(ROLE_DIR, 'filter_plugins', 'field_content_userinfo.py')
+    spec = importlib.util.spec_from_file_location('field_content_userinfo', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def configmaps(users):
+    """One ConfigMap per user, as showroom creates them, plus one with shared data"""
+    resources = [{
+        'kind': 'ConfigMap',
+        'metadata': {'name': 'field-content-info', 'labels': {'demo.redhat.com/userinfo': ''}},
+        'data': {'demo_url': 'https://demo.apps.cluster.example.com', 'users_json': '{"users": {}}'},
+    }]
+    for i in range(1, users + 1):
+        user = 'user%d' % i
+        resources.append({
+            'kind': 'ConfigMap',
+            'metadata': {'name': 'showroom-%s' % user, 'labels': {'demo.redhat.com/userinfo': ''}},
+            'data': {
+                '%s_showroom_url' % user: 'https://showroom-%s.apps.cluster.example.com' % user,
+                'users_json': json.dumps({'users': {user: {
+                    'password': 'generated-password-%d' % i,
+                    'console_url': 'https://console.apps.cluster.example.com',
+                    'showroom': {'url': 'https://showroom-%s.apps.cluster.example.com' % user, 'namespace': user},
+                }}}),
+            },
+        })
+    return resources
+
+
+def legacy_merge(resources):
+    """What the set_fact loop did: combine(recursive=True) copies the accumulator every item"""
+    from ansible.utils.vars import merge_hash
+    merged = {}
+    for resource in resources:
+        if 'users_json' in resource['data']:
+            merged = merge_hash(merged, json.loads(resource['data']['users_json']))
+    return merged
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples), 6), value
+
+
+def run_playbook(playbook, extra_vars_path, output_dir):
+    env = dict(
+        os.environ,
+        ANSIBLE_ACTION_PLUGINS=os.pathsep.join([os.path.join(BENCH_DIR, 'action_plugins'),
+                                                os.path.join(ROLE_DIR, 'action_plugins')]),
+        ANSIBLE_FILTER_PLUGINS=os.path.join(ROLE_DIR, 'filter_plugins'),
+        ANSIBLE_LOCALHOST_WARNING='false',
+        ANSIBLE_INVENTORY_UNPARSED_WARNING='false',
+    )
+    subprocess.run(['ansible-playbook', os.path.join(BENCH_DIR, playbook),
+                    '-e', '@' + extra_vars_path, '-e', 'output_dir=' + output_dir],
+                   env=env, check=True, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    with open(os.path.join(output_dir, 'user-data.json')) as f:
+        return json.load(f)
+
+
+def bench_playbooks(resources, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        extra_vars_path = os.path.join(tmp, 'extra-vars.json')
+        with open(extra_vars_path, 'w') as f:
+            json.dump({'cm_userinfo': {'resources': resources}}, f)
+
+        result, user_data = {}, {}
+        for name, playbook in (('legacy_s', 'legacy.yml'), ('bulk_s', 'bulk.yml')):
+            samples = []
+            for _ in range(repeat):
+                output_dir = tempfile.mkdtemp(dir=tmp)
+                start = time.perf_counter()
+                user_data[name] = run_playbook(playbook, extra_vars_path, output_dir)
+                samples.append(time.perf_counter() - start)
+            result[name] = round(statistics.median(samples), 3)
+        if user_data['legacy_s'] != user_data['bulk_s']:
+            raise SystemExit('legacy.yml and bulk.yml published different user data')
+        result['speedup'] = round(result['legacy_s'] / result['bulk_s'], 2)
+        return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark userinfo merging and publishing')
+    parser.add_argument('--users', metavar='N', type=int, nargs='+', default=[10, 100, 1000],
+                        help='User counts to benchmark (default: 10 100 1000)')
+    parser.add_argument('--repeat', metavar='N', type=int, default=1,
+                        help='Runs per measurement; the median is reported (default: 1)')
+    parser.add_argument('--merge-only', action='store_true',
+                        help='Only time the in-process merge, not ansible-playbook')
+    args = parser.parse_args(argv)
+
+    filters = load_filters()
+    report = {'repeat': args.repeat, 'users': {}}
+    for users in args.users:
+        resources = configmaps(users)
+        legacy_s, legacy = timed(lambda: legacy_merge(resources), max(args.repeat, 3))
+        single_s, merged = timed(lambda: filters.field_content_users_json(resources), max(args.repeat, 3))
+        if legacy != merged:
+            raise SystemExit('field_content_users_json does not match combine(recursive=True)')
+        entry = {'merge': {'legacy_s': legacy_s, 'single_pass_s': single_s,
+                           'speedup': round(legacy_s / single_s, 2) if single_s else None}}
+        if not args.merge_only:
+            entry['playbook'] = bench_playbooks(resources, args.repeat)
+        report['users'][str(users)] = entry
+        print('%d users done' % users, file=sys.stderr)
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Tests of the field_content_application_wait module against the stand-in API
+
+Runs the module's ApplicationWaiter with a kubernetes client pointed at
+tests/benchmarks/fake_api.py, and changes the Applications from a thread while
+it waits:
+
+    python3 -m unittest discover -s tests/unit
+    python3 tests/unit/test_application_wait.py -v
+
+Requires ansible-core and the kubernetes Python client; the tests are skipped
+without them.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+import time
+import unittest
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROLE_DIR = os.path.normpath(os.path.join(TESTS_DIR, '..', 'roles', 'ocp4_workload_field_content'))
+sys.path.insert(0, os.path.join(TESTS_DIR, 'benchmarks'))
+
+from fake_api import Store, serve  # noqa: E402
+
+try:
+    from kubernetes import client
+except ImportError:
+    client = None
+
+ARGOCD = 'argoproj.io/v1alpha1'
+NAMESPACE = 'openshift-gitops'
+LABEL = 'demo.redhat.com/application'
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_wait():
+    """The module, with the role's module_utils where Ansible would put them"""
+    load('ansible.module_utils.field_content_k8s', os.path.join(ROLE_DIR, 'module_utils', 'field_content_k8s.py'))
+    return load('field_content_application_wait',
+                os.path.join(ROLE_DIR, 'library', 'field_content_application_wait.py'))
+
+
+def application(name, health, sync='Synced'):
+    return {'metadata': {'name': name, 'namespace': NAMESPACE, 'labels': {LABEL: ''}},
+            'spec': {}, 'status': {'health': {'status': health}, 'sync': {'status': sync}}}
+
+
+@unittest.skipIf(client is None, 'requires the kubernetes Python client')
+class ApplicationWaitTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.wait = load_wait()
+        except ImportError as e:
+            raise unittest.SkipTest('requires ansible-core: %s' % e)
+
+    def setUp(self):
+        self.store = Store()
+        self.server = serve(self.store)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        configuration = client.Configuration()
+        configuration.host = 'http://127.0.0.1:%d' % self.server.server_port
+        self.api = client.CustomObjectsApi(client.ApiClient(configuration))
+
+    def put(self, app):
+        self.store.put(ARGOCD, 'applications', app)
+
+    def later(self, seconds, action):
+        timer = threading.Timer(seconds, action)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def run_waiter(self, **kwargs):
+        kwargs.setdefault('namespace', NAMESPACE)
+        kwargs.setdefault('label_selector', LABEL)
+        waiter = self.wait.ApplicationWaiter(self.api, **kwargs)
+        start = time.monotonic()
+        ready = waiter.run()
+        return ready, time.monotonic() - start, waiter
+
+    def test_healthy(self):
+        self.put(application('field-content', 'Progressing', 'OutOfSync'))
+        self.later(0.3, lambda: self.put(application('field-content', 'Healthy')))
+        ready, elapsed, waiter = self.run_waiter(name='field-content', label_selector=None, timeout=10)
+        self.assertTrue(ready)
+        # Within one watch event of the change, not on a poll interval
+        self.assertLess(elapsed, 2)
+        [report] = waiter.report()
+        self.assertEqual((report['health'], report['sync']), ('Healthy', 'Synced'))
+        self.assertGreaterEqual(report['ready_after'], 0.3)
+        self.assertGreaterEqual(waiter.events, 1)
+
+    def test_degraded_until_deadline(self):
+        self.put(application('field-content', 'Degraded'))
+        ready, elapsed, waiter = self.run_waiter(timeout=1)
+        self.assertFalse(ready)
+        self.assertGreaterEqual(elapsed, 1)
+        self.assertLess(elapsed, 3)
+        [report] = waiter.report()
+        self.assertEqual(report['health'], 'Degraded')
+        self.assertIsNone(report['ready_after'])
+
+    def test_no_applications_until_deadline(self):
+        ready, _, waiter = self.run_waiter(timeout=1)
+        self.assertFalse(ready)
+        self.assertEqual(waiter.report(), [])
+
+    def test_expired_watch_relists(self):
+        self.put(application('field-content', 'Progressing'))
+        relists = []
+        waiter = self.wait.ApplicationWaiter(self.api, namespace=NAMESPACE, label_selector=LABEL, timeout=10)
+        relist = waiter.relist
+        waiter.relist = lambda: relists.append(time.monotonic()) or relist()
+
+        def compact():
+            # Writes elsewhere move the resourceVersion on, then the history the watch started from is compacted
+            self.store.put('v1', 'configmaps', {'metadata': {'name': 'other', 'namespace': NAMESPACE}})
+            self.store.compact()
+            self.later(0.3, lambda: self.put(application('field-content', 'Healthy')))
+
+        self.later(0.3, compact)
+        self.assertTrue(waiter.run())
+        self.assertEqual(len(relists), 2)
+        [report] = waiter.report()
+        self.assertEqual(report['health'], 'Healthy')
+
+    def test_new_application_restarts_settle(self):
+        self.put(application('parent', 'Healthy'))
+        self.later(1.2, lambda: self.put(application('child', 'Healthy')))
+        ready, elapsed, waiter = self.run_waiter(settle=2, timeout=10)
+        self.assertTrue(ready)
+        # The child appeared during the settle period, which then started again
+        self.assertGreaterEqual(elapsed, 3.1)
+        self.assertLess(elapsed, 4.5)
+        self.assertEqual([report['name'] for report in waiter.report()], ['child', 'parent'])
+
+    def test_settle_ends_on_an_unhealthy_application(self):
+        self.put(application('parent', 'Healthy'))
+        self.later(0.3, lambda: self.put(application('child', 'Progressing')))
+        self.later(0.8, lambda: self.put(application('child', 'Healthy')))
+        ready, elapsed, waiter = self.run_waiter(settle=1, timeout=10)
+        self.assertTrue(ready)
+        # Ready once the child is healthy, plus the whole settle period from then
+        self.assertGreaterEqual(elapsed, 1.8)
+        self.assertEqual(sorted(report['health'] for report in waiter.report()), ['Healthy', 'Healthy'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Tests of the ansible-runner Job's fetch-repo.sh against local bare repositories
+
+Every test builds a bare repository in a temporary directory, sources
+ansible-runner/helm-chart/files/fetch-repo.sh in bash with the Job's
+environment, and checks the checkout, the mirror and the requirements cache.
+ansible-galaxy and pip are replaced on PATH by commands that only log their
+arguments, so the requirements tests count installs without a network:
+
+    python3 -m unittest discover -s tests/unit
+    python3 tests/unit/test_fetch_repo.py -v
+
+Requires bash and git.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+FETCH_REPO = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..',
+                                           'ansible-runner', 'helm-chart', 'files', 'fetch-repo.sh'))
+
+# Logs its name and arguments, one line per call
+FAKE_COMMAND = '#!/bin/sh\necho "$(basename "$0") $*" >> "$FAKE_COMMAND_LOG"\n'
+
+
+def git(*args, cwd=None):
+    return subprocess.run(('git',) + args, cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class FetchRepoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.work = os.path.join(self.tmp, 'work')
+        self.bare = os.path.join(self.tmp, 'remote.git')
+        git('init', '--quiet', '--bare', '--initial-branch=main', self.bare)
+        git('clone', '--quiet', self.bare, self.work)
+        git('config', 'user.email', 'test@example.com', cwd=self.work)
+        git('config', 'user.name', 'test', cwd=self.work)
+        self.commit({'playbooks/site.yml': '- hosts: localhost\n', 'docs/index.md': '# Lab\n'})
+        self.commit({'playbooks/site.yml': '- hosts: localhost\n  tasks: []\n'})
+        self.commit({'docs/index.md': '# Lab guide\n'})
+        # file:// so a shallow clone of the remote is shallow, as over HTTPS
+        self.url = 'file://' + self.bare
+
+        bin_dir = os.path.join(self.tmp, 'bin')
+        os.mkdir(bin_dir)
+        for name in ('ansible-galaxy', 'pip'):
+            with open(os.path.join(bin_dir, name), 'w') as f:
+                f.write(FAKE_COMMAND)
+            os.chmod(os.path.join(bin_dir, name), 0o755)
+        self.log = os.path.join(self.tmp, 'commands.log')
+        self.env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ['PATH'], FAKE_COMMAND_LOG=self.log,
+                        GIT_REPO_URL=self.url, GIT_REPO_BRANCH='main', HOME=self.tmp)
+        for name in ('GIT_USERNAME', 'GIT_PASSWORD', 'GIT_DEPTH', 'GIT_SPARSE_PATH', 'GIT_MIRROR', 'CACHE_DIR'):
+            self.env.pop(name, None)
+
+    def commit(self, files):
+        for path, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.work, path)), exist_ok=True)
+            with open(os.path.join(self.work, path), 'w') as f:
+                f.write(content)
+        git('add', '-A', cwd=self.work)
+        git('commit', '--quiet', '-m', 'change %s' % ', '.join(files), cwd=self.work)
+        git('push', '--quiet', 'origin', 'HEAD:main', cwd=self.work)
+        return git('rev-parse', 'HEAD', cwd=self.work)
+
+    def source(self, script, cwd=None, **env):
+        """Run script in bash after sourcing fetch-repo.sh; returns its output"""
+        result = subprocess.run(['bash', '-c', 'set -e\nsource "%s"\n%s' % (FETCH_REPO, script)],
+                                cwd=cwd or self.tmp, env=dict(self.env, **env), capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout
+
+    def fetch(self, dest, **env):
+        output = self.source('fetch_repo "%s"' % dest, **env)
+        return os.path.join(self.tmp, dest), output
+
+    def installs(self):
+        if not os.path.exists(self.log):
+            return []
+        with open(self.log) as f:
+            return [line.split()[0] for line in f]
+
+    def test_full_clone(self):
+        checkout, output = self.fetch('full')
+        self.assertEqual(git('rev-parse', 'HEAD', cwd=checkout), git('rev-parse', 'main', cwd=self.bare))
+        self.assertEqual(git('rev-list', '--count', 'HEAD', cwd=checkout), '3')
+        self.assertIn('(depth 0)', output)
+
+    def test_depth(self):
+        checkout, output = self.fetch('shallow', GIT_DEPTH='1')
+        self.assertEqual(git('rev-list', '--count', 'HEAD', cwd=checkout), '1')
+        self.assertEqual(git('rev-parse', 'HEAD', cwd=checkout), git('rev-parse', 'main', cwd=self.bare))
+        self.assertIn('(depth 1)', output)
+
+    def test_sparse_path(self):
+        checkout, output = self.fetch('sparse', GIT_SPARSE_PATH='playbooks')
+        self.assertTrue(os.path.isfile(os.path.join(checkout, 'playbooks', 'site.yml')))
+        self.assertFalse(os.path.exists(os.path.join(checkout, 'docs')))
+        self.assertIn('sparse playbooks', output)
+
+    def test_mirror_is_reused(self):
+        cache = os.path.join(self.tmp, 'cache')
+        checkout, output = self.fetch('first', GIT_MIRROR='true', CACHE_DIR=cache)
+        self.assertIn('Repository mirror miss', output)
+        self.assertIn(', mirror)', output)
+        mirrors = [name for name in os.listdir(os.path.join(cache, 'git')) if name.endswith('.git')]
+        self.assertEqual(len(mirrors), 1)
+        # The checkout points to the repository, not to the mirror in the cache
+        self.assertEqual(git('remote', 'get-url', 'origin', cwd=checkout), self.url)
+
+        head = self.commit({'playbooks/site.yml': '- hosts: all\n'})
+        checkout, output = self.fetch('second', GIT_MIRROR='true', CACHE_DIR=cache, GIT_DEPTH='1')
+        self.assertIn('Repository mirror hit', output)
+        self.assertEqual(git('rev-parse', 'HEAD', cwd=checkout), head)
+        self.assertEqual(git('rev-list', '--count', 'HEAD', cwd=checkout), '1')
+        self.assertEqual(git('rev-parse', 'refs/heads/main', cwd=os.path.join(cache, 'git', mirrors[0])), head)
+
+    def test_mirror_without_cache_clones_directly(self):
+        checkout, output = self.fetch('direct', GIT_MIRROR='true', CACHE_DIR='')
+        self.assertNotIn('mirror', output)
+        self.assertEqual(git('rev-parse', 'HEAD', cwd=checkout), git('rev-parse', 'main', cwd=self.bare))
+
+    def test_remote_revision(self):
+        output = self.source('remote_revision\necho "$_remote_revision"')
+        self.assertEqual(output.strip(), git('rev-parse', 'main', cwd=self.bare))
+        output = self.source('remote_revision\necho "[$_remote_revision]"',
+                             GIT_REPO_URL='file://' + os.path.join(self.tmp, 'missing.git'))
+        self.assertEqual(output.strip(), '[]')
+
+    def test_requirements_installed_once_per_hash(self):
+        checkout, _ = self.fetch('requirements')
+        with open(os.path.join(checkout, 'requirements.yml'), 'w') as f:
+            f.write('collections:\n- kubernetes.core\n')
+        with open(os.path.join(checkout, 'requirements.txt'), 'w') as f:
+            f.write('kubernetes\n')
+        cache = os.path.join(self.tmp, 'cache')
+        script = 'install_repo_requirements\necho "paths $PYTHONPATH $ANSIBLE_COLLECTIONS_PATH"'
+
+        output = self.source(script, cwd=checkout, CACHE_DIR=cache)
+        self.assertEqual(sorted(self.installs()), ['ansible-galaxy', 'pip'])
+        self.assertIn('Installing requirements.yml', output)
+        self.assertIn(os.path.join(cache, 'repo-requirements', 'python-'), output)
+
+        output = self.source(script, cwd=checkout, CACHE_DIR=cache)
+        self.assertEqual(sorted(self.installs()), ['ansible-galaxy', 'pip'])
+        self.assertIn('requirements.yml unchanged, reusing', output)
+        self.assertIn('requirements.txt unchanged, reusing', output)
+        self.assertIn(os.path.join(cache, 'repo-requirements', 'galaxy-'), output)
+
+        with open(os.path.join(checkout, 'requirements.txt'), 'a') as f:
+            f.write('jmespath\n')
+        output = self.source(script, cwd=checkout, CACHE_DIR=cache)
+        self.assertEqual(sorted(self.installs()), ['ansible-galaxy', 'pip', 'pip'])
+        self.assertIn('requirements.yml unchanged, reusing', output)
+        self.assertIn('Installing requirements.txt', output)
+
+    def test_requirements_without_cache_always_installed(self):
+        checkout, _ = self.fetch('uncached')
+        with open(os.path.join(checkout, 'requirements.txt'), 'w') as f:
+            f.write('kubernetes\n')
+        self.source('install_repo_requirements', cwd=checkout)
+        self.source('install_repo_requirements', cwd=checkout)
+        self.assertEqual(self.installs(), ['pip', 'pip'])
+
+
+if __name__ == '__main__':
+    unittest.main()